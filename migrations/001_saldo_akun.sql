@@ -0,0 +1,23 @@
+-- 001: Saldo berjalan per akun untuk Neraca Saldo
+-- Diperbarui setiap kali jurnal diposting, supaya /neraca_saldo cukup
+-- membaca satu baris per akun (bukan seluruh tabel jurnal).
+
+create table if not exists saldo_akun (
+    kode_akun    text primary key,
+    saldo_debit  numeric not null default 0,
+    saldo_kredit numeric not null default 0,
+    updated_at   timestamptz not null default now()
+);
+
+-- Tambah mutasi debit/kredit ke saldo akun secara atomik (upsert + increment)
+create or replace function tambah_saldo_akun(p_kode_akun text, p_debit numeric, p_kredit numeric)
+returns void
+language sql
+as $$
+    insert into saldo_akun (kode_akun, saldo_debit, saldo_kredit, updated_at)
+    values (p_kode_akun, p_debit, p_kredit, now())
+    on conflict (kode_akun) do update
+    set saldo_debit  = saldo_akun.saldo_debit + excluded.saldo_debit,
+        saldo_kredit = saldo_akun.saldo_kredit + excluded.saldo_kredit,
+        updated_at   = now();
+$$;
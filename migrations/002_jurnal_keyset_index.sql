@@ -0,0 +1,4 @@
+-- 002: Index untuk paginasi keyset Jurnal Umum
+-- /jurnal_umum mengurutkan dan melanjutkan halaman berdasarkan (tanggal, id).
+
+create index if not exists jurnal_tanggal_id_idx on jurnal (tanggal, id);
@@ -0,0 +1,19 @@
+-- 003: Buku Besar per akun
+-- Index supaya filter akun_debit/akun_kredit di /buku_besar tidak memindai
+-- seluruh jurnal, plus agregat saldo awal sebelum jendela tanggal yang dilihat.
+
+create index if not exists jurnal_akun_debit_tanggal_idx on jurnal (akun_debit, tanggal, id);
+create index if not exists jurnal_akun_kredit_tanggal_idx on jurnal (akun_kredit, tanggal, id);
+
+create or replace function saldo_awal_akun(p_akun text, p_sebelum date)
+returns table (total_debit numeric, total_kredit numeric)
+language sql
+stable
+as $$
+    select
+        coalesce(sum(jumlah) filter (where akun_debit = p_akun), 0),
+        coalesce(sum(jumlah) filter (where akun_kredit = p_akun), 0)
+    from jurnal
+    where tanggal < p_sebelum
+      and (akun_debit = p_akun or akun_kredit = p_akun);
+$$;
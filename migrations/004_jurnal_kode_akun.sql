@@ -0,0 +1,34 @@
+-- 004: Kode akun terstruktur di tabel jurnal
+-- akun_debit/akun_kredit tetap disimpan sebagai "Nama Akun (KODE)" untuk tampilan,
+-- kode_debit/kode_kredit dipakai laporan untuk join, filter dan agregasi.
+
+alter table jurnal add column if not exists kode_debit text;
+alter table jurnal add column if not exists kode_kredit text;
+
+-- Backfill sekali jalan untuk baris lama: ambil isi kurung terakhir
+update jurnal
+set kode_debit = trim(substring(akun_debit from '\(([^()]*)\)\s*$'))
+where kode_debit is null and akun_debit like '%(%';
+
+update jurnal
+set kode_kredit = trim(substring(akun_kredit from '\(([^()]*)\)\s*$'))
+where kode_kredit is null and akun_kredit like '%(%';
+
+create index if not exists jurnal_kode_debit_tanggal_idx on jurnal (kode_debit, tanggal, id);
+create index if not exists jurnal_kode_kredit_tanggal_idx on jurnal (kode_kredit, tanggal, id);
+
+-- Saldo awal Buku Besar sekarang dihitung per kode akun
+drop function if exists saldo_awal_akun(text, date);
+
+create or replace function saldo_awal_akun(p_kode text, p_sebelum date)
+returns table (total_debit numeric, total_kredit numeric)
+language sql
+stable
+as $$
+    select
+        coalesce(sum(jumlah) filter (where kode_debit = p_kode), 0),
+        coalesce(sum(jumlah) filter (where kode_kredit = p_kode), 0)
+    from jurnal
+    where tanggal < p_sebelum
+      and (kode_debit = p_kode or kode_kredit = p_kode);
+$$;
@@ -0,0 +1,26 @@
+-- 005: Agregasi Neraca Saldo di database
+-- Saldo debit dan kredit per kode akun dihitung dengan GROUP BY, sehingga
+-- laporan hanya menerima satu baris per akun berapa pun jumlah jurnalnya.
+
+create or replace view v_neraca_saldo as
+select kode_akun,
+       sum(debit)  as saldo_debit,
+       sum(kredit) as saldo_kredit
+from (
+    select kode_debit as kode_akun, jumlah as debit, 0::numeric as kredit
+    from jurnal
+    where kode_debit is not null
+    union all
+    select kode_kredit as kode_akun, 0::numeric as debit, jumlah as kredit
+    from jurnal
+    where kode_kredit is not null
+) mutasi
+group by kode_akun;
+
+create or replace function neraca_saldo_agregat()
+returns table (kode_akun text, saldo_debit numeric, saldo_kredit numeric)
+language sql
+stable
+as $$
+    select kode_akun, saldo_debit, saldo_kredit from v_neraca_saldo;
+$$;
@@ -0,0 +1,34 @@
+-- 006: Jurnal majemuk (satu header, banyak baris)
+-- Satu transaksi dengan banyak akun disimpan sebagai satu header dan beberapa
+-- baris jurnal debit/kredit yang menunjuk ke header tersebut. Semua baris
+-- ditulis dalam satu panggilan RPC, sehingga tersimpan seluruhnya atau tidak sama sekali.
+
+create table if not exists jurnal_header (
+    id          bigserial primary key,
+    tanggal     date not null,
+    keterangan  text not null,
+    created_at  timestamptz not null default now()
+);
+
+alter table jurnal add column if not exists header_id bigint references jurnal_header (id);
+create index if not exists jurnal_header_id_idx on jurnal (header_id);
+
+create or replace function posting_jurnal(p_tanggal date, p_keterangan text, p_baris jsonb)
+returns setof jurnal
+language plpgsql
+as $$
+declare
+    v_header_id bigint;
+begin
+    insert into jurnal_header (tanggal, keterangan)
+    values (p_tanggal, p_keterangan)
+    returning id into v_header_id;
+
+    return query
+    insert into jurnal (tanggal, keterangan, akun_debit, akun_kredit, kode_debit, kode_kredit, jumlah, header_id, created_at)
+    select p_tanggal, p_keterangan, b.akun_debit, b.akun_kredit, b.kode_debit, b.kode_kredit, b.jumlah, v_header_id, now()
+    from jsonb_to_recordset(p_baris)
+         as b (akun_debit text, akun_kredit text, kode_debit text, kode_kredit text, jumlah numeric)
+    returning *;
+end;
+$$;
@@ -0,0 +1,153 @@
+-- 007: Tutup buku per periode
+-- Saat periode (bulan/tahun) ditutup, saldo kumulatif setiap akun sampai
+-- tanggal akhir periode disimpan di saldo_periode. Laporan mulai dari snapshot
+-- terakhir dan hanya menjumlahkan jurnal periode yang masih terbuka.
+-- Jurnal bertanggal di periode yang sudah ditutup tidak bisa ditambah/diubah.
+
+create table if not exists tutup_buku (
+    periode        text primary key,
+    tanggal_akhir  date not null unique,
+    created_at     timestamptz not null default now()
+);
+
+create table if not exists saldo_periode (
+    periode       text not null references tutup_buku (periode),
+    kode_akun     text not null,
+    saldo_debit   numeric not null default 0,
+    saldo_kredit  numeric not null default 0,
+    primary key (periode, kode_akun)
+);
+
+-- Tutup periode: snapshot = snapshot sebelumnya + mutasi sesudahnya s.d. tanggal akhir.
+-- Tabel jurnal dikunci selama penutupan supaya tidak ada baris yang lolos di antaranya.
+create or replace function tutup_periode(p_periode text, p_tanggal_akhir date)
+returns setof saldo_periode
+language plpgsql
+as $$
+declare
+    v_sebelumnya tutup_buku;
+begin
+    lock table jurnal in share mode;
+
+    select * into v_sebelumnya
+    from tutup_buku
+    order by tanggal_akhir desc
+    limit 1;
+
+    if v_sebelumnya.tanggal_akhir is not null and p_tanggal_akhir <= v_sebelumnya.tanggal_akhir then
+        raise exception 'Periode sampai % sudah ditutup', v_sebelumnya.tanggal_akhir;
+    end if;
+
+    insert into tutup_buku (periode, tanggal_akhir)
+    values (p_periode, p_tanggal_akhir);
+
+    return query
+    insert into saldo_periode (periode, kode_akun, saldo_debit, saldo_kredit)
+    select p_periode, kode_akun, sum(debit), sum(kredit)
+    from (
+        select kode_akun, saldo_debit as debit, saldo_kredit as kredit
+        from saldo_periode
+        where periode = v_sebelumnya.periode
+        union all
+        select kode_debit, jumlah, 0::numeric
+        from jurnal
+        where kode_debit is not null
+          and tanggal > coalesce(v_sebelumnya.tanggal_akhir, '-infinity'::date)
+          and tanggal <= p_tanggal_akhir
+        union all
+        select kode_kredit, 0::numeric, jumlah
+        from jurnal
+        where kode_kredit is not null
+          and tanggal > coalesce(v_sebelumnya.tanggal_akhir, '-infinity'::date)
+          and tanggal <= p_tanggal_akhir
+    ) mutasi
+    group by kode_akun
+    returning *;
+end;
+$$;
+
+-- Kunci periode yang sudah ditutup
+create or replace function cek_periode_terbuka()
+returns trigger
+language plpgsql
+as $$
+declare
+    v_batas date;
+begin
+    select max(tanggal_akhir) into v_batas from tutup_buku;
+    if v_batas is not null then
+        if tg_op in ('UPDATE', 'DELETE') and old.tanggal <= v_batas then
+            raise exception 'Periode sampai % sudah ditutup', v_batas;
+        end if;
+        if tg_op in ('INSERT', 'UPDATE') and new.tanggal <= v_batas then
+            raise exception 'Periode sampai % sudah ditutup', v_batas;
+        end if;
+    end if;
+    if tg_op = 'DELETE' then
+        return old;
+    end if;
+    return new;
+end;
+$$;
+
+drop trigger if exists jurnal_periode_terbuka on jurnal;
+create trigger jurnal_periode_terbuka
+before insert or update or delete on jurnal
+for each row execute function cek_periode_terbuka();
+
+-- Neraca saldo: snapshot terakhir + jurnal periode terbuka
+create or replace view v_neraca_saldo as
+with batas as (
+    select periode, tanggal_akhir
+    from tutup_buku
+    order by tanggal_akhir desc
+    limit 1
+)
+select kode_akun,
+       sum(debit)  as saldo_debit,
+       sum(kredit) as saldo_kredit
+from (
+    select s.kode_akun, s.saldo_debit as debit, s.saldo_kredit as kredit
+    from saldo_periode s
+    join batas b on b.periode = s.periode
+    union all
+    select kode_debit as kode_akun, jumlah as debit, 0::numeric as kredit
+    from jurnal
+    where kode_debit is not null
+      and tanggal > coalesce((select tanggal_akhir from batas), '-infinity'::date)
+    union all
+    select kode_kredit as kode_akun, 0::numeric as debit, jumlah as kredit
+    from jurnal
+    where kode_kredit is not null
+      and tanggal > coalesce((select tanggal_akhir from batas), '-infinity'::date)
+) mutasi
+group by kode_akun;
+
+-- Saldo awal Buku Besar: snapshot terakhir sebelum p_sebelum + mutasi sesudahnya
+create or replace function saldo_awal_akun(p_kode text, p_sebelum date)
+returns table (total_debit numeric, total_kredit numeric)
+language sql
+stable
+as $$
+    with batas as (
+        select periode, tanggal_akhir
+        from tutup_buku
+        where tanggal_akhir < p_sebelum
+        order by tanggal_akhir desc
+        limit 1
+    )
+    select coalesce(sum(debit), 0), coalesce(sum(kredit), 0)
+    from (
+        select s.saldo_debit as debit, s.saldo_kredit as kredit
+        from saldo_periode s
+        join batas b on b.periode = s.periode
+        where s.kode_akun = p_kode
+        union all
+        select case when kode_debit = p_kode then jumlah else 0 end,
+               case when kode_kredit = p_kode then jumlah else 0 end
+        from jurnal
+        where tanggal < p_sebelum
+          and tanggal > coalesce((select tanggal_akhir from batas), '-infinity'::date)
+          and (kode_debit = p_kode or kode_kredit = p_kode)
+    ) mutasi;
+$$;
@@ -0,0 +1,36 @@
+-- 008: Saldo kumulatif semua akun sampai tanggal tertentu
+-- Dipakai laporan keuangan untuk periode yang sudah ditutup: mulai dari snapshot
+-- tutup buku terakhir sebelum/pada tanggal tersebut, ditambah jurnal sesudahnya.
+
+create or replace function saldo_akun_sampai(p_sampai date)
+returns table (kode_akun text, saldo_debit numeric, saldo_kredit numeric)
+language sql
+stable
+as $$
+    with batas as (
+        select periode, tanggal_akhir
+        from tutup_buku
+        where tanggal_akhir <= p_sampai
+        order by tanggal_akhir desc
+        limit 1
+    )
+    select kode_akun, sum(debit), sum(kredit)
+    from (
+        select s.kode_akun, s.saldo_debit as debit, s.saldo_kredit as kredit
+        from saldo_periode s
+        join batas b on b.periode = s.periode
+        union all
+        select kode_debit, jumlah, 0::numeric
+        from jurnal
+        where kode_debit is not null
+          and tanggal <= p_sampai
+          and tanggal > coalesce((select tanggal_akhir from batas), '-infinity'::date)
+        union all
+        select kode_kredit, 0::numeric, jumlah
+        from jurnal
+        where kode_kredit is not null
+          and tanggal <= p_sampai
+          and tanggal > coalesce((select tanggal_akhir from batas), '-infinity'::date)
+    ) mutasi
+    group by kode_akun;
+$$;
@@ -0,0 +1,110 @@
+-- 009: Jurnal penyesuaian tersimpan di tabel sendiri
+-- Penyesuaian per periode (bulan) dibuat sekaligus dari register penyusutan
+-- dan aturan akrual, lalu ikut dijumlahkan bersama jurnal umum dalam satu
+-- agregasi untuk NSSP (neraca saldo setelah penyesuaian).
+
+create table if not exists aturan_akrual (
+    id          bigserial primary key,
+    keterangan  text not null,
+    akun_debit  text not null,
+    akun_kredit text not null,
+    kode_debit  text not null,
+    kode_kredit text not null,
+    jumlah      numeric not null check (jumlah > 0),
+    aktif       boolean not null default true,
+    created_at  timestamptz not null default now()
+);
+
+create table if not exists jurnal_penyesuaian (
+    id          bigserial primary key,
+    periode     text not null,
+    tanggal     date not null,
+    keterangan  text not null,
+    akun_debit  text not null,
+    akun_kredit text not null,
+    kode_debit  text not null,
+    kode_kredit text not null,
+    jumlah      numeric not null,
+    sumber      text not null check (sumber in ('penyusutan', 'akrual', 'manual')),
+    sumber_id   text not null,
+    created_at  timestamptz not null default now(),
+    unique (periode, sumber, sumber_id)
+);
+
+create index if not exists jurnal_penyesuaian_tanggal_idx on jurnal_penyesuaian (tanggal);
+
+-- Penyesuaian di periode yang sudah ditutup ikut dikunci (fungsi dari migrasi 007)
+drop trigger if exists jurnal_penyesuaian_periode_terbuka on jurnal_penyesuaian;
+create trigger jurnal_penyesuaian_periode_terbuka
+before insert or update or delete on jurnal_penyesuaian
+for each row execute function cek_periode_terbuka();
+
+-- Ganti penyesuaian otomatis satu periode dalam satu transaksi
+-- (penyesuaian manual tidak disentuh)
+create or replace function ganti_penyesuaian(p_periode text, p_baris jsonb)
+returns setof jurnal_penyesuaian
+language plpgsql
+as $$
+begin
+    delete from jurnal_penyesuaian
+    where periode = p_periode and sumber <> 'manual';
+
+    return query
+    insert into jurnal_penyesuaian (periode, tanggal, keterangan, akun_debit, akun_kredit,
+                                    kode_debit, kode_kredit, jumlah, sumber, sumber_id)
+    select p_periode, b.tanggal, b.keterangan, b.akun_debit, b.akun_kredit,
+           b.kode_debit, b.kode_kredit, b.jumlah, b.sumber, b.sumber_id
+    from jsonb_to_recordset(p_baris)
+         as b (tanggal date, keterangan text, akun_debit text, akun_kredit text,
+               kode_debit text, kode_kredit text, jumlah numeric, sumber text, sumber_id text)
+    returning *;
+end;
+$$;
+
+-- NSSP: saldo jurnal umum (snapshot + periode terbuka) dan penyesuaian per akun
+-- dalam satu GROUP BY. p_sampai null = semua tanggal.
+create or replace function nssp_agregat(p_sampai date default null)
+returns table (kode_akun text, saldo_debit numeric, saldo_kredit numeric,
+               penyesuaian_debit numeric, penyesuaian_kredit numeric)
+language sql
+stable
+as $$
+    with batas as (
+        select periode, tanggal_akhir
+        from tutup_buku
+        where p_sampai is null or tanggal_akhir <= p_sampai
+        order by tanggal_akhir desc
+        limit 1
+    )
+    select kode_akun,
+           coalesce(sum(debit) filter (where not penyesuaian), 0),
+           coalesce(sum(kredit) filter (where not penyesuaian), 0),
+           coalesce(sum(debit) filter (where penyesuaian), 0),
+           coalesce(sum(kredit) filter (where penyesuaian), 0)
+    from (
+        select s.kode_akun, s.saldo_debit as debit, s.saldo_kredit as kredit, false as penyesuaian
+        from saldo_periode s
+        join batas b on b.periode = s.periode
+        union all
+        select kode_debit, jumlah, 0::numeric, false
+        from jurnal
+        where kode_debit is not null
+          and (p_sampai is null or tanggal <= p_sampai)
+          and tanggal > coalesce((select tanggal_akhir from batas), '-infinity'::date)
+        union all
+        select kode_kredit, 0::numeric, jumlah, false
+        from jurnal
+        where kode_kredit is not null
+          and (p_sampai is null or tanggal <= p_sampai)
+          and tanggal > coalesce((select tanggal_akhir from batas), '-infinity'::date)
+        union all
+        select kode_debit, jumlah, 0::numeric, true
+        from jurnal_penyesuaian
+        where p_sampai is null or tanggal <= p_sampai
+        union all
+        select kode_kredit, 0::numeric, jumlah, true
+        from jurnal_penyesuaian
+        where p_sampai is null or tanggal <= p_sampai
+    ) mutasi
+    group by kode_akun;
+$$;
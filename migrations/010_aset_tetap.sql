@@ -0,0 +1,20 @@
+-- 010: Register aset tetap
+-- Setiap pembelian aset tetap dicatat sekali saat jurnal diposting, lengkap
+-- dengan harga perolehan, tanggal perolehan, umur ekonomis dan nilai residu.
+-- Buku pembantu penyusutan dan jurnal penyesuaian membaca register ini,
+-- bukan memindai seluruh jurnal. Isi awal: `flask --app siudang rebuild-aset-tetap`.
+
+create table if not exists aset_tetap (
+    id                bigserial primary key,
+    jurnal_id         bigint not null unique references jurnal (id),
+    kode_akun         text not null,
+    nama_aset         text not null,
+    keterangan        text,
+    tanggal_perolehan date not null,
+    harga_perolehan   numeric not null check (harga_perolehan > 0),
+    umur_ekonomis     integer not null check (umur_ekonomis > 0),
+    nilai_residu      numeric not null default 0,
+    created_at        timestamptz not null default now()
+);
+
+create index if not exists aset_tetap_kode_akun_idx on aset_tetap (kode_akun, tanggal_perolehan);
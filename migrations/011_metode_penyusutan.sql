@@ -0,0 +1,8 @@
+-- 011: Metode penyusutan per aset
+-- Jadwal penyusutan dihitung per bulan untuk semua aset sekaligus. Selain garis
+-- lurus, aset bisa disusutkan dengan saldo menurun ganda. Umur ekonomis, nilai
+-- residu dan metode bisa diubah per aset; posting jurnal tidak menimpanya lagi.
+
+alter table aset_tetap
+    add column if not exists metode text not null default 'garis_lurus'
+    check (metode in ('garis_lurus', 'saldo_menurun'));
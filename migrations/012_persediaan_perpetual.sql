@@ -0,0 +1,151 @@
+-- 012: Persediaan perpetual (udang, benur, pakan)
+-- Setiap pembelian (masuk) dan pemakaian/penjualan (keluar) dicatat dengan
+-- kuantitas dan nilai. Nilai keluar dihitung saat dicatat: FIFO dari lapisan
+-- harga tertua, atau rata-rata bergerak dari saldo item. HPP satu periode
+-- cukup dijumlahkan dari mutasi keluar, tidak perlu membaca seluruh jurnal.
+
+create table if not exists persediaan_item (
+    id           bigserial primary key,
+    kode_item    text not null unique,
+    nama_item    text not null,
+    jenis        text not null check (jenis in ('udang', 'benur', 'pakan')),
+    satuan       text not null default 'kg',
+    metode       text not null default 'fifo' check (metode in ('fifo', 'rata_rata')),
+    kode_akun    text,
+    qty_saldo    numeric not null default 0 check (qty_saldo >= 0),
+    nilai_saldo  numeric not null default 0,
+    created_at   timestamptz not null default now()
+);
+
+create table if not exists persediaan_mutasi (
+    id            bigserial primary key,
+    item_id       bigint not null references persediaan_item (id),
+    tanggal       date not null,
+    jenis         text not null check (jenis in ('masuk', 'keluar')),
+    qty           numeric not null check (qty > 0),
+    harga_satuan  numeric not null,
+    nilai         numeric not null,
+    keterangan    text,
+    created_at    timestamptz not null default now()
+);
+
+create index if not exists persediaan_mutasi_item_idx on persediaan_mutasi (item_id, tanggal, id);
+create index if not exists persediaan_mutasi_tanggal_idx on persediaan_mutasi (tanggal);
+
+-- Lapisan harga untuk metode FIFO: sisa kuantitas per pembelian
+create table if not exists persediaan_layer (
+    id            bigserial primary key,
+    item_id       bigint not null references persediaan_item (id),
+    mutasi_id     bigint not null references persediaan_mutasi (id),
+    tanggal       date not null,
+    qty_sisa      numeric not null check (qty_sisa >= 0),
+    harga_satuan  numeric not null
+);
+
+create index if not exists persediaan_layer_sisa_idx on persediaan_layer (item_id, tanggal, id) where qty_sisa > 0;
+
+-- Mutasi di periode yang sudah ditutup ikut dikunci (fungsi dari migrasi 007)
+drop trigger if exists persediaan_mutasi_periode_terbuka on persediaan_mutasi;
+create trigger persediaan_mutasi_periode_terbuka
+before insert or update or delete on persediaan_mutasi
+for each row execute function cek_periode_terbuka();
+
+-- Catat satu mutasi dan perbarui saldo item dalam satu transaksi.
+-- Baris item dikunci supaya dua mutasi item yang sama tidak saling menimpa.
+create or replace function catat_mutasi_persediaan(p_item_id bigint, p_tanggal date, p_jenis text,
+                                                   p_qty numeric, p_harga_satuan numeric, p_keterangan text)
+returns persediaan_mutasi
+language plpgsql
+as $$
+declare
+    v_item    persediaan_item;
+    v_layer   persediaan_layer;
+    v_mutasi  persediaan_mutasi;
+    v_sisa    numeric := p_qty;
+    v_ambil   numeric;
+    v_nilai   numeric := 0;
+begin
+    select * into v_item from persediaan_item where id = p_item_id for update;
+    if not found then
+        raise exception 'Item persediaan % tidak ditemukan', p_item_id;
+    end if;
+    if p_qty <= 0 then
+        raise exception 'Kuantitas harus lebih dari nol';
+    end if;
+    if exists (select 1 from persediaan_mutasi where item_id = p_item_id and tanggal > p_tanggal) then
+        raise exception 'Sudah ada mutasi % sesudah tanggal %', v_item.nama_item, p_tanggal;
+    end if;
+
+    if p_jenis = 'masuk' then
+        v_nilai := p_qty * p_harga_satuan;
+        insert into persediaan_mutasi (item_id, tanggal, jenis, qty, harga_satuan, nilai, keterangan)
+        values (p_item_id, p_tanggal, 'masuk', p_qty, p_harga_satuan, v_nilai, p_keterangan)
+        returning * into v_mutasi;
+
+        if v_item.metode = 'fifo' then
+            insert into persediaan_layer (item_id, mutasi_id, tanggal, qty_sisa, harga_satuan)
+            values (p_item_id, v_mutasi.id, p_tanggal, p_qty, p_harga_satuan);
+        end if;
+
+        update persediaan_item
+        set qty_saldo = qty_saldo + p_qty, nilai_saldo = nilai_saldo + v_nilai
+        where id = p_item_id;
+        return v_mutasi;
+    end if;
+
+    if p_jenis <> 'keluar' then
+        raise exception 'Jenis mutasi tidak dikenal: %', p_jenis;
+    end if;
+    if v_item.qty_saldo < p_qty then
+        raise exception 'Stok % tidak cukup (sisa %)', v_item.nama_item, v_item.qty_saldo;
+    end if;
+
+    if v_item.metode = 'rata_rata' then
+        v_nilai := round(v_item.nilai_saldo * p_qty / v_item.qty_saldo, 2);
+    else
+        for v_layer in
+            select * from persediaan_layer
+            where item_id = p_item_id and qty_sisa > 0
+            order by tanggal, id
+            for update
+        loop
+            exit when v_sisa <= 0;
+            v_ambil := least(v_sisa, v_layer.qty_sisa);
+            update persediaan_layer set qty_sisa = qty_sisa - v_ambil where id = v_layer.id;
+            v_nilai := v_nilai + v_ambil * v_layer.harga_satuan;
+            v_sisa := v_sisa - v_ambil;
+        end loop;
+    end if;
+
+    insert into persediaan_mutasi (item_id, tanggal, jenis, qty, harga_satuan, nilai, keterangan)
+    values (p_item_id, p_tanggal, 'keluar', p_qty, round(v_nilai / p_qty, 2), v_nilai, p_keterangan)
+    returning * into v_mutasi;
+
+    update persediaan_item
+    set qty_saldo = qty_saldo - p_qty, nilai_saldo = nilai_saldo - v_nilai
+    where id = p_item_id;
+    return v_mutasi;
+end;
+$$;
+
+-- Komponen HPP per item untuk satu periode: persediaan awal, pembelian (masuk)
+-- dan HPP (nilai keluar), dijumlahkan langsung dari mutasi
+create or replace function hpp_persediaan(p_dari date, p_sampai date)
+returns table (item_id bigint, kode_item text, nama_item text, jenis text, satuan text, metode text,
+               qty_awal numeric, nilai_awal numeric, qty_masuk numeric, nilai_masuk numeric,
+               qty_keluar numeric, nilai_keluar numeric)
+language sql
+stable
+as $$
+    select i.id, i.kode_item, i.nama_item, i.jenis, i.satuan, i.metode,
+           coalesce(sum(case when m.jenis = 'masuk' then m.qty else -m.qty end) filter (where m.tanggal < p_dari), 0),
+           coalesce(sum(case when m.jenis = 'masuk' then m.nilai else -m.nilai end) filter (where m.tanggal < p_dari), 0),
+           coalesce(sum(m.qty) filter (where m.jenis = 'masuk' and m.tanggal >= p_dari), 0),
+           coalesce(sum(m.nilai) filter (where m.jenis = 'masuk' and m.tanggal >= p_dari), 0),
+           coalesce(sum(m.qty) filter (where m.jenis = 'keluar' and m.tanggal >= p_dari), 0),
+           coalesce(sum(m.nilai) filter (where m.jenis = 'keluar' and m.tanggal >= p_dari), 0)
+    from persediaan_item i
+    left join persediaan_mutasi m on m.item_id = i.id and m.tanggal <= p_sampai
+    group by i.id
+    order by i.kode_item;
+$$;
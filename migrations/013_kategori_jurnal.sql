@@ -0,0 +1,58 @@
+-- 013: Kategori transaksi jurnal
+-- Kategori (persediaan_awal, pembelian, persediaan_akhir, perolehan_aset)
+-- ditentukan aplikasi saat baris jurnal ditulis, sehingga HPP dan register aset
+-- tetap cukup memfilter kategori di database tanpa membaca keterangan.
+-- Isi untuk jurnal lama: `flask --app siudang klasifikasi-jurnal`.
+
+alter table jurnal add column if not exists kategori text;
+
+create index if not exists jurnal_kategori_idx on jurnal (kategori, tanggal) where kategori is not null;
+
+create or replace function posting_jurnal(p_tanggal date, p_keterangan text, p_baris jsonb)
+returns setof jurnal
+language plpgsql
+as $$
+declare
+    v_header_id bigint;
+begin
+    insert into jurnal_header (tanggal, keterangan)
+    values (p_tanggal, p_keterangan)
+    returning id into v_header_id;
+
+    return query
+    insert into jurnal (tanggal, keterangan, akun_debit, akun_kredit, kode_debit, kode_kredit, jumlah, kategori, header_id, created_at)
+    select p_tanggal, p_keterangan, b.akun_debit, b.akun_kredit, b.kode_debit, b.kode_kredit, b.jumlah, b.kategori, v_header_id, now()
+    from jsonb_to_recordset(p_baris)
+         as b (akun_debit text, akun_kredit text, kode_debit text, kode_kredit text, jumlah numeric, kategori text)
+    returning *;
+end;
+$$;
+
+-- Kunci periode tertutup tetap berlaku, kecuali update yang hanya mengubah
+-- kategori (dipakai perintah klasifikasi-jurnal untuk jurnal lama)
+create or replace function cek_periode_terbuka()
+returns trigger
+language plpgsql
+as $$
+declare
+    v_batas date;
+begin
+    if tg_op = 'UPDATE' and to_jsonb(new) - 'kategori' = to_jsonb(old) - 'kategori' then
+        return new;
+    end if;
+
+    select max(tanggal_akhir) into v_batas from tutup_buku;
+    if v_batas is not null then
+        if tg_op in ('UPDATE', 'DELETE') and old.tanggal <= v_batas then
+            raise exception 'Periode sampai % sudah ditutup', v_batas;
+        end if;
+        if tg_op in ('INSERT', 'UPDATE') and new.tanggal <= v_batas then
+            raise exception 'Periode sampai % sudah ditutup', v_batas;
+        end if;
+    end if;
+    if tg_op = 'DELETE' then
+        return old;
+    end if;
+    return new;
+end;
+$$;
@@ -0,0 +1,141 @@
+-- 014: Jumlah uang sebagai rupiah bulat (bigint)
+-- Aplikasi membulatkan setiap jumlah ke rupiah saat ditulis dan menjumlahkan
+-- sebagai bilangan bulat, jadi total laporan tidak bergeser karena pembulatan.
+-- Harga satuan persediaan tetap numeric (boleh pecahan per kg), nilainya bulat.
+
+-- View bergantung pada jurnal.jumlah, dibuat ulang setelah kolom diubah
+drop view if exists v_neraca_saldo;
+
+alter table jurnal
+    alter column jumlah type bigint using round(jumlah)::bigint;
+
+alter table saldo_akun
+    alter column saldo_debit type bigint using round(saldo_debit)::bigint,
+    alter column saldo_kredit type bigint using round(saldo_kredit)::bigint;
+
+alter table saldo_periode
+    alter column saldo_debit type bigint using round(saldo_debit)::bigint,
+    alter column saldo_kredit type bigint using round(saldo_kredit)::bigint;
+
+alter table jurnal_penyesuaian
+    alter column jumlah type bigint using round(jumlah)::bigint;
+
+alter table aturan_akrual
+    alter column jumlah type bigint using round(jumlah)::bigint;
+
+alter table aset_tetap
+    alter column harga_perolehan type bigint using round(harga_perolehan)::bigint,
+    alter column nilai_residu type bigint using round(nilai_residu)::bigint;
+
+alter table persediaan_mutasi
+    alter column nilai type bigint using round(nilai)::bigint;
+
+alter table persediaan_item
+    alter column nilai_saldo type bigint using round(nilai_saldo)::bigint;
+
+-- Sama dengan migrasi 007
+create or replace view v_neraca_saldo as
+with batas as (
+    select periode, tanggal_akhir
+    from tutup_buku
+    order by tanggal_akhir desc
+    limit 1
+)
+select kode_akun,
+       sum(debit)  as saldo_debit,
+       sum(kredit) as saldo_kredit
+from (
+    select s.kode_akun, s.saldo_debit as debit, s.saldo_kredit as kredit
+    from saldo_periode s
+    join batas b on b.periode = s.periode
+    union all
+    select kode_debit as kode_akun, jumlah as debit, 0::bigint as kredit
+    from jurnal
+    where kode_debit is not null
+      and tanggal > coalesce((select tanggal_akhir from batas), '-infinity'::date)
+    union all
+    select kode_kredit as kode_akun, 0::bigint as debit, jumlah as kredit
+    from jurnal
+    where kode_kredit is not null
+      and tanggal > coalesce((select tanggal_akhir from batas), '-infinity'::date)
+) mutasi
+group by kode_akun;
+
+-- Nilai mutasi persediaan dibulatkan ke rupiah saat dihitung (sama dengan
+-- migrasi 012 selain pembulatan), supaya nilai mutasi dan saldo item selalu cocok
+create or replace function catat_mutasi_persediaan(p_item_id bigint, p_tanggal date, p_jenis text,
+                                                   p_qty numeric, p_harga_satuan numeric, p_keterangan text)
+returns persediaan_mutasi
+language plpgsql
+as $$
+declare
+    v_item    persediaan_item;
+    v_layer   persediaan_layer;
+    v_mutasi  persediaan_mutasi;
+    v_sisa    numeric := p_qty;
+    v_ambil   numeric;
+    v_nilai   numeric := 0;
+begin
+    select * into v_item from persediaan_item where id = p_item_id for update;
+    if not found then
+        raise exception 'Item persediaan % tidak ditemukan', p_item_id;
+    end if;
+    if p_qty <= 0 then
+        raise exception 'Kuantitas harus lebih dari nol';
+    end if;
+    if exists (select 1 from persediaan_mutasi where item_id = p_item_id and tanggal > p_tanggal) then
+        raise exception 'Sudah ada mutasi % sesudah tanggal %', v_item.nama_item, p_tanggal;
+    end if;
+
+    if p_jenis = 'masuk' then
+        v_nilai := round(p_qty * p_harga_satuan);
+        insert into persediaan_mutasi (item_id, tanggal, jenis, qty, harga_satuan, nilai, keterangan)
+        values (p_item_id, p_tanggal, 'masuk', p_qty, p_harga_satuan, v_nilai, p_keterangan)
+        returning * into v_mutasi;
+
+        if v_item.metode = 'fifo' then
+            insert into persediaan_layer (item_id, mutasi_id, tanggal, qty_sisa, harga_satuan)
+            values (p_item_id, v_mutasi.id, p_tanggal, p_qty, p_harga_satuan);
+        end if;
+
+        update persediaan_item
+        set qty_saldo = qty_saldo + p_qty, nilai_saldo = nilai_saldo + v_nilai
+        where id = p_item_id;
+        return v_mutasi;
+    end if;
+
+    if p_jenis <> 'keluar' then
+        raise exception 'Jenis mutasi tidak dikenal: %', p_jenis;
+    end if;
+    if v_item.qty_saldo < p_qty then
+        raise exception 'Stok % tidak cukup (sisa %)', v_item.nama_item, v_item.qty_saldo;
+    end if;
+
+    if v_item.metode = 'rata_rata' then
+        v_nilai := round(v_item.nilai_saldo * p_qty / v_item.qty_saldo);
+    else
+        for v_layer in
+            select * from persediaan_layer
+            where item_id = p_item_id and qty_sisa > 0
+            order by tanggal, id
+            for update
+        loop
+            exit when v_sisa <= 0;
+            v_ambil := least(v_sisa, v_layer.qty_sisa);
+            update persediaan_layer set qty_sisa = qty_sisa - v_ambil where id = v_layer.id;
+            v_nilai := v_nilai + v_ambil * v_layer.harga_satuan;
+            v_sisa := v_sisa - v_ambil;
+        end loop;
+        v_nilai := round(v_nilai);
+    end if;
+
+    insert into persediaan_mutasi (item_id, tanggal, jenis, qty, harga_satuan, nilai, keterangan)
+    values (p_item_id, p_tanggal, 'keluar', p_qty, round(v_nilai / p_qty, 2), v_nilai, p_keterangan)
+    returning * into v_mutasi;
+
+    update persediaan_item
+    set qty_saldo = qty_saldo - p_qty, nilai_saldo = nilai_saldo - v_nilai
+    where id = p_item_id;
+    return v_mutasi;
+end;
+$$;
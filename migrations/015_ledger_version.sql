@@ -0,0 +1,42 @@
+-- 015: Versi ledger untuk conditional GET (ETag / Last-Modified)
+-- Satu baris penghitung yang naik setiap ada perubahan pada jurnal, coa, atau
+-- saldo_akun. Halaman laporan cukup membaca baris ini untuk tahu apakah isi
+-- halaman yang sudah ada di browser masih berlaku (304 Not Modified).
+-- saldo_akun ikut dipantau karena diperbarui sesudah insert jurnal (statement
+-- terpisah), supaya versi tidak diambil di antara keduanya.
+
+create table if not exists ledger_version (
+    id           int primary key default 1 check (id = 1),
+    versi        bigint not null default 0,
+    diubah_pada  timestamptz not null default now()
+);
+
+insert into ledger_version (id) values (1) on conflict (id) do nothing;
+
+-- Trigger per statement: satu import batch cukup menaikkan versi sekali
+create or replace function naikkan_ledger_version()
+returns trigger
+language plpgsql
+as $$
+begin
+    update ledger_version
+    set versi = versi + 1, diubah_pada = now()
+    where id = 1;
+    return null;
+end;
+$$;
+
+drop trigger if exists jurnal_ledger_version on jurnal;
+create trigger jurnal_ledger_version
+after insert or update or delete or truncate on jurnal
+for each statement execute function naikkan_ledger_version();
+
+drop trigger if exists coa_ledger_version on coa;
+create trigger coa_ledger_version
+after insert or update or delete or truncate on coa
+for each statement execute function naikkan_ledger_version();
+
+drop trigger if exists saldo_akun_ledger_version on saldo_akun;
+create trigger saldo_akun_ledger_version
+after insert or update or delete or truncate on saldo_akun
+for each statement execute function naikkan_ledger_version();
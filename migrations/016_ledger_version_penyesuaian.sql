@@ -0,0 +1,9 @@
+-- 016: Jurnal penyesuaian ikut menaikkan versi ledger (migrasi 015)
+-- NSSP dan laporan keuangan menjumlahkan jurnal_penyesuaian, jadi cache
+-- halaman yang dikunci dengan versi ledger harus ikut berganti saat tabel
+-- ini berubah.
+
+drop trigger if exists jurnal_penyesuaian_ledger_version on jurnal_penyesuaian;
+create trigger jurnal_penyesuaian_ledger_version
+after insert or update or delete or truncate on jurnal_penyesuaian
+for each statement execute function naikkan_ledger_version();
@@ -0,0 +1,34 @@
+-- 017: Mutasi persediaan dan jurnalnya dalam satu transaksi
+-- Sebelumnya jurnal HPP ditulis aplikasi sesudah mutasi tersimpan; kalau
+-- jurnal gagal (misal periode sudah ditutup) subledger dan buku besar tidak
+-- lagi cocok. Sekarang mutasi dan jurnalnya ditulis oleh satu fungsi: kalau
+-- salah satu gagal, keduanya dibatalkan.
+-- p_baris berisi baris jurnal tanpa jumlah (format posting_jurnal, migrasi 006);
+-- jumlahnya diisi dengan nilai mutasi yang dihitung di sini. Mutasi masuk
+-- menjurnal pembelian (persediaan / kas-utang), mutasi keluar menjurnal HPP.
+
+create or replace function posting_mutasi_persediaan(p_item_id bigint, p_tanggal date, p_jenis text,
+                                                     p_qty numeric, p_harga_satuan numeric, p_keterangan text,
+                                                     p_keterangan_jurnal text, p_baris jsonb)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_mutasi  persediaan_mutasi;
+    v_jurnal  jsonb := '[]'::jsonb;
+begin
+    v_mutasi := catat_mutasi_persediaan(p_item_id, p_tanggal, p_jenis, p_qty, p_harga_satuan, p_keterangan);
+
+    if p_baris is not null and jsonb_array_length(p_baris) > 0 and v_mutasi.nilai > 0 then
+        select coalesce(jsonb_agg(to_jsonb(j)), '[]'::jsonb) into v_jurnal
+        from posting_jurnal(
+            p_tanggal,
+            p_keterangan_jurnal,
+            (select jsonb_agg(b || jsonb_build_object('jumlah', v_mutasi.nilai))
+             from jsonb_array_elements(p_baris) b)
+        ) j;
+    end if;
+
+    return jsonb_build_object('mutasi', to_jsonb(v_mutasi), 'jurnal', v_jurnal);
+end;
+$$;
@@ -0,0 +1,14 @@
+-- 018: Tutup buku ikut menaikkan versi ledger (migrasi 015)
+-- Sesudah tutup buku, buku besar dihitung dari snapshot baru dan jendela
+-- default-nya dimulai sesudah periode yang ditutup, jadi ETag halaman laporan
+-- harus ikut berganti.
+
+drop trigger if exists tutup_buku_ledger_version on tutup_buku;
+create trigger tutup_buku_ledger_version
+after insert or update or delete or truncate on tutup_buku
+for each statement execute function naikkan_ledger_version();
+
+drop trigger if exists saldo_periode_ledger_version on saldo_periode;
+create trigger saldo_periode_ledger_version
+after insert or update or delete or truncate on saldo_periode
+for each statement execute function naikkan_ledger_version();
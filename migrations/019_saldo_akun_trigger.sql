@@ -0,0 +1,81 @@
+-- 019: saldo_akun diperbarui di transaksi yang sama dengan jurnal
+-- Sebelumnya aplikasi memanggil tambah_saldo_akun per akun sesudah insert
+-- jurnal selesai; kalau langkah itu gagal, neraca saldo tidak lagi cocok
+-- dengan jurnal. Sekarang trigger per statement di tabel jurnal menggabung
+-- mutasi per akun dari baris yang berubah dan menerapkannya ke saldo_akun,
+-- jadi jurnal dan saldo tersimpan bersama atau tidak sama sekali.
+-- Update yang tidak mengubah akun/jumlah (misal hanya kategori) tidak menulis apa pun.
+-- Jalankan bersamaan dengan deploy aplikasi yang tidak lagi memanggil
+-- tambah_saldo_akun, lalu `flask --app siudang rebuild-saldo --verify`.
+
+create or replace function jurnal_ke_saldo_akun()
+returns trigger
+language plpgsql
+as $$
+begin
+    if tg_op = 'INSERT' then
+        insert into saldo_akun (kode_akun, saldo_debit, saldo_kredit, updated_at)
+        select kode_akun, sum(debit), sum(kredit), now()
+        from (
+            select kode_debit as kode_akun, jumlah as debit, 0::bigint as kredit from baru where kode_debit is not null
+            union all
+            select kode_kredit, 0::bigint, jumlah from baru where kode_kredit is not null
+        ) mutasi
+        group by kode_akun
+        on conflict (kode_akun) do update
+        set saldo_debit  = saldo_akun.saldo_debit + excluded.saldo_debit,
+            saldo_kredit = saldo_akun.saldo_kredit + excluded.saldo_kredit,
+            updated_at   = now();
+    elsif tg_op = 'DELETE' then
+        insert into saldo_akun (kode_akun, saldo_debit, saldo_kredit, updated_at)
+        select kode_akun, sum(debit), sum(kredit), now()
+        from (
+            select kode_debit as kode_akun, -jumlah as debit, 0::bigint as kredit from lama where kode_debit is not null
+            union all
+            select kode_kredit, 0::bigint, -jumlah from lama where kode_kredit is not null
+        ) mutasi
+        group by kode_akun
+        on conflict (kode_akun) do update
+        set saldo_debit  = saldo_akun.saldo_debit + excluded.saldo_debit,
+            saldo_kredit = saldo_akun.saldo_kredit + excluded.saldo_kredit,
+            updated_at   = now();
+    else
+        insert into saldo_akun (kode_akun, saldo_debit, saldo_kredit, updated_at)
+        select kode_akun, sum(debit), sum(kredit), now()
+        from (
+            select kode_debit as kode_akun, jumlah as debit, 0::bigint as kredit from baru where kode_debit is not null
+            union all
+            select kode_kredit, 0::bigint, jumlah from baru where kode_kredit is not null
+            union all
+            select kode_debit, -jumlah, 0::bigint from lama where kode_debit is not null
+            union all
+            select kode_kredit, 0::bigint, -jumlah from lama where kode_kredit is not null
+        ) mutasi
+        group by kode_akun
+        having sum(debit) <> 0 or sum(kredit) <> 0
+        on conflict (kode_akun) do update
+        set saldo_debit  = saldo_akun.saldo_debit + excluded.saldo_debit,
+            saldo_kredit = saldo_akun.saldo_kredit + excluded.saldo_kredit,
+            updated_at   = now();
+    end if;
+    return null;
+end;
+$$;
+
+drop trigger if exists jurnal_saldo_akun_insert on jurnal;
+create trigger jurnal_saldo_akun_insert
+after insert on jurnal
+referencing new table as baru
+for each statement execute function jurnal_ke_saldo_akun();
+
+drop trigger if exists jurnal_saldo_akun_update on jurnal;
+create trigger jurnal_saldo_akun_update
+after update on jurnal
+referencing old table as lama new table as baru
+for each statement execute function jurnal_ke_saldo_akun();
+
+drop trigger if exists jurnal_saldo_akun_delete on jurnal;
+create trigger jurnal_saldo_akun_delete
+after delete on jurnal
+referencing old table as lama
+for each statement execute function jurnal_ke_saldo_akun();
@@ -0,0 +1,48 @@
+-- 020: Setiap baris jurnal mencatat versi ledger yang dihasilkannya
+-- Aplikasi menambahkan jurnal yang ditulisnya sendiri langsung ke ledger
+-- engine di memori. Dengan versi di baris jurnal, proses tahu kenaikan versi
+-- mana yang berasal dari tulisannya sendiri, sehingga engine hanya dimuat
+-- ulang kalau penulis lain yang menaikkan versi.
+
+alter table jurnal add column if not exists versi bigint;
+
+-- Versi dinaikkan sebelum statement jurnal berjalan, supaya trigger baris di
+-- bawah bisa membaca versi baru (migrasi 015 menaikkannya sesudah statement).
+-- Baris ledger_version terkunci sampai commit, jadi tiap transaksi mendapat
+-- versi sendiri.
+drop trigger if exists jurnal_ledger_version on jurnal;
+create trigger jurnal_ledger_version
+before insert or update or delete or truncate on jurnal
+for each statement execute function naikkan_ledger_version();
+
+create or replace function isi_versi_jurnal()
+returns trigger
+language plpgsql
+as $$
+begin
+    select versi into new.versi from ledger_version where id = 1;
+    return new;
+end;
+$$;
+
+drop trigger if exists jurnal_isi_versi on jurnal;
+create trigger jurnal_isi_versi
+before insert on jurnal
+for each row execute function isi_versi_jurnal();
+
+-- Tulisan yang dibuat trigger lain (saldo_akun dari trigger jurnal, migrasi 019)
+-- sudah tercakup kenaikan versi statement pemicunya, jadi tidak menaikkan lagi
+create or replace function naikkan_ledger_version()
+returns trigger
+language plpgsql
+as $$
+begin
+    if pg_trigger_depth() > 1 then
+        return null;
+    end if;
+    update ledger_version
+    set versi = versi + 1, diubah_pada = now()
+    where id = 1;
+    return null;
+end;
+$$;
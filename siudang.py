@@ -2,12 +2,30 @@ import os
 import random
 import ssl
 import datetime
-from flask import Flask, render_template_string, request, redirect, session, send_from_directory
-from supabase import create_client, Client
+import threading
+import time
+import re
+import hashlib
+import uuid
+from decimal import Decimal, ROUND_HALF_UP
+import queue
+from collections import deque, OrderedDict
+from functools import wraps
+from itertools import accumulate
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from array import array
+from flask import Flask, render_template, request, redirect, session, send_from_directory, g, has_app_context, make_response
+from supabase import create_client, Client, ClientOptions
 from dotenv import load_dotenv
 from werkzeug.security import generate_password_hash, check_password_hash
 from email.message import EmailMessage
 import smtplib
+import click
+import csv
+from werkzeug.utils import secure_filename
+from jinja2 import DictLoader, FileSystemBytecodeCache, TemplateError
+from urllib.parse import urlencode
 
 # ---------------------------
 # KONFIGURASI DASAR
@@ -19,10 +37,21 @@ SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 EMAIL_SENDER = os.getenv("EMAIL_SENDER")
 EMAIL_APP_PASSWORD = os.getenv("EMAIL_APP_PASSWORD")
 
+# Server SMTP untuk OTP. Untuk uji lokal pakai server debugging, misalnya
+# `python -m aiosmtpd -n -l localhost:1025` dengan SMTP_HOST=localhost,
+# SMTP_PORT=1025 dan SMTP_SSL=0.
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "465"))
+SMTP_SSL = os.getenv("SMTP_SSL", "1") != "0"
+
+# Batas waktu query ke database. Dipasang di client HTTP PostgREST (bukan hanya
+# di jalankan_paralel), jadi query yang macet berhenti dan thread-nya bebas lagi.
+QUERY_TIMEOUT_DETIK = float(os.getenv("QUERY_TIMEOUT_DETIK", "15"))
+
 if not SUPABASE_URL or not SUPABASE_KEY:
     raise ValueError("❌ Gagal memuat SUPABASE_URL atau SUPABASE_KEY dari .env")
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY, options=ClientOptions(postgrest_client_timeout=QUERY_TIMEOUT_DETIK))
 
 # ---------------------------
 # KONFIGURASI FLASK
@@ -562,6 +591,7 @@ button:hover {
     <h1>Input Transaksi (Jurnal)</h1>
 
     {% if message %}<p class="message">{{ message }}</p>{% endif %}
+    <p><a href="/import_jurnal">📥 Import banyak transaksi dari CSV/XLSX</a></p>
 
     <form method="POST">
         <label for="tanggal">Tanggal</label>
@@ -608,9 +638,16 @@ function tambahAkun() {
         <option value="kredit">Kredit</option>
     `;
 
+    const jumlahInput = document.createElement("input");
+    jumlahInput.type = "text";
+    jumlahInput.name = "jumlah_akun";
+    jumlahInput.required = true;
+    jumlahInput.placeholder = "Jumlah (Rp)";
+
     // Menambahkan elemen dropdown dan memilih akun
     newAccountField.appendChild(akunSelect);
     newAccountField.appendChild(typeSelect);
+    newAccountField.appendChild(jumlahInput);
 
     // Menambahkan elemen baru ke dalam container
     akunFieldsContainer.appendChild(newAccountField);
@@ -728,6 +765,38 @@ tr:hover {
     height: 5px;
     background: #f8f9fa;
 }
+.filter-form {
+    background: white;
+    padding: 15px 20px;
+    border-radius: 10px;
+    box-shadow: 0 2px 8px rgba(0,0,0,0.1);
+    margin-bottom: 20px;
+    display: flex;
+    gap: 15px;
+    align-items: flex-end;
+}
+.filter-form input, .filter-form select {
+    padding: 8px;
+    border: 1px solid #ccc;
+    border-radius: 8px;
+}
+.carry-row {
+    background: #fff8e1;
+    font-style: italic;
+}
+.carry-row td {
+    text-align: right;
+}
+.pagination {
+    display: flex;
+    justify-content: space-between;
+    margin-top: 20px;
+}
+.pagination a {
+    color: #033E3E;
+    font-weight: 600;
+    text-decoration: none;
+}
 </style>
 </head>
 <body>
@@ -750,6 +819,26 @@ tr:hover {
 
 <div class="container">
     <h1>📑 Jurnal Umum</h1>
+
+    <form class="filter-form" method="GET" action="/jurnal_umum">
+        <div>
+            <label for="dari">Dari</label><br>
+            <input type="date" id="dari" name="dari" value="{{ dari }}">
+        </div>
+        <div>
+            <label for="sampai">Sampai</label><br>
+            <input type="date" id="sampai" name="sampai" value="{{ sampai }}">
+        </div>
+        <div>
+            <label for="per_halaman">Baris per halaman</label><br>
+            <select id="per_halaman" name="per_halaman">
+                {% for n in [25, 50, 100, 250, 500] %}
+                <option value="{{ n }}" {{ 'selected' if n == per_halaman else '' }}>{{ n }}</option>
+                {% endfor %}
+            </select>
+        </div>
+        <button type="submit">Tampilkan</button>
+    </form>
     
     {% if jurnal_data %}
     <table>
@@ -763,6 +852,14 @@ tr:hover {
             </tr>
         </thead>
         <tbody>
+            {% if total_sebelumnya %}
+            <!-- Saldo pindahan dari halaman sebelumnya -->
+            <tr class="carry-row">
+                <td colspan="3">Pindahan dari halaman sebelumnya</td>
+                <td class="debit">{{ "Rp {:,.0f}".format(total_sebelumnya) }}</td>
+                <td class="kredit">{{ "Rp {:,.0f}".format(total_sebelumnya) }}</td>
+            </tr>
+            {% endif %}
             {% for jurnal in jurnal_data %}
             <!-- Baris untuk Tanggal dan Keterangan -->
             <tr class="tanggal-keterangan">
@@ -803,6 +900,11 @@ tr:hover {
             </tr>
         </tbody>
     </table>
+
+    <div class="pagination">
+        <span>{% if first_url %}<a href="{{ first_url }}">⏮ Halaman pertama</a>{% endif %}</span>
+        <span>{% if next_url %}<a href="{{ next_url }}">Halaman berikutnya ➡</a>{% endif %}</span>
+    </div>
     {% else %}
     <div class="no-data">
         <p>Belum ada data transaksi. Silakan input transaksi terlebih dahulu.</p>
@@ -874,6 +976,15 @@ h1 {
     border-radius: 8px;
     font-size: 14px;
 }
+.periode-filter {
+    margin-top: 10px;
+}
+.periode-filter input {
+    padding: 8px;
+    border: 1px solid #ccc;
+    border-radius: 8px;
+    margin-right: 10px;
+}
 table {
     width: 100%;
     border-collapse: collapse;
@@ -964,11 +1075,22 @@ tr:hover {
                 <option value="{{ akun.nama_akun }} ({{ akun.kode_akun }})">{{ akun.nama_akun }} ({{ akun.kode_akun }})</option>
             {% endfor %}
         </select>
+        <div class="periode-filter">
+            <label for="dari_filter">Dari</label>
+            <input type="date" id="dari_filter" value="{{ dari }}" onchange="filterBukuBesar()">
+            <label for="sampai_filter">Sampai</label>
+            <input type="date" id="sampai_filter" value="{{ sampai }}" onchange="filterBukuBesar()">
+            <label for="as_of_filter">Saldo per</label>
+            <input type="date" id="as_of_filter" value="{{ as_of }}" onchange="filterBukuBesar()">
+        </div>
     </div>
 
     {% if selected_akun %}
     <div class="akun-header">
         <h3>Buku Besar: {{ selected_akun }}</h3>
+        {% if as_of %}
+        <p>Saldo per {{ as_of }}: <strong>{{ "Rp {:,.0f}".format(saldo_akhir) }}</strong></p>
+        {% endif %}
     </div>
     {% endif %}
 
@@ -984,6 +1106,15 @@ tr:hover {
             </tr>
         </thead>
         <tbody>
+            {% if selected_akun and dari %}
+            <tr>
+                <td>{{ dari }}</td>
+                <td><em>Saldo awal</em></td>
+                <td class="debit">-</td>
+                <td class="kredit">-</td>
+                <td class="saldo">{{ "Rp {:,.0f}".format(saldo_awal) }}</td>
+            </tr>
+            {% endif %}
             {% for transaksi in buku_besar_data %}
             <tr>
                 <td>{{ transaksi.tanggal }}</td>
@@ -1024,12 +1155,17 @@ tr:hover {
 
 <script>
 function filterBukuBesar() {
+    const params = new URLSearchParams();
     const selectedAkun = document.getElementById('akun_filter').value;
-    if (selectedAkun) {
-        window.location.href = '/buku_besar?akun=' + encodeURIComponent(selectedAkun);
-    } else {
-        window.location.href = '/buku_besar';
-    }
+    const dari = document.getElementById('dari_filter').value;
+    const sampai = document.getElementById('sampai_filter').value;
+    const asOf = document.getElementById('as_of_filter').value;
+    if (selectedAkun) params.set('akun', selectedAkun);
+    if (dari) params.set('dari', dari);
+    if (sampai) params.set('sampai', sampai);
+    if (asOf) params.set('as_of', asOf);
+    const query = params.toString();
+    window.location.href = query ? '/buku_besar?' + query : '/buku_besar';
 }
 
 // Set selected value in dropdown
@@ -1152,6 +1288,15 @@ tr:hover {
     padding: 40px;
     color: #666;
 }
+.filter-form {
+    margin-bottom: 20px;
+}
+.filter-form input, .filter-form button {
+    padding: 8px;
+    border: 1px solid #ccc;
+    border-radius: 8px;
+    margin-right: 10px;
+}
 </style>
 </head>
 <body>
@@ -1173,7 +1318,17 @@ tr:hover {
 </div>
 
 <div class="container">
-    <h1>⚖ Neraca Saldo</h1>
+    <h1>⚖ Neraca Saldo{% if dari %} (mutasi {{ dari }} s.d. {{ as_of }}){% elif as_of %} per {{ as_of }}{% endif %}</h1>
+    <p><a href="/tutup_buku">🔒 Tutup buku per periode</a></p>
+
+    <form class="filter-form" method="GET" action="/neraca_saldo">
+        <label for="dari">Mutasi dari</label>
+        <input type="date" id="dari" name="dari" value="{{ dari }}">
+        <label for="as_of">Saldo per tanggal</label>
+        <input type="date" id="as_of" name="as_of" value="{{ as_of }}">
+        <button type="submit">Tampilkan</button>
+        {% if as_of %}<a href="/neraca_saldo">Saldo berjalan</a>{% endif %}
+    </form>
     
     {% if neraca_saldo %}
     <!-- Status Balance Check -->
@@ -1338,6 +1493,31 @@ h1 {
     border: 2px solid #4caf50;
 }
 
+.filter-form {
+    background: white;
+    padding: 15px 20px;
+    border-radius: 10px;
+    margin-bottom: 20px;
+    box-shadow: 0 2px 8px rgba(0,0,0,0.1);
+}
+.message {
+    font-weight: bold;
+    margin: 10px 0;
+}
+.item-table {
+    width: 100%;
+    border-collapse: collapse;
+    margin: 15px 0;
+}
+.item-table th, .item-table td {
+    padding: 8px 10px;
+    border-bottom: 1px solid #eee;
+    text-align: left;
+}
+.item-table td.nilai {
+    text-align: right;
+}
+
 .no-data {
     text-align: center;
     padding: 40px;
@@ -1373,13 +1553,50 @@ h1 {
     <div class="info-box">
         <h3>📊 Informasi HPP</h3>
         <p><strong>Rumus HPP:</strong> Persediaan Awal + Pembelian - Persediaan Akhir</p>
-        <p>Data diambil otomatis dari transaksi yang sudah dicatat dalam sistem.</p>
+        <p>Data diambil dari <a href="/persediaan">persediaan perpetual</a>: nilai setiap pemakaian/penjualan dihitung saat dicatat (FIFO atau rata-rata bergerak).</p>
     </div>
 
+    <form method="GET" class="filter-form">
+        <label for="periode"><strong>Periode</strong></label>
+        <input type="text" id="periode" name="periode" value="{{ periode }}" placeholder="2026-03 atau 2026" pattern="[0-9]{4}(-[0-9]{2})?">
+        <button type="submit">Tampilkan</button>
+    </form>
+
+    {% if message %}<p class="message">{{ message }}</p>{% endif %}
+
     {% if hpp_data %}
     <div class="hpp-result">
-        <h3>📦 Hasil Perhitungan HPP Otomatis</h3>
-        
+        <h3>📦 Hasil Perhitungan HPP Otomatis - {{ hpp_data.periode }}</h3>
+
+        {% if hpp_data["items"] %}
+        <table class="item-table">
+            <thead>
+                <tr>
+                    <th>Item</th>
+                    <th>Metode</th>
+                    <th>Awal</th>
+                    <th>Masuk</th>
+                    <th>Keluar</th>
+                    <th>Akhir</th>
+                    <th>HPP</th>
+                </tr>
+            </thead>
+            <tbody>
+                {% for item in hpp_data["items"] %}
+                <tr>
+                    <td>{{ item.nama_item }}</td>
+                    <td>{{ 'FIFO' if item.metode == 'fifo' else 'Rata-rata' }}</td>
+                    <td class="nilai">{{ "{:,.2f}".format(item.qty_awal) }} {{ item.satuan }}</td>
+                    <td class="nilai">{{ "{:,.2f}".format(item.qty_masuk) }} {{ item.satuan }}</td>
+                    <td class="nilai">{{ "{:,.2f}".format(item.qty_keluar) }} {{ item.satuan }}</td>
+                    <td class="nilai">{{ "{:,.2f}".format(item.qty_akhir) }} {{ item.satuan }}</td>
+                    <td class="nilai">{{ "Rp {:,.0f}".format(item.nilai_keluar) }}</td>
+                </tr>
+                {% endfor %}
+            </tbody>
+        </table>
+        {% endif %}
+
         <div class="hpp-card">
             <h4>Data Persediaan Udang</h4>
             <div class="result-line">
@@ -1416,12 +1633,11 @@ h1 {
         <p>Belum ada data transaksi persediaan untuk menghitung HPP.</p>
         <p>Pastikan Anda sudah mencatat transaksi berikut:</p>
         <ul style="text-align: left; display: inline-block;">
-            <li>Pembelian persediaan udang</li>
-            <li>Persediaan awal periode</li>
-            <li>Persediaan akhir periode</li>
+            <li>Item persediaan (udang, benur, pakan)</li>
+            <li>Mutasi masuk (pembelian) dan keluar (pemakaian/penjualan)</li>
         </ul>
         <br>
-        <a href="/input_jurnal"><button style="margin-top: 10px;">Input Transaksi Persediaan</button></a>
+        <a href="/persediaan"><button style="margin-top: 10px;">Catat Persediaan</button></a>
     </div>
     {% endif %}
 
@@ -1539,6 +1755,10 @@ h1 {
 .total-row td {
     border-top: 2px solid #3cbcb4;
 }
+.message {
+    font-weight: bold;
+    margin: 10px 0;
+}
 .no-data {
     text-align: center;
     padding: 40px;
@@ -1588,11 +1808,13 @@ h1 {
 
     <div class="aset-info">
         <h3>📊 Informasi Penyusutan Aset</h3>
-        <p><strong>Metode Penyusutan:</strong> Garis Lurus (Straight Line)</p>
-        <p><strong>Rumus:</strong> (Harga Perolehan - Nilai Residu) ÷ Umur Ekonomis</p>
-        <p>Data diambil otomatis dari transaksi pembelian aset tetap.</p>
+        <p><strong>Garis Lurus:</strong> (Harga Perolehan - Nilai Residu) ÷ (Umur Ekonomis × 12) per bulan</p>
+        <p><strong>Saldo Menurun Ganda:</strong> Nilai Buku × 2 ÷ (Umur Ekonomis × 12) per bulan, tidak di bawah nilai residu</p>
+        <p>Data diambil otomatis dari transaksi pembelian aset tetap. Jurnal penyesuaian bulanan dibuat dari jadwal ini.</p>
     </div>
 
+    {% if message %}<p class="message">{{ message }}</p>{% endif %}
+
     {% if aset_penyusutan %}
         {% for aset in aset_penyusutan %}
         <div class="aset-card">
@@ -1606,16 +1828,30 @@ h1 {
             <div style="display: grid; grid-template-columns: 1fr 1fr; gap: 15px; margin-bottom: 20px;">
                 <div>
                     <strong>Kode Aset:</strong> {{ aset.kode_aset }}<br>
+                    {% if aset.keterangan %}<strong>Keterangan:</strong> {{ aset.keterangan }}<br>{% endif %}
                     <strong>Tanggal Perolehan:</strong> {{ aset.tanggal_perolehan }}<br>
                     <strong>Umur Ekonomis:</strong> {{ aset.umur_ekonomis }} tahun
                 </div>
                 <div>
                     <strong>Harga Perolehan:</strong> {{ "Rp {:,.0f}".format(aset.harga_perolehan) }}<br>
                     <strong>Nilai Residu:</strong> {{ "Rp {:,.0f}".format(aset.nilai_residu) }}<br>
-                    <strong>Penyusutan/Tahun:</strong> {{ "Rp {:,.0f}".format(aset.penyusutan_per_tahun) }}
+                    <strong>Metode:</strong> {{ metode_penyusutan[aset.metode] }}<br>
+                    <strong>Penyusutan Tahun 1:</strong> {{ "Rp {:,.0f}".format(aset.penyusutan_per_tahun) }}
                 </div>
             </div>
 
+            <form method="POST" style="margin-bottom: 20px;">
+                <input type="hidden" name="id" value="{{ aset.id }}">
+                Umur (tahun) <input type="number" name="umur_ekonomis" min="1" value="{{ aset.umur_ekonomis }}" style="width: 70px;">
+                Residu <input type="text" name="nilai_residu" value="{{ aset.nilai_residu }}" style="width: 120px;">
+                <select name="metode">
+                    {% for kode, nama in metode_penyusutan.items() %}
+                    <option value="{{ kode }}" {% if kode == aset.metode %}selected{% endif %}>{{ nama }}</option>
+                    {% endfor %}
+                </select>
+                <button type="submit">Simpan</button>
+            </form>
+
             <h4>📅 Jadwal Penyusutan</h4>
             <table class="penyusutan-table">
                 <thead>
@@ -1764,6 +2000,26 @@ tr:hover {
     height: 5px;
     background: #f8f9fa;
 }
+.filter-form {
+    background: white;
+    padding: 15px 20px;
+    border-radius: 10px;
+    box-shadow: 0 2px 8px rgba(0,0,0,0.1);
+    margin-bottom: 20px;
+    display: flex;
+    gap: 15px;
+    align-items: flex-end;
+    flex-wrap: wrap;
+}
+.filter-form input, .filter-form select {
+    padding: 8px;
+    border: 1px solid #ccc;
+    border-radius: 8px;
+}
+.message {
+    font-weight: bold;
+    margin: 10px 0;
+}
 .no-data {
     text-align: center;
     padding: 40px;
@@ -1803,6 +2059,17 @@ tr:hover {
             <li>Pendapatan diterima di muka</li>
         </ul>
     </div>
+
+    {% if message %}<p class="message">{{ message }}</p>{% endif %}
+
+    <form class="filter-form" method="GET" action="/jurnal_penyesuaian">
+        <div>
+            <label for="periode">Periode (YYYY-MM atau YYYY)</label><br>
+            <input type="text" id="periode" name="periode" value="{{ periode }}" pattern="[0-9]{4}(-[0-9]{2})?">
+        </div>
+        <button type="submit">Tampilkan</button>
+        <button type="submit" formmethod="POST" name="aksi" value="generate">⚙ Buat Penyesuaian Bulan Ini</button>
+    </form>
     
     {% if jurnal_penyesuaian %}
     <table>
@@ -1827,7 +2094,7 @@ tr:hover {
             <!-- Baris untuk Akun Debit -->
             <tr class="akun-debit">
                 <td></td>
-                <td class="no-akun">{{ jurnal.kode_akun_debit }}</td>
+                <td class="no-akun">{{ jurnal.kode_debit }}</td>
                 <td>{{ jurnal.akun_debit }}</td>
                 <td class="debit">{{ "Rp {:,.0f}".format(jurnal.jumlah) if jurnal.jumlah else "-" }}</td>
                 <td></td>
@@ -1836,7 +2103,7 @@ tr:hover {
             <!-- Baris untuk Akun Kredit -->
             <tr class="akun-kredit">
                 <td></td>
-                <td class="no-akun">{{ jurnal.kode_akun_kredit }}</td>
+                <td class="no-akun">{{ jurnal.kode_kredit }}</td>
                 <td>{{ jurnal.akun_kredit }}</td>
                 <td></td>
                 <td class="kredit">{{ "Rp {:,.0f}".format(jurnal.jumlah) if jurnal.jumlah else "-" }}</td>
@@ -1859,9 +2126,72 @@ tr:hover {
     {% else %}
     <div class="no-data">
         <p>Belum ada jurnal penyesuaian yang diperlukan.</p>
-        <p>Jurnal penyesuaian akan muncul otomatis ketika terdapat transaksi yang memerlukan penyesuaian.</p>
+        <p>Klik "Buat Penyesuaian Bulan Ini" untuk membuat penyusutan dan akrual periode {{ periode }}.</p>
     </div>
     {% endif %}
+
+    <h2>Aturan Akrual Bulanan</h2>
+    <table>
+        <thead>
+            <tr>
+                <th>Keterangan</th>
+                <th>Debit</th>
+                <th>Kredit</th>
+                <th style="text-align: right;">Jumlah per Bulan</th>
+                <th width="120"></th>
+            </tr>
+        </thead>
+        <tbody>
+            {% for aturan in aturan_akrual %}
+            <tr>
+                <td>{{ aturan.keterangan }}{% if not aturan.aktif %} <em>(nonaktif)</em>{% endif %}</td>
+                <td>{{ aturan.akun_debit }}</td>
+                <td>{{ aturan.akun_kredit }}</td>
+                <td class="debit">{{ "Rp {:,.0f}".format(aturan.jumlah) }}</td>
+                <td>
+                    {% if aturan.aktif %}
+                    <form method="POST">
+                        <input type="hidden" name="periode" value="{{ periode }}">
+                        <input type="hidden" name="id" value="{{ aturan.id }}">
+                        <button type="submit" name="aksi" value="nonaktif_aturan">Nonaktifkan</button>
+                    </form>
+                    {% endif %}
+                </td>
+            </tr>
+            {% else %}
+            <tr><td colspan="5">Belum ada aturan akrual.</td></tr>
+            {% endfor %}
+        </tbody>
+    </table>
+
+    <form class="filter-form" method="POST" style="margin-top: 20px;">
+        <input type="hidden" name="periode" value="{{ periode }}">
+        <div>
+            <label for="keterangan">Keterangan</label><br>
+            <input type="text" id="keterangan" name="keterangan" placeholder="Beban gaji yang masih harus dibayar" required>
+        </div>
+        <div>
+            <label for="akun_debit">Akun Debit</label><br>
+            <select id="akun_debit" name="akun_debit" required>
+                {% for akun in coa_list %}
+                <option value="{{ akun.nama_akun }} ({{ akun.kode_akun }})">{{ akun.kode_akun }} - {{ akun.nama_akun }}</option>
+                {% endfor %}
+            </select>
+        </div>
+        <div>
+            <label for="akun_kredit">Akun Kredit</label><br>
+            <select id="akun_kredit" name="akun_kredit" required>
+                {% for akun in coa_list %}
+                <option value="{{ akun.nama_akun }} ({{ akun.kode_akun }})">{{ akun.kode_akun }} - {{ akun.nama_akun }}</option>
+                {% endfor %}
+            </select>
+        </div>
+        <div>
+            <label for="jumlah">Jumlah per Bulan</label><br>
+            <input type="text" id="jumlah" name="jumlah" placeholder="Rp 3.000.000" required>
+        </div>
+        <button type="submit" name="aksi" value="tambah_aturan">Tambah Aturan</button>
+    </form>
 </div>
 
 </body>
@@ -1976,6 +2306,21 @@ tr:hover {
     border-radius: 5px;
     margin-bottom: 20px;
 }
+.filter-form {
+    background: white;
+    padding: 15px 20px;
+    border-radius: 10px;
+    box-shadow: 0 2px 8px rgba(0,0,0,0.1);
+    margin-bottom: 20px;
+    display: flex;
+    gap: 15px;
+    align-items: flex-end;
+}
+.filter-form input {
+    padding: 8px;
+    border: 1px solid #ccc;
+    border-radius: 8px;
+}
 .no-data {
     text-align: center;
     padding: 40px;
@@ -2022,6 +2367,14 @@ tr:hover {
 <div class="container">
     <h1>📚 Neraca Saldo Setelah Penyesuaian (NSSP)</h1>
 
+    <form class="filter-form" method="GET" action="/nssp">
+        <div>
+            <label for="periode">Sampai akhir periode (YYYY-MM atau YYYY, kosong = semua)</label><br>
+            <input type="text" id="periode" name="periode" value="{{ periode }}" pattern="[0-9]{4}(-[0-9]{2})?">
+        </div>
+        <button type="submit">Tampilkan</button>
+    </form>
+
     <div class="info-box">
         <h3>📊 Informasi NSSP</h3>
         <p><strong>NSSP</strong> adalah neraca saldo yang telah disesuaikan dengan jurnal penyesuaian.</p>
@@ -2229,6 +2582,21 @@ th {
     padding: 40px;
     color: #666;
 }
+.filter-form {
+    background: white;
+    padding: 15px 20px;
+    border-radius: 10px;
+    box-shadow: 0 2px 8px rgba(0,0,0,0.1);
+    margin-bottom: 20px;
+    display: flex;
+    gap: 15px;
+    align-items: flex-end;
+}
+.filter-form input {
+    padding: 8px;
+    border: 1px solid #ccc;
+    border-radius: 8px;
+}
 .export-buttons {
     margin-bottom: 20px;
     text-align: right;
@@ -2269,6 +2637,17 @@ th {
 <div class="container">
     <h1>📊 Laporan Keuangan</h1>
 
+    <form class="filter-form" method="GET" action="/laporan_keuangan">
+        <div>
+            <label for="periode">Periode (YYYY-MM atau YYYY)</label><br>
+            <input type="text" id="periode" name="periode" value="{{ periode }}" pattern="[0-9]{4}(-[0-9]{1,2})?">
+        </div>
+        <div>
+            <button type="submit">Tampilkan</button>
+        </div>
+    </form>
+    {% if message %}<p><strong>{{ message }}</strong></p>{% endif %}
+
     <div class="export-buttons">
         <button onclick="window.print()">🖨 Cetak Laporan</button>
         <button onclick="exportToPDF()">📄 Export PDF</button>
@@ -2292,10 +2671,12 @@ th {
                     <td><strong>Pendapatan Usaha</strong></td>
                     <td class="nilai">{{ "Rp {:,.0f}".format(laporan_data.pendapatan_usaha) }}</td>
                 </tr>
+                {% for pendapatan in laporan_data.pendapatan %}
                 <tr>
-                    <td style="padding-left: 20px;">Pendapatan Penjualan Udang</td>
-                    <td class="nilai">{{ "Rp {:,.0f}".format(laporan_data.pendapatan_penjualan) }}</td>
+                    <td style="padding-left: 20px;">{{ pendapatan.nama }}</td>
+                    <td class="nilai">{{ "Rp {:,.0f}".format(pendapatan.jumlah) }}</td>
                 </tr>
+                {% endfor %}
                 
                 <tr>
                     <td><strong>Harga Pokok Penjualan (HPP)</strong></td>
@@ -2338,6 +2719,12 @@ th {
                     <td>Modal Awal</td>
                     <td class="nilai">{{ "Rp {:,.0f}".format(laporan_data.modal_awal) }}</td>
                 </tr>
+                {% if laporan_data.setoran_modal %}
+                <tr>
+                    <td>Setoran Modal</td>
+                    <td class="nilai">{{ "Rp {:,.0f}".format(laporan_data.setoran_modal) }}</td>
+                </tr>
+                {% endif %}
                 <tr>
                     <td>Laba Bersih</td>
                     <td class="nilai {{ 'laba' if laporan_data.laba_bersih >= 0 else 'rugi' }}">
@@ -2448,111 +2835,2766 @@ function exportToPDF() {
 </html>
 """
 
-# ---------------------------
-# ROUTES - SEMUA DITARUH DI BAWAH TEMPLATE
-# ---------------------------
-
-@app.route("/")
-def index():
-    return redirect("/login")
-
-@app.route("/register")
-def register():
-    return render_template_string(register_html)
-
-@app.route("/login")
-def login():
-    return render_template_string(login_html)
-
-@app.route("/login_success", methods=["POST"])
-def login_success():
-    email = request.form["email"]
-    password = request.form["password"]
-    user = supabase.table("users").select("*").eq("email", email).execute()
-    if user.data and check_password_hash(user.data[0]["password"], password):
-        session["email"] = email
-        return redirect("/dashboard")
-    else:
-        return render_template_string(login_html, message="❌ Email atau password salah")
-
-@app.route("/send_otp", methods=["POST"])
-def send_otp():
-    email = request.form["email"]
-    password = request.form["password"]
-    otp = random.randint(100000, 999999)
-    session["otp"] = otp
-    session["email"] = email
-    session["password"] = password
-
-    try:
-        msg = EmailMessage()
-        msg.set_content(f"Kode OTP Anda: {otp}")
-        msg["Subject"] = "OTP untuk SiUdang"
-        msg["From"] = EMAIL_SENDER
-        msg["To"] = email
-
-        context = ssl.create_default_context()
-        with smtplib.SMTP_SSL("smtp.gmail.com", 465, context=context) as server:
-            server.login(EMAIL_SENDER, EMAIL_APP_PASSWORD)
-            server.send_message(msg)
-
-        return render_template_string(verify_html)
-    except Exception as e:
-        print(e)
-        return render_template_string(register_html, message="❌ Gagal mengirim OTP")
-
-@app.route("/verify_otp", methods=["POST"])
-def verify_otp():
-    otp_input = request.form["otp"]
-    if str(session.get("otp")) == otp_input:
-        try:
-            hashed_password = generate_password_hash(session["password"])
-            supabase.table("users").insert({
-                "email": session["email"],
-                "password": hashed_password,
-                "created_at": str(datetime.datetime.now())
-            }).execute()
-            session.pop("otp", None)
-            return redirect("/dashboard")
-        except Exception as e:
-            print(e)
-            return render_template_string(verify_html, message="❌ Gagal menyimpan user ke database.")
-    else:
-        return render_template_string(verify_html, message="OTP salah. Coba lagi!")
-
-@app.route("/dashboard")
-def dashboard():
-    if "email" in session:
-        return render_template_string(dashboard_html, email=session["email"])
-    return redirect("/login")
-
-@app.route("/coa", methods=["GET", "POST"])
-def coa():
-    if "email" not in session:
-        return redirect("/login")
-
-    message = ""
-
-    if request.method == "POST":
-        kode_akun = request.form["kode_akun"]
-        nama_akun = request.form["nama_akun"]
-        tipe_akun = request.form["tipe_akun"]
+# 15. Template Halaman Import Jurnal (CSV/XLSX)
+import_jurnal_html = """
+<!DOCTYPE html>
+<html lang="id">
+<head>
+<meta charset="UTF-8">
+<meta name="viewport" content="width=device-width, initial-scale=1.0">
+<title>Import Jurnal - SiUdang</title>
+<style>
+body {
+    font-family: Poppins, sans-serif;
+    background: #f4f9f9;
+    margin: 0;
+}
 
-        try:
-            supabase.table("coa").insert({
-                "kode_akun": kode_akun,
-                "nama_akun": nama_akun,
-                "tipe_akun": tipe_akun,
-            }).execute()
-            message = "✅ Akun berhasil ditambahkan!"
-        except Exception as e:
-            print(e)
-            message = "❌ Gagal menambahkan akun."
+.sidebar {
+    width: 220px;
+    background: linear-gradient(180deg, #b8e3e0 0%, #ffe8de 100%);
+    height: 100vh;
+    position: fixed;
+    top: 0; left: 0;
+    padding: 20px;
+    color: #033E3E;
+}
+.sidebar a {
+    display: block;
+    text-decoration: none;
+    color: #033E3E;
+    margin: 10px 0;
+    padding: 10px 12px;
+    border-radius: 8px;
+    font-weight: 500;
+    transition: 0.2s;
+}
+.sidebar a:hover {
+    background: rgba(255, 255, 255, 0.4);
+}
+.container {
+    margin-left: 250px;
+    padding: 40px;
+}
+h1 {
+    color: #033E3E;
+}
+form {
+    background: white;
+    padding: 25px;
+    border-radius: 15px;
+    box-shadow: 0 4px 12px rgba(0,0,0,0.1);
+    width: 600px;
+}
+label {
+    font-weight: 600;
+    color: #055555;
+}
+input {
+    width: 100%;
+    padding: 10px;
+    margin: 8px 0 15px 0;
+    border: 1px solid #ccc;
+    border-radius: 8px;
+    font-size: 14px;
+}
+button {
+    background: #3cbcb4;
+    color: white;
+    border: none;
+    padding: 10px 20px;
+    border-radius: 10px;
+    cursor: pointer;
+    font-weight: bold;
+}
+button:hover {
+    background: #2a9790;
+}
+.message {
+    font-weight: bold;
+    margin-top: 10px;
+    color: green;
+}
+.petunjuk {
+    color: #555;
+    font-size: 14px;
+}
+table {
+    width: 100%;
+    border-collapse: collapse;
+    background: white;
+    box-shadow: 0 4px 12px rgba(0,0,0,0.1);
+    border-radius: 10px;
+    overflow: hidden;
+    margin-top: 20px;
+}
+th, td {
+    padding: 10px 15px;
+    text-align: left;
+    border-bottom: 1px solid #ddd;
+}
+th {
+    background: #c62828;
+    color: white;
+}
+</style>
+</head>
+<body>
+
+<div class="sidebar">
+    <h2>SiUdang</h2>
+    <a href="/dashboard">🏠 Dashboard</a>
+    <a href="/coa"> 📋 COA</a>
+    <a href="/input_jurnal"> ✏ Input Transaksi</a>
+    <a href="/hitung_hpp"> 💰 Hitung HPP</a>
+    <a href="/jurnal_umum"> 📑 Jurnal Umum</a>
+    <a href="/buku_besar"> 🗂 Buku Besar</a>
+    <a href="/neraca_saldo"> ⚖ Neraca Saldo</a>
+    <a href="/buku_pembantu_penyusutan"> 🛠 Buku Pembantu Penyusutan</a>
+    <a href="/jurnal_penyesuaian"> 📝 Jurnal Penyesuaian</a>
+    <a href="/nssp"> 📚 NSSP</a>
+    <a href="/laporan_keuangan">📊 Laporan Keuangan</a>
+    <a href="/logout">🚪 Logout</a>
+</div>
+
+<div class="container">
+    <h1>📥 Import Jurnal (CSV / XLSX)</h1>
+
+    {% if message %}<p class="message">{{ message }}</p>{% endif %}
+
+    <form method="POST" enctype="multipart/form-data">
+        <p class="petunjuk">
+            Kolom yang dibutuhkan: <strong>tanggal, akun_debit, akun_kredit, keterangan, jumlah</strong>.
+            Akun boleh diisi kode akun (misal <code>111</code>) atau "Nama Akun (KODE)".
+        </p>
+        <label for="file">File jurnal</label>
+        <input type="file" id="file" name="file" accept=".csv,.xlsx" required>
+        <button type="submit">Import</button>
+    </form>
+
+    {% if errors %}
+    <table>
+        <thead>
+            <tr>
+                <th width="100">Baris</th>
+                <th>Kesalahan</th>
+            </tr>
+        </thead>
+        <tbody>
+            {% for error in errors %}
+            <tr>
+                <td>{{ error.baris }}</td>
+                <td>{{ error.pesan }}</td>
+            </tr>
+            {% endfor %}
+        </tbody>
+    </table>
+    {% if total_error > errors|length %}
+    <p class="petunjuk">... dan {{ total_error - errors|length }} kesalahan lainnya.</p>
+    {% endif %}
+    {% endif %}
+</div>
+
+</body>
+</html>
+"""
+
+# 16. Template Halaman Tutup Buku
+tutup_buku_html = """
+<!DOCTYPE html>
+<html lang="id">
+<head>
+<meta charset="UTF-8">
+<meta name="viewport" content="width=device-width, initial-scale=1.0">
+<title>Tutup Buku - SiUdang</title>
+<style>
+body {
+    font-family: Poppins, sans-serif;
+    background: #f4f9f9;
+    margin: 0;
+}
+
+.sidebar {
+    width: 220px;
+    background: linear-gradient(180deg, #b8e3e0 0%, #ffe8de 100%);
+    height: 100vh;
+    position: fixed;
+    top: 0; left: 0;
+    padding: 20px;
+    color: #033E3E;
+}
+.sidebar a {
+    display: block;
+    text-decoration: none;
+    color: #033E3E;
+    margin: 10px 0;
+    padding: 10px 12px;
+    border-radius: 8px;
+    font-weight: 500;
+    transition: 0.2s;
+}
+.sidebar a:hover {
+    background: rgba(255, 255, 255, 0.4);
+}
+.container {
+    margin-left: 250px;
+    padding: 40px;
+}
+h1 {
+    color: #033E3E;
+}
+form {
+    background: white;
+    padding: 25px;
+    border-radius: 15px;
+    box-shadow: 0 4px 12px rgba(0,0,0,0.1);
+    width: 600px;
+}
+label {
+    font-weight: 600;
+    color: #055555;
+}
+input {
+    width: 100%;
+    padding: 10px;
+    margin: 8px 0 15px 0;
+    border: 1px solid #ccc;
+    border-radius: 8px;
+    font-size: 14px;
+}
+button {
+    background: #3cbcb4;
+    color: white;
+    border: none;
+    padding: 10px 20px;
+    border-radius: 10px;
+    cursor: pointer;
+    font-weight: bold;
+}
+button:hover {
+    background: #2a9790;
+}
+.message {
+    font-weight: bold;
+    margin-top: 10px;
+    color: green;
+}
+.petunjuk {
+    color: #555;
+    font-size: 14px;
+}
+table {
+    width: 100%;
+    border-collapse: collapse;
+    background: white;
+    box-shadow: 0 4px 12px rgba(0,0,0,0.1);
+    border-radius: 10px;
+    overflow: hidden;
+    margin-top: 20px;
+}
+th, td {
+    padding: 10px 15px;
+    text-align: left;
+    border-bottom: 1px solid #ddd;
+}
+th {
+    background: #c62828;
+    color: white;
+}
+</style>
+</head>
+<body>
+
+<div class="sidebar">
+    <h2>SiUdang</h2>
+    <a href="/dashboard">🏠 Dashboard</a>
+    <a href="/coa"> 📋 COA</a>
+    <a href="/input_jurnal"> ✏ Input Transaksi</a>
+    <a href="/hitung_hpp"> 💰 Hitung HPP</a>
+    <a href="/jurnal_umum"> 📑 Jurnal Umum</a>
+    <a href="/buku_besar"> 🗂 Buku Besar</a>
+    <a href="/neraca_saldo"> ⚖ Neraca Saldo</a>
+    <a href="/buku_pembantu_penyusutan"> 🛠 Buku Pembantu Penyusutan</a>
+    <a href="/jurnal_penyesuaian"> 📝 Jurnal Penyesuaian</a>
+    <a href="/nssp"> 📚 NSSP</a>
+    <a href="/laporan_keuangan">📊 Laporan Keuangan</a>
+    <a href="/logout">🚪 Logout</a>
+</div>
+
+<div class="container">
+    <h1>🔒 Tutup Buku</h1>
+
+    {% if message %}<p class="message">{{ message }}</p>{% endif %}
+
+    <form method="POST">
+        <p class="petunjuk">
+            Saldo setiap akun pada akhir periode disimpan sebagai snapshot, lalu periode tersebut
+            dikunci: jurnal bertanggal sampai akhir periode tidak bisa ditambahkan lagi.
+            Isi <strong>YYYY-MM</strong> untuk tutup bulan atau <strong>YYYY</strong> untuk tutup tahun.
+        </p>
+        <label for="periode">Periode</label>
+        <input type="text" id="periode" name="periode" placeholder="2026-03" pattern="[0-9]{4}(-[0-9]{2})?" required>
+        <button type="submit" onclick="return confirm('Tutup periode ini? Jurnal di periode ini tidak bisa diubah lagi.')">Tutup Periode</button>
+    </form>
+
+    {% if daftar_tutup %}
+    <table>
+        <thead>
+            <tr>
+                <th>Periode</th>
+                <th>Tanggal Akhir</th>
+                <th>Ditutup Pada</th>
+            </tr>
+        </thead>
+        <tbody>
+            {% for tutup in daftar_tutup %}
+            <tr>
+                <td>{{ tutup.periode }}</td>
+                <td>{{ tutup.tanggal_akhir }}</td>
+                <td>{{ tutup.created_at }}</td>
+            </tr>
+            {% endfor %}
+        </tbody>
+    </table>
+    {% else %}
+    <p class="petunjuk">Belum ada periode yang ditutup.</p>
+    {% endif %}
+</div>
+
+</body>
+</html>
+"""
+
+# 17. Template Halaman Persediaan Perpetual
+persediaan_html = """
+<!DOCTYPE html>
+<html lang="id">
+<head>
+<meta charset="UTF-8">
+<meta name="viewport" content="width=device-width, initial-scale=1.0">
+<title>Persediaan - SiUdang</title>
+<style>
+body {
+    font-family: Poppins, sans-serif;
+    background: #f4f9f9;
+    margin: 0;
+}
+
+.sidebar {
+    width: 220px;
+    background: linear-gradient(180deg, #b8e3e0 0%, #ffe8de 100%);
+    height: 100vh;
+    position: fixed;
+    top: 0; left: 0;
+    padding: 20px;
+    color: #033E3E;
+}
+.sidebar a {
+    display: block;
+    text-decoration: none;
+    color: #033E3E;
+    margin: 10px 0;
+    padding: 10px 12px;
+    border-radius: 8px;
+    font-weight: 500;
+    transition: 0.2s;
+}
+.sidebar a:hover {
+    background: rgba(255, 255, 255, 0.4);
+}
+.container {
+    margin-left: 250px;
+    padding: 40px;
+}
+h1 {
+    color: #033E3E;
+}
+.form-grid {
+    display: grid;
+    grid-template-columns: 1fr 1fr;
+    gap: 20px;
+}
+form {
+    background: white;
+    padding: 25px;
+    border-radius: 15px;
+    box-shadow: 0 4px 12px rgba(0,0,0,0.1);
+}
+label {
+    font-weight: 600;
+    color: #055555;
+}
+input, select {
+    width: 100%;
+    padding: 10px;
+    margin: 8px 0 15px 0;
+    border: 1px solid #ccc;
+    border-radius: 8px;
+    font-size: 14px;
+    box-sizing: border-box;
+}
+input[type="checkbox"] {
+    width: auto;
+}
+button {
+    background: #3cbcb4;
+    color: white;
+    border: none;
+    padding: 10px 20px;
+    border-radius: 10px;
+    cursor: pointer;
+    font-weight: bold;
+}
+button:hover {
+    background: #2a9790;
+}
+.message {
+    font-weight: bold;
+    margin-top: 10px;
+}
+.petunjuk {
+    color: #555;
+    font-size: 14px;
+}
+table {
+    width: 100%;
+    border-collapse: collapse;
+    background: white;
+    box-shadow: 0 4px 12px rgba(0,0,0,0.1);
+    border-radius: 10px;
+    overflow: hidden;
+    margin-top: 20px;
+}
+th, td {
+    padding: 10px 15px;
+    text-align: left;
+    border-bottom: 1px solid #ddd;
+}
+th {
+    background: #3cbcb4;
+    color: white;
+}
+td.nilai {
+    text-align: right;
+}
+</style>
+</head>
+<body>
+
+<div class="sidebar">
+    <h2>SiUdang</h2>
+    <a href="/dashboard">🏠 Dashboard</a>
+    <a href="/coa"> 📋 COA</a>
+    <a href="/input_jurnal"> ✏ Input Transaksi</a>
+    <a href="/hitung_hpp"> 💰 Hitung HPP</a>
+    <a href="/jurnal_umum"> 📑 Jurnal Umum</a>
+    <a href="/buku_besar"> 🗂 Buku Besar</a>
+    <a href="/neraca_saldo"> ⚖ Neraca Saldo</a>
+    <a href="/buku_pembantu_penyusutan"> 🛠 Buku Pembantu Penyusutan</a>
+    <a href="/jurnal_penyesuaian"> 📝 Jurnal Penyesuaian</a>
+    <a href="/nssp"> 📚 NSSP</a>
+    <a href="/laporan_keuangan">📊 Laporan Keuangan</a>
+    <a href="/logout">🚪 Logout</a>
+</div>
+
+<div class="container">
+    <h1>📦 Persediaan Udang, Benur & Pakan</h1>
+
+    {% if message %}<p class="message">{{ message }}</p>{% endif %}
+
+    <div class="form-grid">
+        <form method="POST">
+            <input type="hidden" name="aksi" value="mutasi">
+            <h3>Catat Mutasi</h3>
+            <label for="item_id">Item</label>
+            <select id="item_id" name="item_id" required>
+                {% for item in items %}
+                <option value="{{ item.id }}">{{ item.kode_item }} - {{ item.nama_item }}</option>
+                {% endfor %}
+            </select>
+            <label for="tanggal">Tanggal</label>
+            <input type="date" id="tanggal" name="tanggal" required>
+            <label for="jenis">Jenis</label>
+            <select id="jenis" name="jenis">
+                <option value="masuk">Masuk (pembelian)</option>
+                <option value="keluar">Keluar (pemakaian/penjualan)</option>
+            </select>
+            <label for="qty">Kuantitas</label>
+            <input type="text" id="qty" name="qty" required>
+            <label for="harga_satuan">Harga Satuan (hanya untuk mutasi masuk)</label>
+            <input type="text" id="harga_satuan" name="harga_satuan" value="0">
+            <label for="keterangan">Keterangan</label>
+            <input type="text" id="keterangan" name="keterangan">
+            <label for="kode_akun_bayar">Akun Pembayaran (hanya untuk mutasi masuk)</label>
+            <select id="kode_akun_bayar" name="kode_akun_bayar">
+                <option value="">-</option>
+                {% for akun in akun_bayar %}
+                <option value="{{ akun.kode_akun }}">{{ akun.nama_akun }} ({{ akun.kode_akun }})</option>
+                {% endfor %}
+            </select>
+            <label><input type="checkbox" name="posting_jurnal" value="1" checked> Buat jurnal (masuk: pembelian, keluar: HPP)</label>
+            <br><br>
+            <button type="submit">Simpan Mutasi</button>
+        </form>
+
+        <form method="POST">
+            <input type="hidden" name="aksi" value="tambah_item">
+            <h3>Tambah Item</h3>
+            <label for="kode_item">Kode Item</label>
+            <input type="text" id="kode_item" name="kode_item" required>
+            <label for="nama_item">Nama Item</label>
+            <input type="text" id="nama_item" name="nama_item" required>
+            <label for="jenis_item">Jenis</label>
+            <select id="jenis_item" name="jenis">
+                {% for kode, nama in jenis_persediaan.items() %}
+                <option value="{{ kode }}">{{ nama }}</option>
+                {% endfor %}
+            </select>
+            <label for="satuan">Satuan</label>
+            <input type="text" id="satuan" name="satuan" value="kg">
+            <label for="metode">Metode Penilaian</label>
+            <select id="metode" name="metode">
+                {% for kode, nama in metode_persediaan.items() %}
+                <option value="{{ kode }}">{{ nama }}</option>
+                {% endfor %}
+            </select>
+            <label for="kode_akun">Akun Persediaan</label>
+            <select id="kode_akun" name="kode_akun">
+                <option value="">-</option>
+                {% for akun in akun_persediaan %}
+                <option value="{{ akun.kode_akun }}">{{ akun.nama_akun }} ({{ akun.kode_akun }})</option>
+                {% endfor %}
+            </select>
+            <button type="submit">Tambah Item</button>
+        </form>
+    </div>
+
+    {% if items %}
+    <table>
+        <thead>
+            <tr>
+                <th>Kode</th>
+                <th>Item</th>
+                <th>Jenis</th>
+                <th>Metode</th>
+                <th>Saldo</th>
+                <th>Nilai</th>
+            </tr>
+        </thead>
+        <tbody>
+            {% for item in items %}
+            <tr>
+                <td>{{ item.kode_item }}</td>
+                <td>{{ item.nama_item }}</td>
+                <td>{{ jenis_persediaan[item.jenis] }}</td>
+                <td>{{ metode_persediaan[item.metode] }}</td>
+                <td class="nilai">{{ "{:,.2f}".format(item.qty_saldo) }} {{ item.satuan }}</td>
+                <td class="nilai">{{ "Rp {:,.0f}".format(item.nilai_saldo) }}</td>
+            </tr>
+            {% endfor %}
+        </tbody>
+    </table>
+    {% else %}
+    <p class="petunjuk">Belum ada item persediaan.</p>
+    {% endif %}
+
+    {% if mutasi_list %}
+    <h3>Mutasi Terakhir</h3>
+    <table>
+        <thead>
+            <tr>
+                <th>Tanggal</th>
+                <th>Item</th>
+                <th>Jenis</th>
+                <th>Kuantitas</th>
+                <th>Harga Satuan</th>
+                <th>Nilai</th>
+                <th>Keterangan</th>
+            </tr>
+        </thead>
+        <tbody>
+            {% for mutasi in mutasi_list %}
+            <tr>
+                <td>{{ mutasi.tanggal }}</td>
+                <td>{{ mutasi.nama_item }}</td>
+                <td>{{ mutasi.jenis }}</td>
+                <td class="nilai">{{ "{:,.2f}".format(mutasi.qty) }}</td>
+                <td class="nilai">{{ "Rp {:,.0f}".format(mutasi.harga_satuan) }}</td>
+                <td class="nilai">{{ "Rp {:,.0f}".format(mutasi.nilai) }}</td>
+                <td>{{ mutasi.keterangan or '' }}</td>
+            </tr>
+            {% endfor %}
+        </tbody>
+    </table>
+    {% endif %}
+</div>
+
+</body>
+</html>
+"""
+
+# ---------------------------
+# REGISTRY TEMPLATE - DIKOMPILASI SEKALI SAAT STARTUP
+# ---------------------------
+
+TEMPLATES = {
+    "register.html": register_html,
+    "login.html": login_html,
+    "verify.html": verify_html,
+    "dashboard.html": dashboard_html,
+    "coa.html": coa_html,
+    "input_jurnal.html": input_jurnal_html,
+    "jurnal_umum.html": jurnal_umum_html,
+    "buku_besar.html": buku_besar_html,
+    "neraca_saldo.html": neraca_saldo_html,
+    "hpp.html": hpp_html,
+    "buku_penyusutan.html": buku_penyusutan_html,
+    "jurnal_penyesuaian.html": jurnal_penyesuaian_html,
+    "nssp.html": nssp_html,
+    "laporan_keuangan.html": laporan_keuangan_html,
+    "import_jurnal.html": import_jurnal_html,
+    "tutup_buku.html": tutup_buku_html,
+    "persediaan.html": persediaan_html,
+}
+
+# Template dilayani dari registry di atas; hasil kompilasi disimpan di cache
+# bytecode sehingga proses berikutnya tidak perlu mem-parse ulang sumbernya
+app.jinja_loader = DictLoader(TEMPLATES)
+app.jinja_options = {
+    **app.jinja_options,
+    "bytecode_cache": FileSystemBytecodeCache(os.getenv("JINJA_CACHE_DIR") or None),
+    "cache_size": len(TEMPLATES) * 2
+}
+
+def cek_template():
+    # Kompilasi semua template sekarang, supaya template rusak gagal saat startup
+    for nama in TEMPLATES:
+        try:
+            app.jinja_env.get_template(nama)
+        except TemplateError as e:
+            raise RuntimeError(f"❌ Template {nama} gagal dikompilasi: {e}") from e
+
+cek_template()
+
+# ---------------------------
+# HELPER - SALDO AKUN
+# ---------------------------
+
+def kode_dari_akun(akun_full):
+    # Ambil kode akun dari format "Nama Akun (KODE)"
+    if akun_full and '(' in akun_full:
+        return akun_full.split('(')[-1].replace(')', '').strip()
+    return ''
+
+def kode_jurnal(jurnal, sisi):
+    # Kode akun debit/kredit dari kolom terstruktur; parsing string hanya
+    # untuk baris lama yang belum di-backfill (migrasi 004)
+    return jurnal.get(f"kode_{sisi}") or kode_dari_akun(jurnal[f"akun_{sisi}"])
+
+def hitung_saldo_dari_jurnal(jurnal_list):
+    # Jumlahkan sisi debit dan kredit setiap akun dari baris-baris jurnal
+    saldo = {}
+    for jurnal in jurnal_list:
+        jumlah = jurnal["jumlah"] or 0
+        kode_debit = kode_jurnal(jurnal, "debit")
+        kode_kredit = kode_jurnal(jurnal, "kredit")
+
+        if kode_debit:
+            saldo.setdefault(kode_debit, {"saldo_debit": 0, "saldo_kredit": 0})
+            saldo[kode_debit]["saldo_debit"] += jumlah
+
+        if kode_kredit:
+            saldo.setdefault(kode_kredit, {"saldo_debit": 0, "saldo_kredit": 0})
+            saldo[kode_kredit]["saldo_kredit"] += jumlah
+    return saldo
+
+def susun_neraca_saldo(coa_list, saldo_per_kode):
+    # Gabungkan saldo per kode akun dengan data COA untuk template
+    kosong = {"saldo_debit": 0, "saldo_kredit": 0}
+    return [
+        {
+            "kode_akun": akun["kode_akun"],
+            "nama_akun": akun["nama_akun"],
+            "tipe_akun": akun["tipe_akun"],
+            "saldo_debit": saldo_per_kode.get(akun["kode_akun"], kosong)["saldo_debit"],
+            "saldo_kredit": saldo_per_kode.get(akun["kode_akun"], kosong)["saldo_kredit"]
+        }
+        for akun in coa_list
+    ]
+
+def agregat_neraca_saldo():
+    # Saldo debit/kredit per kode akun, di-GROUP BY di database (migrasi 005).
+    # Kalau RPC belum tersedia, dihitung di Python lewat ledger engine.
+    try:
+        hasil = supabase.rpc("neraca_saldo_agregat").execute()
+    except Exception as e:
+        print("RPC neraca_saldo_agregat gagal, hitung di Python:", e)
+        return ledger_engine().saldo_per_kode()
+    return {
+        baris["kode_akun"]: {
+            "saldo_debit": baris["saldo_debit"] or 0,
+            "saldo_kredit": baris["saldo_kredit"] or 0
+        }
+        for baris in (hasil.data or [])
+    }
+
+# ---------------------------
+# HELPER - OUTBOX EMAIL (SMTP)
+# ---------------------------
+
+class SMTPOutbox:
+    # Antrian email keluar yang dikirim thread latar belakang lewat satu koneksi
+    # SMTP yang tetap login. Koneksi dibuka ulang kalau terputus, pengiriman
+    # yang gagal diulang dengan jeda yang makin panjang (backoff).
+    def __init__(self, host, port, pakai_ssl, user=None, password=None,
+                 maks_antrian=100, maks_percobaan=5, idle_detik=60):
+        self.host = host
+        self.port = port
+        self.pakai_ssl = pakai_ssl
+        self.user = user
+        self.password = password
+        self.maks_percobaan = maks_percobaan
+        self.idle_detik = idle_detik
+        self.antrian = queue.Queue(maxsize=maks_antrian)
+        self.server = None
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def kirim(self, msg):
+        # Masukkan email ke antrian dan langsung kembali; False kalau antrian penuh
+        self._pastikan_jalan()
+        try:
+            self.antrian.put_nowait(msg)
+            return True
+        except queue.Full:
+            return False
+
+    def _pastikan_jalan(self):
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._worker, name="smtp-outbox", daemon=True)
+                self.thread.start()
+
+    def _sambung(self):
+        if self.pakai_ssl:
+            server = smtplib.SMTP_SSL(self.host, self.port, context=ssl.create_default_context(), timeout=30)
+        else:
+            server = smtplib.SMTP(self.host, self.port, timeout=30)
+        if self.user and self.password:
+            server.login(self.user, self.password)
+        self.server = server
+
+    def _putus(self):
+        if self.server is not None:
+            try:
+                self.server.quit()
+            except Exception:
+                pass
+            self.server = None
+
+    def _worker(self):
+        while True:
+            try:
+                msg = self.antrian.get(timeout=self.idle_detik)
+            except queue.Empty:
+                # Tutup koneksi yang menganggur; dibuka lagi saat ada email baru
+                self._putus()
+                continue
+            self._kirim_dengan_retry(msg)
+
+    def _kirim_dengan_retry(self, msg):
+        for percobaan in range(1, self.maks_percobaan + 1):
+            try:
+                if self.server is None:
+                    self._sambung()
+                self.server.send_message(msg)
+                return
+            except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused) as e:
+                # Alamat ditolak server, percuma diulang
+                print("Email ditolak:", msg["To"], e)
+                return
+            except (smtplib.SMTPException, OSError) as e:
+                print(f"Gagal kirim email ke {msg['To']} (percobaan {percobaan}):", e)
+                self._putus()
+                if percobaan < self.maks_percobaan:
+                    time.sleep(min(2 ** (percobaan - 1), 60))
+        print("❌ Email tidak terkirim setelah", self.maks_percobaan, "percobaan:", msg["To"])
+
+smtp_outbox = SMTPOutbox(
+    SMTP_HOST,
+    SMTP_PORT,
+    SMTP_SSL,
+    EMAIL_SENDER,
+    EMAIL_APP_PASSWORD,
+    maks_antrian=int(os.getenv("SMTP_OUTBOX_MAKS", "100")),
+    maks_percobaan=int(os.getenv("SMTP_MAKS_PERCOBAAN", "5"))
+)
+
+# ---------------------------
+# HELPER - CACHE COA
+# ---------------------------
+
+COA_TTL_DETIK = int(os.getenv("COA_TTL_DETIK", "300"))
+
+_coa_cache = {"snapshot": None, "dimuat": 0}
+_coa_lock = threading.Lock()
+
+def tampilan_akun(akun):
+    # Format tampilan akun yang dipakai dropdown dan tabel jurnal
+    return f"{akun['nama_akun']} ({akun['kode_akun']})"
+
+def _coa_snapshot():
+    # Satu request selalu melihat COA yang sama (disimpan di g),
+    # antar request COA diambil dari cache proses selama belum kedaluwarsa
+    if has_app_context() and "coa_snapshot" in g:
+        return g.coa_snapshot
+
+    with _coa_lock:
+        snapshot = _coa_cache["snapshot"]
+        if snapshot is None or time.time() - _coa_cache["dimuat"] > COA_TTL_DETIK:
+            coa_data = supabase.table("coa").select("*").execute()
+            coa_list = coa_data.data if coa_data.data else []
+            snapshot = {
+                "list": coa_list,
+                "per_kode": {akun["kode_akun"]: akun for akun in coa_list},
+                "per_tampilan": {tampilan_akun(akun): akun for akun in coa_list}
+            }
+            _coa_cache["snapshot"] = snapshot
+            _coa_cache["dimuat"] = time.time()
+
+    if has_app_context():
+        g.coa_snapshot = snapshot
+    return snapshot
+
+def ambil_coa():
+    return _coa_snapshot()["list"]
+
+def coa_per_kode():
+    return _coa_snapshot()["per_kode"]
+
+def coa_per_tampilan():
+    return _coa_snapshot()["per_tampilan"]
+
+def invalidasi_coa():
+    # Dipanggil setiap kali tabel coa diubah
+    with _coa_lock:
+        _coa_cache["snapshot"] = None
+    if has_app_context():
+        g.pop("coa_snapshot", None)
+
+# ---------------------------
+# HELPER - VERSI LEDGER & CONDITIONAL GET (ETAG)
+# ---------------------------
+
+# Sidik isi template: ETag berubah setelah deploy yang mengubah tampilan,
+# walaupun versi ledger-nya sama
+SIDIK_TEMPLATE = hashlib.sha1("".join(TEMPLATES.values()).encode()).hexdigest()[:8]
+
+_versi_lokal = {"versi": None, "sendiri": set()}
+_versi_lokal_lock = threading.Lock()
+
+def catat_versi_sendiri(jurnal_list):
+    # Versi ledger yang dihasilkan jurnal tulisan proses ini (kolom jurnal.versi,
+    # migrasi 020). Jurnal itu sudah ditambahkan ke engine lewat ledger_tambah.
+    versi = {jurnal["versi"] for jurnal in jurnal_list if jurnal.get("versi")}
+    with _versi_lokal_lock:
+        _versi_lokal["sendiri"] |= versi
+
+def sinkronkan_cache_lokal(versi):
+    # Ledger engine, COA, penyesuaian, tutup buku dan saldo periode tertutup
+    # di-cache per proses. Kalau versi ledger di database lebih baru dari yang
+    # terakhir dilihat proses ini dan ada kenaikan dari penulis lain (worker lain,
+    # CLI, COA, penyesuaian, tutup buku), semuanya dibuang supaya halaman yang
+    # diberi versi ini dihitung dari data yang paling tidak sebaru versinya. Kenaikan yang seluruhnya berasal dari jurnal
+    # tulisan proses ini sendiri tidak membuang engine (sudah ditambah bertahap).
+    # Pemuatan cache memegang lock cache-nya, jadi pemuatan yang sedang berjalan
+    # selesai dulu lalu ikut dibuang.
+    with _versi_lokal_lock:
+        terakhir = _versi_lokal["versi"]
+        if terakhir is not None and versi <= terakhir:
+            return
+        sendiri = _versi_lokal["sendiri"]
+        milik_sendiri = terakhir is not None and all(v in sendiri for v in range(terakhir + 1, versi + 1))
+        _versi_lokal["versi"] = versi
+        _versi_lokal["sendiri"] = {v for v in sendiri if v > versi}
+    if milik_sendiri:
+        return
+    invalidasi_coa()
+    invalidasi_penyesuaian()
+    invalidasi_tutup_buku()
+    invalidasi_saldo_tertutup()
+
+def versi_ledger():
+    # Versi ledger dari database (migrasi 015), naik setiap data ledger berubah.
+    # Cache lokal yang lebih lama dari versi ini dibuang dulu (sinkronkan_cache_lokal).
+    # None kalau tabelnya belum ada atau tidak bisa dibaca.
+    try:
+        hasil = supabase.table("ledger_version").select("versi, diubah_pada").eq("id", 1).execute()
+    except Exception as e:
+        print("Error versi ledger:", e)
+        return None
+    if not hasil.data:
+        return None
+    sinkronkan_cache_lokal(hasil.data[0]["versi"])
+    return hasil.data[0]
+
+def respons_bersyarat(view):
+    # Halaman laporan diberi ETag + Last-Modified dari versi ledger. Kalau browser
+    # mengirim If-None-Match yang masih sama, jawab 304 sebelum membaca data apa pun.
+    @wraps(view)
+    def bungkus(*args, **kwargs):
+        if "email" not in session:
+            return view(*args, **kwargs)
+
+        versi = versi_ledger()
+        if versi is None:
+            return view(*args, **kwargs)
+        etag = f"{versi['versi']}-{SIDIK_TEMPLATE}"
+
+        if request.if_none_match.contains(etag):
+            respons = app.response_class(status=304)
+        else:
+            respons = make_response(view(*args, **kwargs))
+            # Halaman yang gagal membaca data tidak boleh ditandai dengan versi ini
+            if respons.status_code != 200 or g.get("laporan_gagal"):
+                return respons
+
+        respons.set_etag(etag)
+        respons.last_modified = datetime.datetime.fromisoformat(versi["diubah_pada"])
+        # Isi halaman hanya untuk pengguna yang login, dan selalu divalidasi ulang
+        respons.headers["Cache-Control"] = "private, no-cache"
+        return respons
+
+    return bungkus
+
+# ---------------------------
+# HELPER - CACHE HALAMAN LAPORAN (LRU + SINGLE-FLIGHT)
+# ---------------------------
+
+LAPORAN_CACHE_MB = float(os.getenv("LAPORAN_CACHE_MB", "32"))
+LAPORAN_TUNGGU_DETIK = float(os.getenv("LAPORAN_TUNGGU_DETIK", "30"))
+
+class CacheLaporan:
+    # Hasil render halaman laporan per (route, parameter, versi ledger), disimpan
+    # sebagai (isi, status, header). Entri paling lama tidak dipakai dibuang kalau
+    # total ukuran isi melewati batas.
+    # Beberapa request yang meleset untuk kunci yang sama hanya menghitung sekali:
+    # request pertama menghitung, sisanya menunggu hasilnya paling lama tunggu_detik.
+
+    def __init__(self, batas_byte, tunggu_detik):
+        self.batas_byte = batas_byte
+        self.tunggu_detik = tunggu_detik
+        self.data = OrderedDict()
+        self.ukuran = 0
+        self.berjalan = {}
+        self.lock = threading.Lock()
+
+    def ambil(self, kunci, hitung):
+        # hitung() mengembalikan (hasil, boleh_disimpan). Yang ikut menunggu hanya
+        # memakai hasil yang boleh disimpan; kalau hasil pemilik gagal atau terlalu
+        # lama, mereka menghitung sendiri.
+        with self.lock:
+            if kunci in self.data:
+                self.data.move_to_end(kunci)
+                return self.data[kunci]
+            tugas = self.berjalan.get(kunci)
+            pemilik = tugas is None
+            if pemilik:
+                tugas = {"selesai": threading.Event(), "isi": None}
+                self.berjalan[kunci] = tugas
+
+        if not pemilik:
+            if tugas["selesai"].wait(self.tunggu_detik) and tugas["isi"] is not None:
+                return tugas["isi"]
+            return self._hitung(kunci, hitung)[0]
+
+        try:
+            hasil, boleh_disimpan = self._hitung(kunci, hitung)
+            if boleh_disimpan:
+                tugas["isi"] = hasil
+            return hasil
+        finally:
+            with self.lock:
+                self.berjalan.pop(kunci, None)
+            tugas["selesai"].set()
+
+    def _hitung(self, kunci, hitung):
+        hasil, boleh_disimpan = hitung()
+        if boleh_disimpan:
+            self._simpan(kunci, hasil)
+        return hasil, boleh_disimpan
+
+    def _simpan(self, kunci, hasil):
+        ukuran = len(hasil[0])
+        if ukuran > self.batas_byte:
+            return
+        with self.lock:
+            if kunci in self.data:
+                return
+            self.data[kunci] = hasil
+            self.ukuran += ukuran
+            while self.ukuran > self.batas_byte:
+                _, lama = self.data.popitem(last=False)
+                self.ukuran -= len(lama[0])
+
+cache_laporan = CacheLaporan(int(LAPORAN_CACHE_MB * 1024 * 1024), LAPORAN_TUNGGU_DETIK)
+
+def laporan_tercache(view):
+    # Halaman laporan dilayani dari cache selama versi ledger belum berubah.
+    # Versi dibaca sebelum menghitung, jadi isi yang disimpan tidak pernah lebih
+    # lama dari versinya. Tanggal hari ini ikut di kunci karena periode default
+    # (bulan berjalan) bergantung padanya.
+    @wraps(view)
+    def bungkus(*args, **kwargs):
+        if "email" not in session:
+            return view(*args, **kwargs)
+
+        versi = versi_ledger()
+        if versi is None:
+            return view(*args, **kwargs)
+        kunci = (
+            request.path,
+            tuple(sorted(request.args.items(multi=True))),
+            versi["versi"],
+            datetime.date.today().isoformat()
+        )
+
+        # Request yang menghitung sendiri mengembalikan respons aslinya apa adanya;
+        # hanya respons 200 yang berhasil membaca data yang disimpan dan dibagi
+        asli = {}
+
+        def hitung():
+            respons = make_response(view(*args, **kwargs))
+            asli["respons"] = respons
+            boleh_disimpan = respons.status_code == 200 and not g.get("laporan_gagal")
+            return (respons.get_data(), respons.status_code, list(respons.headers)), boleh_disimpan
+
+        isi, status, header = cache_laporan.ambil(kunci, hitung)
+        if "respons" in asli:
+            return asli["respons"]
+        return app.response_class(isi, status=status, headers=header)
+
+    return bungkus
+
+# ---------------------------
+# HELPER - TUTUP BUKU (SNAPSHOT SALDO PER PERIODE)
+# ---------------------------
+
+_tutup_buku_cache = {"data": None, "dimuat": 0}
+_tutup_buku_lock = threading.Lock()
+
+def daftar_tutup_buku():
+    # Periode yang sudah ditutup, terbaru dulu. Jarang berubah, jadi di-cache seperti COA
+    with _tutup_buku_lock:
+        if _tutup_buku_cache["data"] is None or time.time() - _tutup_buku_cache["dimuat"] > COA_TTL_DETIK:
+            hasil = supabase.table("tutup_buku").select("periode, tanggal_akhir, created_at").order("tanggal_akhir", desc=True).execute()
+            _tutup_buku_cache["data"] = hasil.data or []
+            _tutup_buku_cache["dimuat"] = time.time()
+        return _tutup_buku_cache["data"]
+
+def tutup_buku_terakhir(sebelum=''):
+    # Penutupan terakhir (atau terakhir yang berakhir sebelum tanggal tertentu), None kalau belum ada
+    for tutup in daftar_tutup_buku():
+        if not sebelum or tutup["tanggal_akhir"] < sebelum:
+            return tutup
+    return None
+
+def cek_periode_terbuka(tanggal):
+    # Jurnal tidak boleh masuk ke periode yang sudah ditutup (juga dijaga trigger di database)
+    tutup = tutup_buku_terakhir()
+    if tutup and tanggal <= tutup["tanggal_akhir"]:
+        raise ValueError(f"Periode sampai {tutup['tanggal_akhir']} sudah ditutup")
+
+def hari_berikutnya(tanggal):
+    return (datetime.date.fromisoformat(tanggal) + datetime.timedelta(days=1)).isoformat()
+
+def akhir_periode(periode):
+    # "2026-03" -> "2026-03-31" (tutup bulan), "2026" -> "2026-12-31" (tutup tahun)
+    try:
+        if len(periode) == 4:
+            tahun, bulan = int(periode), 12
+        else:
+            tahun, bulan = (int(bagian) for bagian in periode.split('-'))
+        datetime.date(tahun, bulan, 1)
+        awal_bulan_berikut = datetime.date(tahun + bulan // 12, bulan % 12 + 1, 1)
+    except ValueError:
+        raise ValueError(f"Format periode tidak valid: {periode} (pakai YYYY-MM atau YYYY)")
+    return (awal_bulan_berikut - datetime.timedelta(days=1)).isoformat()
+
+def saldo_snapshot(periode):
+    # Saldo kumulatif per kode akun pada akhir periode yang sudah ditutup
+    hasil = supabase.table("saldo_periode").select("kode_akun, saldo_debit, saldo_kredit").eq("periode", periode).execute()
+    return {
+        baris["kode_akun"]: {
+            "saldo_debit": baris["saldo_debit"] or 0,
+            "saldo_kredit": baris["saldo_kredit"] or 0
+        }
+        for baris in (hasil.data or [])
+    }
+
+def invalidasi_tutup_buku():
+    # Setelah tutup buku, ledger engine dimuat ulang mulai dari snapshot baru
+    with _tutup_buku_lock:
+        _tutup_buku_cache["data"] = None
+    with _ledger_lock:
+        _ledger["engine"] = None
+
+def tutup_periode(periode):
+    # Tulis snapshot saldo akhir periode dan kunci periode tersebut (migrasi 007)
+    periode = periode.strip()
+    tanggal_akhir = akhir_periode(periode)
+    if tanggal_akhir >= datetime.date.today().isoformat():
+        raise ValueError(f"Periode {periode} belum berakhir")
+    cek_periode_terbuka(tanggal_akhir)
+
+    hasil = supabase.rpc("tutup_periode", {"p_periode": periode, "p_tanggal_akhir": tanggal_akhir}).execute()
+    invalidasi_tutup_buku()
+    return hasil.data or []
+
+# ---------------------------
+# HELPER - PARAMETER & PAGINASI
+# ---------------------------
+
+JURNAL_PER_HALAMAN = 50
+JURNAL_PER_HALAMAN_MAKS = 500
+
+def ambil_tanggal_param(nama):
+    # Ambil parameter tanggal (YYYY-MM-DD) dari URL, kosong kalau tidak valid
+    nilai = request.args.get(nama, '').strip()
+    try:
+        return datetime.date.fromisoformat(nilai).isoformat()
+    except ValueError:
+        return ''
+
+def ambil_angka_param(nama, default, minimum, maksimum):
+    # Ambil parameter angka dari URL dan batasi ke rentang yang diizinkan
+    try:
+        nilai = int(request.args.get(nama, default))
+    except (TypeError, ValueError):
+        nilai = default
+    return max(minimum, min(nilai, maksimum))
+
+# ---------------------------
+# HELPER - BACA JURNAL BERHALAMAN (MELEWATI BATAS MAX-ROWS POSTGREST)
+# ---------------------------
+
+# PostgREST memotong respons di max-rows server (default Supabase 1000 baris),
+# jadi jurnal dibaca per potongan .range() yang ukurannya tidak melebihi batas itu
+SUPABASE_MAX_ROWS = int(os.getenv("SUPABASE_MAX_ROWS", "1000"))
+JURNAL_WORKER_BACA = int(os.getenv("JURNAL_WORKER_BACA", "4"))
+
+_pool_baca = ThreadPoolExecutor(max_workers=JURNAL_WORKER_BACA, thread_name_prefix="baca-jurnal")
+
+def baca_jurnal(kolom="*", filter_query=None, urutan=("id",), ukuran_halaman=SUPABASE_MAX_ROWS, tabel="jurnal"):
+    # Generator baris jurnal: hitung jumlah baris dulu, lalu ambil potongan
+    # .range() secara paralel dan hasilkan barisnya sesuai urutan. Hanya
+    # beberapa potongan yang ditahan di memori pada satu waktu.
+    # Default urut per id: baris baru selalu di belakang, jadi potongan tidak
+    # bergeser walaupun ada insert selama pembacaan.
+    def query(select, **opsi):
+        q = supabase.table(tabel).select(select, **opsi)
+        return filter_query(q) if filter_query else q
+
+    total = query("id", count="exact").limit(1).execute().count or 0
+
+    def ambil(mulai):
+        q = query(kolom)
+        for kolom_urut in urutan:
+            q = q.order(kolom_urut)
+        return q.range(mulai, mulai + ukuran_halaman - 1).execute().data or []
+
+    potongan = iter(range(0, total, ukuran_halaman))
+    berjalan = deque()
+    for mulai in potongan:
+        berjalan.append(_pool_baca.submit(ambil, mulai))
+        if len(berjalan) >= JURNAL_WORKER_BACA * 2:
+            break
+
+    while berjalan:
+        data = berjalan.popleft().result()
+        mulai = next(potongan, None)
+        if mulai is not None:
+            berjalan.append(_pool_baca.submit(ambil, mulai))
+        yield from data
+
+# ---------------------------
+# HELPER - QUERY PARALEL DALAM SATU REQUEST
+# ---------------------------
+
+_pool_query = ThreadPoolExecutor(max_workers=int(os.getenv("QUERY_WORKER", "8")), thread_name_prefix="query")
+
+def jalankan_paralel(timeout=QUERY_TIMEOUT_DETIK, **tugas):
+    # Jalankan beberapa query yang saling independen bersamaan, sehingga laporan
+    # menunggu kira-kira satu round trip. Setiap query dibatasi timeout (client
+    # HTTP juga memutus query yang macet, jadi worker tidak ikut tertahan);
+    # TimeoutError atau error dari query diteruskan ke route pemanggil.
+    futures = {nama: _pool_query.submit(fungsi) for nama, fungsi in tugas.items()}
+    batas = time.monotonic() + timeout
+    hasil = {}
+    try:
+        for nama, future in futures.items():
+            hasil[nama] = future.result(timeout=max(0, batas - time.monotonic()))
+    except BaseException:
+        for future in futures.values():
+            future.cancel()
+        raise
+    return hasil
+
+# ---------------------------
+# HELPER - BUKU BESAR
+# ---------------------------
+
+KOLOM_BUKU_BESAR = "id, tanggal, keterangan, akun_debit, akun_kredit, kode_debit, kode_kredit, jumlah"
+
+def nilai_filter_postgrest(nilai):
+    # Bungkus nilai dengan tanda kutip supaya koma dan kurung aman di filter or_()
+    return '"' + str(nilai).replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+def filter_kode_jurnal(kode_akun):
+    # Filter baris jurnal yang menyentuh akun tertentu di sisi debit atau kredit
+    nilai = nilai_filter_postgrest(kode_akun)
+    return f"kode_debit.eq.{nilai},kode_kredit.eq.{nilai}"
+
+def saldo_awal_akun(kode_akun, sebelum):
+    # Saldo akun sebelum tanggal tertentu, dihitung sebagai agregat di database
+    hasil = supabase.rpc("saldo_awal_akun", {"p_kode": kode_akun, "p_sebelum": sebelum}).execute()
+    baris = hasil.data[0] if hasil.data else {}
+    return (baris.get("total_debit") or 0) - (baris.get("total_kredit") or 0)
+
+def buku_besar_dari_database(selected_kode, dari='', sampai=''):
+    # Buku besar satu akun langsung dari database: hanya baris akun tersebut
+    # di jendela tanggal, saldo awal dari agregat saldo_awal_akun.
+    # Tanpa tanggal awal, mulai dari periode terbuka (saldo awal = snapshot tutup buku).
+    if not dari:
+        tutup = tutup_buku_terakhir()
+        if tutup:
+            dari = hari_berikutnya(tutup["tanggal_akhir"])
+
+    def filter_query(query):
+        query = query.or_(filter_kode_jurnal(selected_kode))
+        if dari:
+            query = query.gte("tanggal", dari)
+        if sampai:
+            query = query.lte("tanggal", sampai)
+        return query
+
+    jurnal_list = sorted(
+        baca_jurnal(KOLOM_BUKU_BESAR, filter_query),
+        key=lambda jurnal: (jurnal["tanggal"], jurnal["id"])
+    )
+
+    saldo_awal = saldo_awal_akun(selected_kode, dari) if dari else 0
+    saldo = saldo_awal
+    buku_besar_data = []
+    for jurnal in jurnal_list:
+        for tipe, tanda in (("debit", 1), ("kredit", -1)):
+            if kode_jurnal(jurnal, tipe) != selected_kode:
+                continue
+            akun = jurnal[f"akun_{tipe}"]
+            saldo += tanda * jurnal["jumlah"]
+            buku_besar_data.append({
+                "tanggal": jurnal["tanggal"],
+                "keterangan": jurnal["keterangan"],
+                "tipe": tipe,
+                "jumlah": jurnal["jumlah"],
+                "saldo_akumulasi": saldo,
+                "akun": akun
+            })
+
+    total_debit = sum(item["jumlah"] for item in buku_besar_data if item["tipe"] == "debit")
+    total_kredit = sum(item["jumlah"] for item in buku_besar_data if item["tipe"] == "kredit")
+    return {
+        "buku_besar_data": buku_besar_data,
+        "total_debit": total_debit,
+        "total_kredit": total_kredit,
+        "saldo_awal": saldo_awal,
+        "saldo_akhir": saldo
+    }
+
+# ---------------------------
+# HELPER - KLASIFIKASI TRANSAKSI
+# ---------------------------
+
+KATA_PERSEDIAAN_AWAL = ['persediaan awal', 'saldo awal', 'stok awal']
+KATA_PEMBELIAN = ['pembelian', 'beli udang', 'beli bibit']
+KATA_PERSEDIAAN_AKHIR = ['persediaan akhir', 'stock opname', 'penyesuaian persediaan']
+KATA_ASET_TETAP = ['peralatan', 'kendaraan', 'bangunan', 'mesin', 'aset', 'inventaris']
+KATA_PEROLEHAN_ASET = ['pembelian', 'beli', 'perolehan']
+
+# Kategori jurnal ditentukan sekali saat baris ditulis dan disimpan di kolom
+# jurnal.kategori (migrasi 013), jadi laporan cukup memfilter kategori di database.
+# Semua kata kunci keterangan digabung dalam satu regex; lookahead supaya kata
+# kunci yang bertumpuk (misal "pembelian" dan "beli") tetap terbaca semua.
+POLA_KETERANGAN = re.compile("(?=" + "|".join(
+    f"(?P<{nama}>{'|'.join(map(re.escape, kata))})"
+    for nama, kata in (
+        ("persediaan_awal", KATA_PERSEDIAAN_AWAL),
+        ("pembelian", KATA_PEMBELIAN),
+        ("persediaan_akhir", KATA_PERSEDIAAN_AKHIR),
+        ("perolehan", KATA_PEROLEHAN_ASET),
+    )
+) + ")")
+
+KATEGORI_HPP = ("persediaan_awal", "pembelian", "persediaan_akhir")
+
+def klasifikasi_jurnal(keterangan, akun_debit, kode_debit, akun_aset):
+    # Kategori satu baris jurnal, atau None kalau bukan transaksi persediaan/aset tetap
+    kata = {cocok.lastgroup for cocok in POLA_KETERANGAN.finditer((keterangan or '').lower())}
+    akun_debit = (akun_debit or '').lower()
+
+    if "persediaan_awal" in kata:
+        if 'persediaan' in akun_debit:
+            return "persediaan_awal"
+    elif "pembelian" in kata:
+        if 'persediaan' in akun_debit or 'pembelian' in akun_debit:
+            return "pembelian"
+    elif "persediaan_akhir" in kata:
+        if 'persediaan' in akun_debit:
+            return "persediaan_akhir"
+
+    if kode_debit in akun_aset and kata & {"pembelian", "perolehan"}:
+        return "perolehan_aset"
+    return None
+
+def beri_kategori(baris_list, keterangan=None):
+    # Isi kolom kategori untuk baris jurnal yang akan ditulis
+    akun_aset = akun_aset_tetap()
+    for baris in baris_list:
+        baris["kategori"] = klasifikasi_jurnal(
+            keterangan if keterangan is not None else baris.get("keterangan"),
+            baris.get("akun_debit"),
+            baris.get("kode_debit"),
+            akun_aset
+        )
+    return baris_list
+
+# ---------------------------
+# HELPER - POSTING & IMPORT JURNAL
+# ---------------------------
+
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "500"))
+IMPORT_EKSTENSI = {".csv", ".xlsx"}
+IMPORT_KOLOM = ["tanggal", "akun_debit", "akun_kredit", "keterangan", "jumlah"]
+
+def rupiah(nilai):
+    # Semua jumlah uang disimpan dan dijumlahkan sebagai rupiah bulat (int),
+    # pecahan dibulatkan setengah ke atas
+    if isinstance(nilai, int):
+        return nilai
+    return int(Decimal(str(nilai)).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+POLA_RIBUAN = {
+    ".": re.compile(r"\d{1,3}(\.\d{3})+"),
+    ",": re.compile(r"\d{1,3}(,\d{3})+")
+}
+
+def parse_jumlah(nilai):
+    # "Rp 1.500.000" -> 1500000; "1.500,50" -> 1501; angka dari XLSX dibulatkan ke rupiah.
+    # Format titik-desimal juga diterima: "1500000.00", "1,500,000.50".
+    # Yang tidak bisa dipastikan (mis. "1.5000", "1,500") ditolak, bukan ditebak.
+    if isinstance(nilai, (int, float)):
+        return rupiah(nilai)
+    teks = str(nilai).strip().replace("Rp", "").replace(" ", "")
+    bulat, desimal = teks, ""
+    if "." in teks and "," in teks:
+        # Pemisah yang muncul terakhir adalah desimal, yang lain ribuan
+        pemisah_desimal = "," if teks.rfind(",") > teks.rfind(".") else "."
+        bulat, desimal = teks.rsplit(pemisah_desimal, 1)
+        pemisah_ribuan = "." if pemisah_desimal == "," else ","
+        if not POLA_RIBUAN[pemisah_ribuan].fullmatch(bulat):
+            raise ValueError(f"Format jumlah tidak valid: {nilai}")
+        bulat = bulat.replace(pemisah_ribuan, "")
+    elif teks.count(".") == 1 and re.fullmatch(r"\d+\.\d{1,2}", teks):
+        # Satu titik diikuti 1-2 angka: desimal ("1500.50")
+        bulat, desimal = teks.split(".")
+    elif "." in teks or teks.count(",") > 1:
+        # Titik (atau koma lebih dari satu) sebagai pemisah ribuan: kelompok harus 3 angka
+        pemisah_ribuan = "." if "." in teks else ","
+        if not POLA_RIBUAN[pemisah_ribuan].fullmatch(teks):
+            raise ValueError(f"Format jumlah tidak valid: {nilai}")
+        bulat = teks.replace(pemisah_ribuan, "")
+    elif "," in teks:
+        # Satu koma diikuti 1-2 angka: desimal (format Indonesia, "1500,5").
+        # Tiga angka sesudah koma bisa ribuan atau desimal, jadi ditolak.
+        if not re.fullmatch(r"\d+,\d{1,2}", teks):
+            raise ValueError(f"Format jumlah tidak valid: {nilai}")
+        bulat, desimal = teks.split(",")
+    if not bulat.isdigit() or (desimal and not desimal.isdigit()):
+        raise ValueError(f"Format jumlah tidak valid: {nilai}")
+    return rupiah(f"{bulat}.{desimal or 0}")
+
+def parse_kuantitas(nilai):
+    # Kuantitas persediaan boleh pecahan: "12,5" atau "12.5"
+    return float(str(nilai).strip().replace(",", "."))
+
+def parse_tanggal(nilai):
+    # Terima date/datetime (XLSX), "YYYY-MM-DD" atau "DD/MM/YYYY"
+    if isinstance(nilai, datetime.datetime):
+        return nilai.date().isoformat()
+    if isinstance(nilai, datetime.date):
+        return nilai.isoformat()
+    teks = str(nilai).strip()
+    for fmt in ("%Y-%m-%d", "%d/%m/%Y"):
+        try:
+            return datetime.datetime.strptime(teks, fmt).date().isoformat()
+        except ValueError:
+            pass
+    raise ValueError(f"format tanggal tidak dikenal: {teks}")
+
+def cari_akun(nilai):
+    # Akun boleh ditulis sebagai kode ("111") atau "Nama Akun (KODE)"
+    teks = str(nilai or '').strip()
+    return coa_per_kode().get(teks) or coa_per_tampilan().get(teks)
+
+def setelah_posting(tersimpan):
+    # Perbarui ledger engine dan register aset tetap sekali untuk seluruh baris yang tersimpan.
+    # saldo_akun sudah diperbarui trigger jurnal di transaksi yang sama (migrasi 019).
+    if not tersimpan:
+        return
+    ledger_tambah(tersimpan)
+    catat_versi_sendiri(tersimpan)
+    try:
+        daftarkan_aset_tetap(tersimpan)
+    except Exception as e:
+        print("Error aset_tetap:", e)
+        print("Jalankan `flask --app siudang rebuild-aset-tetap` untuk melengkapi register.")
+
+def simpan_jurnal_batch(baris_list):
+    # Simpan banyak baris jurnal dalam satu insert, kategori diisi sebelum ditulis
+    response = supabase.table("jurnal").insert(beri_kategori(baris_list)).execute()
+    tersimpan = response.data or []
+    setelah_posting(tersimpan)
+    return tersimpan
+
+def pasangkan_baris_majemuk(baris_list):
+    # Ubah baris jurnal majemuk (akun, debit/kredit, jumlah) menjadi pasangan
+    # debit-kredit. Sisi debit dan kredit dipasangkan berurutan (greedy), jadi
+    # N baris menghasilkan paling banyak N-1 pasangan dan setiap akun tetap
+    # menerima jumlah yang sama. Laporan yang membaca akun_debit/akun_kredit
+    # tidak perlu diubah.
+    debit = deque([akun, jumlah] for akun, jenis, jumlah in baris_list if jenis == "debit")
+    kredit = deque([akun, jumlah] for akun, jenis, jumlah in baris_list if jenis == "kredit")
+
+    pasangan = []
+    while debit and kredit:
+        akun_debit, sisa_debit = debit[0]
+        akun_kredit, sisa_kredit = kredit[0]
+        jumlah = min(sisa_debit, sisa_kredit)
+        pasangan.append({
+            "akun_debit": tampilan_akun(akun_debit),
+            "akun_kredit": tampilan_akun(akun_kredit),
+            "kode_debit": akun_debit["kode_akun"],
+            "kode_kredit": akun_kredit["kode_akun"],
+            "jumlah": jumlah
+        })
+        debit[0][1] -= jumlah
+        kredit[0][1] -= jumlah
+        if debit[0][1] == 0:
+            debit.popleft()
+        if kredit[0][1] == 0:
+            kredit.popleft()
+    return pasangan
+
+def simpan_jurnal_majemuk(tanggal, keterangan, baris_list):
+    # Jurnal majemuk: cek debit = kredit di memori, lalu header dan semua
+    # baris ditulis dalam satu RPC transaksional (migrasi 006)
+    if len(baris_list) < 2:
+        raise ValueError("Jurnal membutuhkan minimal satu baris debit dan satu baris kredit")
+    if any(jumlah <= 0 for akun, jenis, jumlah in baris_list):
+        raise ValueError("Jumlah setiap baris harus lebih dari nol")
+
+    total_debit = sum(jumlah for akun, jenis, jumlah in baris_list if jenis == "debit")
+    total_kredit = sum(jumlah for akun, jenis, jumlah in baris_list if jenis == "kredit")
+    if not total_debit or total_debit != total_kredit:
+        raise ValueError(f"Total debit (Rp {total_debit:,.0f}) tidak sama dengan total kredit (Rp {total_kredit:,.0f})")
+    cek_periode_terbuka(tanggal)
+
+    response = supabase.rpc("posting_jurnal", {
+        "p_tanggal": tanggal,
+        "p_keterangan": keterangan,
+        "p_baris": beri_kategori(pasangkan_baris_majemuk(baris_list), keterangan)
+    }).execute()
+    tersimpan = response.data or []
+    setelah_posting(tersimpan)
+    return tersimpan
+
+def baca_baris_csv(path):
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        for nomor, baris in enumerate(csv.DictReader(f), start=2):
+            yield nomor, {(kunci or '').strip().lower(): nilai for kunci, nilai in baris.items()}
+
+def baca_baris_xlsx(path):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ValueError("Import XLSX membutuhkan paket openpyxl (pip install openpyxl)")
+
+    # read_only: baris dibaca bertahap, file besar tidak dimuat sekaligus
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(kolom or '').strip().lower() for kolom in next(rows, [])]
+        for nomor, baris in enumerate(rows, start=2):
+            if any(nilai is not None for nilai in baris):
+                yield nomor, dict(zip(header, baris))
+    finally:
+        workbook.close()
+
+def import_jurnal_file(path, batch_size=IMPORT_BATCH_SIZE):
+    # Validasi setiap baris terhadap COA di memori dan simpan per batch.
+    # Hasil: jumlah baris tersimpan dan daftar kesalahan per baris.
+    pembaca = baca_baris_xlsx if path.lower().endswith(".xlsx") else baca_baris_csv
+    errors = []
+    tersimpan = 0
+    batch = []
+    nomor_batch = []
+    sekarang = str(datetime.datetime.now())
+
+    def simpan_batch():
+        nonlocal tersimpan
+        try:
+            tersimpan += len(simpan_jurnal_batch(batch))
+        except Exception as e:
+            print("Error import batch:", e)
+            errors.extend({"baris": nomor, "pesan": "Gagal disimpan ke database"} for nomor in nomor_batch)
+        batch.clear()
+        nomor_batch.clear()
+
+    for nomor, baris in pembaca(path):
+        kolom_kosong = [kolom for kolom in IMPORT_KOLOM if baris.get(kolom) in (None, '')]
+        if kolom_kosong:
+            errors.append({"baris": nomor, "pesan": "Kolom kosong: " + ", ".join(kolom_kosong)})
+            continue
+        try:
+            tanggal = parse_tanggal(baris["tanggal"])
+            jumlah = parse_jumlah(baris["jumlah"])
+        except ValueError as e:
+            errors.append({"baris": nomor, "pesan": f"Tanggal/jumlah tidak valid ({e})"})
+            continue
+        if jumlah <= 0:
+            errors.append({"baris": nomor, "pesan": "Jumlah harus lebih dari nol"})
+            continue
+        try:
+            cek_periode_terbuka(tanggal)
+        except ValueError as e:
+            errors.append({"baris": nomor, "pesan": str(e)})
+            continue
+
+        akun_debit = cari_akun(baris["akun_debit"])
+        akun_kredit = cari_akun(baris["akun_kredit"])
+        if not akun_debit or not akun_kredit:
+            errors.append({"baris": nomor, "pesan": "Akun tidak terdaftar di COA"})
+            continue
+
+        batch.append({
+            "tanggal": tanggal,
+            "akun_debit": tampilan_akun(akun_debit),
+            "akun_kredit": tampilan_akun(akun_kredit),
+            "kode_debit": akun_debit["kode_akun"],
+            "kode_kredit": akun_kredit["kode_akun"],
+            "keterangan": str(baris["keterangan"]).strip(),
+            "jumlah": jumlah,
+            "created_at": sekarang
+        })
+        nomor_batch.append(nomor)
+        if len(batch) >= batch_size:
+            simpan_batch()
+
+    if batch:
+        simpan_batch()
+    return tersimpan, errors
+
+# ---------------------------
+# LEDGER ENGINE - JURNAL DIMUAT SEKALI, DIPAKAI SEMUA LAPORAN
+# ---------------------------
+
+LEDGER_TTL_DETIK = int(os.getenv("LEDGER_TTL_DETIK", "60"))
+
+def jumlah_per_akun(akun, jumlah, jumlah_akun, pakai_numpy=True):
+    # Total jumlah per id akun. Kalau numpy terpasang, array akun/jumlah dibaca
+    # langsung dari buffer-nya (tanpa salin) lalu dijumlahkan per akun dengan
+    # np.add.at di int64, jadi totalnya tetap tepat sampai rupiah terakhir.
+    if pakai_numpy and len(jumlah):
+        try:
+            import numpy as np
+        except ImportError:
+            pass
+        else:
+            total = np.zeros(jumlah_akun, dtype=np.int64)
+            np.add.at(total, np.frombuffer(akun, dtype=np.int32), np.frombuffer(jumlah, dtype=np.int64))
+            return total.tolist()
+
+    total = [0] * jumlah_akun
+    for akun_id, nilai in zip(akun, jumlah):
+        total[akun_id] += nilai
+    return total
+
+class LedgerEngine:
+    # Jurnal disimpan per kolom: akun jadi id integer (string "Nama Akun (KODE)"
+    # cukup di-parse sekali per akun), id akun (int32) dan jumlah (rupiah, int64)
+    # disimpan di array, bukan objek Python per baris.
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.akun_id = {}
+        self.akun_teks = []
+        self.akun_kode = []
+        self.jurnal_id = array('q')
+        self.tanggal = []
+        self.keterangan = []
+        self.debit = array('i')
+        self.kredit = array('i')
+        self.jumlah = array('q')
+        self.baris_akun = {}
+        self.urut = True
+        self._memo = {}
+        # Titik awal dari tutup buku: hanya jurnal sesudah tanggal_dasar yang dimuat,
+        # saldo sebelumnya diambil dari snapshot saldo_periode
+        self.tanggal_dasar = None
+        self.saldo_dasar = {}
+        # Mutasi debit/kredit per bulan per kode akun, diperbarui setiap tambah()
+        # sehingga laporan periode terbuka tidak perlu menghitung ulang semua baris
+        self.mutasi_bulan = {}
+        # Indeks saldo per kode akun: tanggal terurut + total debit/kredit kumulatif,
+        # jadi saldo pada tanggal tertentu cukup satu bisect (O(log n)). Jurnal
+        # bertanggal mundur menandai indeks akunnya untuk disusun ulang saat dipakai.
+        self.indeks_saldo = {}
+        self.indeks_kotor = set()
+
+    @classmethod
+    def muat(cls, jurnal_list, tanggal_dasar=None, saldo_dasar=None):
+        engine = cls()
+        engine.tanggal_dasar = tanggal_dasar
+        engine.saldo_dasar = saldo_dasar or {}
+        for jurnal in jurnal_list:
+            engine.tambah(jurnal)
+        return engine
+
+    def mencakup(self, dari=''):
+        # Engine hanya bisa melayani jendela tanggal yang dimulai sesudah snapshot
+        return not self.tanggal_dasar or not dari or dari > self.tanggal_dasar
+
+    def saldo_dasar_kode(self, kode_akun):
+        saldo = self.saldo_dasar.get(kode_akun)
+        return saldo["saldo_debit"] - saldo["saldo_kredit"] if saldo else 0
+
+    def id_akun(self, akun_full, kode_akun=None):
+        akun_id = self.akun_id.get(akun_full)
+        if akun_id is None:
+            akun_id = len(self.akun_teks)
+            self.akun_id[akun_full] = akun_id
+            self.akun_teks.append(akun_full)
+            self.akun_kode.append(kode_akun or kode_dari_akun(akun_full))
+            self.baris_akun[akun_id] = []
+        return akun_id
+
+    def _akun_per_kode(self):
+        if "akun_per_kode" not in self._memo:
+            akun_per_kode = {}
+            for akun_id, kode in enumerate(self.akun_kode):
+                akun_per_kode.setdefault(kode, []).append(akun_id)
+            self._memo["akun_per_kode"] = akun_per_kode
+        return self._memo["akun_per_kode"]
+
+    def tambah(self, jurnal):
+        with self.lock:
+            baris = len(self.jumlah)
+            tanggal = jurnal["tanggal"]
+            jurnal_id = jurnal.get("id") or 0
+            if baris and (tanggal, jurnal_id) < (self.tanggal[-1], self.jurnal_id[-1]):
+                self.urut = False
+
+            debit = self.id_akun(jurnal["akun_debit"], jurnal.get("kode_debit"))
+            kredit = self.id_akun(jurnal["akun_kredit"], jurnal.get("kode_kredit"))
+            self.jurnal_id.append(jurnal_id)
+            self.tanggal.append(tanggal)
+            self.keterangan.append(jurnal["keterangan"])
+            self.debit.append(debit)
+            self.kredit.append(kredit)
+            self.jumlah.append(int(jurnal["jumlah"] or 0))
+            self.baris_akun[debit].append(baris)
+            if kredit != debit:
+                self.baris_akun[kredit].append(baris)
+
+            mutasi = self.mutasi_bulan.setdefault(tanggal[:7], {})
+            for akun_id, sisi in ((debit, 0), (kredit, 1)):
+                kode = self.akun_kode[akun_id]
+                if kode:
+                    mutasi.setdefault(kode, [0, 0])[sisi] += self.jumlah[baris]
+                    self._indeks_tambah(kode, tanggal, sisi, self.jumlah[baris])
+            self._memo = {}
+
+    def _indeks_tambah(self, kode, tanggal, sisi, jumlah):
+        if kode in self.indeks_kotor:
+            return
+        tanggal_list, debit, kredit = self.indeks_saldo.setdefault(kode, ([], array('q'), array('q')))
+        if tanggal_list and tanggal < tanggal_list[-1]:
+            self.indeks_kotor.add(kode)
+            return
+        tanggal_list.append(tanggal)
+        debit.append((debit[-1] if debit else 0) + (jumlah if sisi == 0 else 0))
+        kredit.append((kredit[-1] if kredit else 0) + (jumlah if sisi == 1 else 0))
+
+    def _indeks_kode(self, kode):
+        # Indeks saldo satu kode akun, disusun ulang dari baris akun kalau kotor
+        if kode in self.indeks_kotor:
+            self._pastikan_urut()
+            akun_ids = self._akun_per_kode().get(kode, [])
+            tanggal_list, debit, kredit = [], array('q'), array('q')
+            total_debit = total_kredit = 0
+            for i in sorted(set(baris for akun_id in akun_ids for baris in self.baris_akun[akun_id])):
+                if self.akun_kode[self.debit[i]] == kode:
+                    total_debit += self.jumlah[i]
+                if self.akun_kode[self.kredit[i]] == kode:
+                    total_kredit += self.jumlah[i]
+                tanggal_list.append(self.tanggal[i])
+                debit.append(total_debit)
+                kredit.append(total_kredit)
+            self.indeks_saldo[kode] = (tanggal_list, debit, kredit)
+            self.indeks_kotor.discard(kode)
+        return self.indeks_saldo.get(kode)
+
+    def saldo_pada(self, kode_akun, tanggal):
+        # Saldo debit/kredit kumulatif satu akun s.d. akhir `tanggal` (snapshot + jurnal)
+        with self.lock:
+            dasar = self.saldo_dasar.get(kode_akun) or {"saldo_debit": 0, "saldo_kredit": 0}
+            indeks = self._indeks_kode(kode_akun)
+            if not indeks:
+                return dict(dasar)
+            tanggal_list, debit, kredit = indeks
+            n = bisect_right(tanggal_list, tanggal)
+            return {
+                "saldo_debit": dasar["saldo_debit"] + (debit[n - 1] if n else 0),
+                "saldo_kredit": dasar["saldo_kredit"] + (kredit[n - 1] if n else 0)
+            }
+
+    def mutasi_antara(self, kode_akun, dari, sampai):
+        # Total debit/kredit satu akun di antara dua tanggal (inklusif), dua bisect
+        with self.lock:
+            indeks = self._indeks_kode(kode_akun)
+            if not indeks:
+                return {"saldo_debit": 0, "saldo_kredit": 0}
+            tanggal_list, debit, kredit = indeks
+            awal = bisect_left(tanggal_list, dari)
+            akhir = bisect_right(tanggal_list, sampai)
+            if akhir <= awal:
+                return {"saldo_debit": 0, "saldo_kredit": 0}
+            return {
+                "saldo_debit": debit[akhir - 1] - (debit[awal - 1] if awal else 0),
+                "saldo_kredit": kredit[akhir - 1] - (kredit[awal - 1] if awal else 0)
+            }
+
+    def mutasi_semua_antara(self, dari, sampai):
+        # Mutasi debit/kredit semua kode akun di antara dua tanggal (inklusif)
+        with self.lock:
+            return {
+                kode: self.mutasi_antara(kode, dari, sampai)
+                for kode in set(self.indeks_saldo) | self.indeks_kotor
+            }
+
+    def saldo_semua_pada(self, tanggal):
+        # Saldo semua kode akun pada tanggal tertentu (satu bisect per akun)
+        with self.lock:
+            return {
+                kode: self.saldo_pada(kode, tanggal)
+                for kode in set(self.saldo_dasar) | set(self.indeks_saldo) | self.indeks_kotor
+            }
+
+    def _pastikan_urut(self):
+        # Jurnal bertanggal mundur yang ditambahkan belakangan membuat urutan
+        # (tanggal, id) rusak; susun ulang semua kolom sekali saja.
+        if self.urut:
+            return
+        urutan = sorted(range(len(self.jumlah)), key=lambda i: (self.tanggal[i], self.jurnal_id[i]))
+        self.jurnal_id = array('q', (self.jurnal_id[i] for i in urutan))
+        self.tanggal = [self.tanggal[i] for i in urutan]
+        self.keterangan = [self.keterangan[i] for i in urutan]
+        self.debit = array('i', (self.debit[i] for i in urutan))
+        self.kredit = array('i', (self.kredit[i] for i in urutan))
+        self.jumlah = array('q', (self.jumlah[i] for i in urutan))
+        self.baris_akun = {akun_id: [] for akun_id in range(len(self.akun_teks))}
+        for baris, (debit, kredit) in enumerate(zip(self.debit, self.kredit)):
+            self.baris_akun[debit].append(baris)
+            if kredit != debit:
+                self.baris_akun[kredit].append(baris)
+        self.urut = True
+
+    def saldo_per_kode(self):
+        # Saldo debit/kredit per kode akun, dijumlahkan per id akun dulu
+        with self.lock:
+            if "saldo_per_kode" not in self._memo:
+                debit = jumlah_per_akun(self.debit, self.jumlah, len(self.akun_teks))
+                kredit = jumlah_per_akun(self.kredit, self.jumlah, len(self.akun_teks))
+
+                saldo = {kode: dict(nilai) for kode, nilai in self.saldo_dasar.items()}
+                for akun_id, kode in enumerate(self.akun_kode):
+                    if kode:
+                        saldo.setdefault(kode, {"saldo_debit": 0, "saldo_kredit": 0})
+                        saldo[kode]["saldo_debit"] += debit[akun_id]
+                        saldo[kode]["saldo_kredit"] += kredit[akun_id]
+                self._memo["saldo_per_kode"] = saldo
+            return self._memo["saldo_per_kode"]
+
+    def saldo_sampai(self, bulan):
+        # Saldo kumulatif per kode akun s.d. akhir bulan "YYYY-MM": snapshot + mutasi bulanan
+        with self.lock:
+            saldo = {kode: dict(nilai) for kode, nilai in self.saldo_dasar.items()}
+            for kunci, mutasi in self.mutasi_bulan.items():
+                if kunci > bulan:
+                    continue
+                for kode, (debit, kredit) in mutasi.items():
+                    saldo.setdefault(kode, {"saldo_debit": 0, "saldo_kredit": 0})
+                    saldo[kode]["saldo_debit"] += debit
+                    saldo[kode]["saldo_kredit"] += kredit
+            return saldo
+
+    def buku_besar(self, selected_kode='', dari='', sampai=''):
+        # Mutasi per akun (atau semua akun) berurutan tanggal dengan saldo berjalan
+        with self.lock:
+            self._pastikan_urut()
+            if selected_kode:
+                akun_ids = self._akun_per_kode().get(selected_kode, [])
+                if len(akun_ids) == 1:
+                    indeks = self.baris_akun[akun_ids[0]]
+                else:
+                    indeks = sorted(set(baris for akun_id in akun_ids for baris in self.baris_akun[akun_id]))
+            else:
+                indeks = range(len(self.jumlah))
+
+            # Baris di luar jendela tanggal dilewati lewat bisect; saldo awal
+            # tiap akun diambil dari indeks saldo, tidak dihitung ulang per baris
+            sebelum = (datetime.date.fromisoformat(dari) - datetime.timedelta(days=1)).isoformat() if dari else ''
+            mulai = bisect_left(indeks, dari, key=self.tanggal.__getitem__) if dari else 0
+            selesai = bisect_right(indeks, sampai, key=self.tanggal.__getitem__) if sampai else len(indeks)
+
+            def saldo_awal_kode(kode):
+                if not sebelum:
+                    return self.saldo_dasar_kode(kode)
+                nilai = self.saldo_pada(kode, sebelum)
+                return nilai["saldo_debit"] - nilai["saldo_kredit"]
+
+            buku_besar_data = []
+            saldo = {}
+            for i in indeks[mulai:selesai]:
+                tanggal = self.tanggal[i]
+                jumlah = self.jumlah[i]
+                for tipe, akun_id, tanda in (("debit", self.debit[i], 1), ("kredit", self.kredit[i], -1)):
+                    akun = self.akun_teks[akun_id]
+                    if selected_kode and self.akun_kode[akun_id] != selected_kode:
+                        continue
+                    kunci = selected_kode or akun
+                    if kunci not in saldo:
+                        saldo[kunci] = saldo_awal_kode(self.akun_kode[akun_id])
+                    saldo[kunci] += tanda * jumlah
+                    buku_besar_data.append({
+                        "tanggal": tanggal,
+                        "keterangan": self.keterangan[i],
+                        "tipe": tipe,
+                        "jumlah": jumlah,
+                        "saldo_akumulasi": saldo[kunci],
+                        "akun": akun
+                    })
+
+        total_debit = sum(item["jumlah"] for item in buku_besar_data if item["tipe"] == "debit")
+        total_kredit = sum(item["jumlah"] for item in buku_besar_data if item["tipe"] == "kredit")
+        if selected_kode:
+            saldo_akhir = saldo[selected_kode] if selected_kode in saldo else saldo_awal_kode(selected_kode)
+        else:
+            saldo_akhir = total_debit - total_kredit
+
+        return {
+            "buku_besar_data": buku_besar_data,
+            "total_debit": total_debit,
+            "total_kredit": total_kredit,
+            "saldo_awal": saldo_akhir - (total_debit - total_kredit),
+            "saldo_akhir": saldo_akhir
+        }
+
+_ledger = {"engine": None, "dimuat": 0}
+_ledger_lock = threading.Lock()
+
+def ledger_engine_siap():
+    # Engine yang sudah dimuat dan masih segar, atau None
+    engine = _ledger["engine"]
+    if engine is not None and time.time() - _ledger["dimuat"] <= LEDGER_TTL_DETIK:
+        return engine
+    return None
+
+def muat_ledger_engine(tutup=None, sampai=''):
+    # Muat engine mulai dari snapshot tutup buku (kalau ada); jurnal sebelumnya tidak dibaca
+    if tutup is None:
+        filter_query = (lambda query: query.lte("tanggal", sampai)) if sampai else None
+        return LedgerEngine.muat(baca_jurnal(KOLOM_BUKU_BESAR, filter_query))
+
+    def filter_query(query):
+        query = query.gt("tanggal", tutup["tanggal_akhir"])
+        return query.lte("tanggal", sampai) if sampai else query
+
+    return LedgerEngine.muat(
+        baca_jurnal(KOLOM_BUKU_BESAR, filter_query),
+        tutup["tanggal_akhir"],
+        saldo_snapshot(tutup["periode"])
+    )
+
+def ledger_engine():
+    # Muat jurnal periode terbuka sekali per proses; laporan berikutnya memakai struktur yang sama
+    with _ledger_lock:
+        engine = ledger_engine_siap()
+        if engine is None:
+            engine = muat_ledger_engine(tutup_buku_terakhir())
+            _ledger["engine"] = engine
+            _ledger["dimuat"] = time.time()
+        return engine
+
+def ledger_engine_historis(dari, sampai=''):
+    # Jendela yang dimulai di periode tertutup: engine sementara dari snapshot
+    # terakhir sebelum `dari` (tidak di-cache, jarang dipakai)
+    return muat_ledger_engine(tutup_buku_terakhir(sebelum=dari), sampai)
+
+# ---------------------------
+# HELPER - PENYUSUTAN & JURNAL PENYESUAIAN
+# ---------------------------
+
+_penyesuaian_cache = {"data": None, "dimuat": 0}
+_penyesuaian_lock = threading.Lock()
+_aset_cache = {"data": None, "dimuat": 0}
+_aset_lock = threading.Lock()
+_jadwal_cache = {"register": None, "register_penyusutan": None, "jadwal": None}
+
+METODE_PENYUSUTAN = {"garis_lurus": "Garis Lurus", "saldo_menurun": "Saldo Menurun Ganda"}
+
+def kebijakan_penyusutan(nama_aset, harga_perolehan):
+    # Umur ekonomis (tahun) dan nilai residu berdasarkan jenis aset
+    nama_aset = nama_aset.lower()
+    harga_perolehan = rupiah(harga_perolehan)
+    if 'kendaraan' in nama_aset:
+        return 5, rupiah(harga_perolehan * Decimal("0.1"))  # 10% dari harga perolehan
+    if 'peralatan' in nama_aset:
+        return 3, rupiah(harga_perolehan * Decimal("0.05"))  # 5% dari harga perolehan
+    if 'bangunan' in nama_aset:
+        return 20, rupiah(harga_perolehan * Decimal("0.2"))  # 20% dari harga perolehan
+    return 5, rupiah(harga_perolehan * Decimal("0.1"))  # 10% dari harga perolehan
+
+def akun_aset_tetap():
+    # Akun aset tetap di COA per kode (akun akumulasi penyusutan tidak termasuk)
+    return {
+        akun["kode_akun"]: akun for akun in ambil_coa()
+        if 'akumulasi' not in akun["nama_akun"].lower()
+        and any(keyword in akun["nama_akun"].lower() for keyword in KATA_ASET_TETAP)
+    }
+
+def susun_aset_tetap(jurnal_list, akun_aset):
+    # Baris jurnal pembelian aset tetap -> baris register. Satu transaksi (header
+    # jurnal majemuk atau satu baris jurnal) per akun aset menjadi satu aset.
+    aset = {}
+    for jurnal in jurnal_list:
+        kode = kode_jurnal(jurnal, "debit")
+        if kode not in akun_aset:
+            continue
+        if jurnal.get("kategori") != "perolehan_aset":
+            continue
+        kunci = (jurnal.get("header_id") or f"j{jurnal['id']}", kode)
+        if kunci in aset:
+            aset[kunci]["harga_perolehan"] += jurnal["jumlah"]
+            continue
+        aset[kunci] = {
+            "jurnal_id": jurnal["id"],
+            "kode_akun": kode,
+            "nama_aset": akun_aset[kode]["nama_akun"],
+            "keterangan": jurnal["keterangan"],
+            "tanggal_perolehan": jurnal["tanggal"],
+            "harga_perolehan": jurnal["jumlah"]
+        }
+
+    register = []
+    for baris in aset.values():
+        umur_ekonomis, nilai_residu = kebijakan_penyusutan(baris["nama_aset"], baris["harga_perolehan"])
+        register.append({**baris, "umur_ekonomis": umur_ekonomis, "nilai_residu": nilai_residu})
+    return register
+
+def daftarkan_aset_tetap(jurnal_list):
+    # Dipanggil setelah posting: pembelian aset tetap langsung masuk register (migrasi 010).
+    # Aset yang sudah ada tidak ditimpa, jadi umur/metode yang sudah diubah tetap.
+    register = susun_aset_tetap(jurnal_list, akun_aset_tetap())
+    if register:
+        supabase.table("aset_tetap").upsert(register, on_conflict="jurnal_id", ignore_duplicates=True).execute()
+        invalidasi_aset_tetap()
+    return register
+
+def ambil_aset_tetap():
+    # Register aset tetap, di-cache seperti jurnal penyesuaian. Kalau isinya tidak
+    # berubah saat dimuat ulang, objek lama dipertahankan supaya jadwal tetap di-cache.
+    with _aset_lock:
+        if _aset_cache["data"] is None or time.time() - _aset_cache["dimuat"] > LEDGER_TTL_DETIK:
+            data = list(baca_jurnal("*", urutan=("tanggal_perolehan", "id"), tabel="aset_tetap"))
+            if data != _aset_cache["data"]:
+                _aset_cache["data"] = data
+            _aset_cache["dimuat"] = time.time()
+        return _aset_cache["data"]
+
+def invalidasi_aset_tetap():
+    with _aset_lock:
+        _aset_cache["dimuat"] = 0
+
+def ubah_aset_tetap(aset_id, umur_ekonomis, nilai_residu, metode):
+    # Umur ekonomis, nilai residu dan metode penyusutan bisa diatur per aset
+    try:
+        umur_ekonomis = int(umur_ekonomis)
+        nilai_residu = parse_jumlah(nilai_residu)
+    except ValueError:
+        raise ValueError("Umur ekonomis atau nilai residu tidak valid")
+    if umur_ekonomis <= 0 or nilai_residu < 0:
+        raise ValueError("Umur ekonomis harus lebih dari nol dan nilai residu tidak boleh negatif")
+    if metode not in METODE_PENYUSUTAN:
+        raise ValueError(f"Metode penyusutan tidak dikenal: {metode}")
+
+    supabase.table("aset_tetap").update({
+        "umur_ekonomis": umur_ekonomis,
+        "nilai_residu": nilai_residu,
+        "metode": metode
+    }).eq("id", int(aset_id)).execute()
+    invalidasi_aset_tetap()
+
+def register_penyusutan():
+    # Register aset tetap dengan kode aset untuk tampilan dan jurnal penyesuaian
+    return [
+        {
+            **aset,
+            "kode_aset": f"{aset['kode_akun']}-{aset['id']}",
+            "metode": aset.get("metode") or "garis_lurus"
+        }
+        for aset in ambil_aset_tetap()
+    ]
+
+def beban_tahunan_menurun(np, nilai_buku, residu, umur_tahun, sisa_tahun):
+    # Saldo menurun ganda: tarif tahunan 2/umur dari nilai buku awal tahun. Begitu
+    # garis lurus atas sisa umur lebih besar, pindah ke garis lurus, jadi nilai buku
+    # sampai di residu tanpa lonjakan di tahun terakhir. Operasi yang sama dipakai
+    # jalur numpy (np diisi) dan Python (np=None) supaya hasilnya identik.
+    saldo_menurun = nilai_buku * (2 / umur_tahun)
+    garis_lurus = (nilai_buku - residu) / sisa_tahun
+    if np is None:
+        return min(max(saldo_menurun, garis_lurus), nilai_buku - residu)
+    return np.minimum(np.maximum(saldo_menurun, garis_lurus), nilai_buku - residu)
+
+def _beban_bulanan_numpy(np, harga, residu, umur, menurun):
+    # Semua aset sekaligus sebagai matriks aset x bulan
+    harga = np.array(harga, dtype=float)[:, None]
+    residu = np.array(residu, dtype=float)[:, None]
+    umur = np.array(umur)[:, None]
+    menurun = np.array(menurun)[:, None]
+    bulan_ke = np.arange(umur.max())[None, :]
+    aktif = bulan_ke < umur
+
+    # Garis lurus: (harga - residu) dibagi rata sepanjang umur
+    garis_lurus = (harga - residu) / umur
+
+    # Saldo menurun ganda per tahun (lihat beban_tahunan_menurun), dibagi rata 12 bulan
+    umur_tahun = umur[:, 0] // 12
+    nilai_buku = harga[:, 0].copy()
+    tahunan = []
+    for tahun_ke in range(int(umur_tahun.max())):
+        beban_tahun = beban_tahunan_menurun(np, nilai_buku, residu[:, 0], umur_tahun,
+                                            np.maximum(umur_tahun - tahun_ke, 1))
+        beban_tahun = np.where(tahun_ke < umur_tahun, beban_tahun, 0)
+        nilai_buku = nilai_buku - beban_tahun
+        tahunan.append(beban_tahun)
+    saldo_menurun = np.repeat(np.stack(tahunan, axis=1) / 12, 12, axis=1)
+
+    beban = np.where(aktif, np.where(menurun, saldo_menurun, garis_lurus), 0)
+
+    # Dibulatkan ke rupiah dari akumulasinya, jadi total per aset tetap tepat
+    akumulasi = np.floor(np.cumsum(beban, axis=1) + 0.5).astype(np.int64)
+    beban = np.diff(akumulasi, axis=1, prepend=0)
+    return [baris[:n].tolist() for baris, n in zip(beban, umur[:, 0])]
+
+def _beban_bulanan_python(harga, residu, umur, menurun):
+    hasil = []
+    for harga_aset, residu_aset, umur_aset, menurun_aset in zip(harga, residu, umur, menurun):
+        if not menurun_aset:
+            beban = [(harga_aset - residu_aset) / umur_aset] * umur_aset
+        else:
+            beban = []
+            umur_tahun = umur_aset // 12
+            nilai_buku = harga_aset
+            for tahun_ke in range(umur_tahun):
+                beban_tahun = beban_tahunan_menurun(None, nilai_buku, residu_aset, umur_tahun, umur_tahun - tahun_ke)
+                nilai_buku -= beban_tahun
+                beban.extend([beban_tahun / 12] * 12)
+
+        # Dibulatkan ke rupiah dari akumulasinya, seperti jalur numpy
+        akumulasi_sebelumnya = 0
+        beban_rupiah = []
+        for akumulasi in accumulate(beban):
+            akumulasi = int(akumulasi + 0.5)
+            beban_rupiah.append(akumulasi - akumulasi_sebelumnya)
+            akumulasi_sebelumnya = akumulasi
+        hasil.append(beban_rupiah)
+    return hasil
+
+def hitung_jadwal_bulanan(register):
+    # Beban penyusutan per bulan untuk semua aset dalam satu batch.
+    # numpy dipakai kalau terpasang; tanpa numpy dihitung per aset.
+    harga = [aset["harga_perolehan"] for aset in register]
+    residu = [aset["nilai_residu"] for aset in register]
+    umur = [aset["umur_ekonomis"] * 12 for aset in register]
+    menurun = [aset["metode"] == "saldo_menurun" for aset in register]
+    if not register:
+        return {}
+
+    try:
+        import numpy as np
+    except ImportError:
+        beban = _beban_bulanan_python(harga, residu, umur, menurun)
+    else:
+        beban = _beban_bulanan_numpy(np, harga, residu, umur, menurun)
+
+    return {
+        aset["id"]: {"mulai": aset["tanggal_perolehan"][:7], "beban": beban_aset}
+        for aset, beban_aset in zip(register, beban)
+    }
+
+def jadwal_bulanan():
+    # Jadwal bulanan di-cache sampai register aset tetap berubah
+    aset_list = ambil_aset_tetap()
+    with _aset_lock:
+        if _jadwal_cache["register"] is aset_list:
+            return _jadwal_cache["register_penyusutan"], _jadwal_cache["jadwal"]
+
+    register = register_penyusutan()
+    jadwal = hitung_jadwal_bulanan(register)
+    with _aset_lock:
+        _jadwal_cache.update(register=aset_list, register_penyusutan=register, jadwal=jadwal)
+    return register, jadwal
+
+def selisih_bulan(mulai, bulan):
+    return (int(bulan[:4]) - int(mulai[:4])) * 12 + int(bulan[5:7]) - int(mulai[5:7])
+
+def penyusutan_bulan(jadwal_aset, bulan):
+    # Beban penyusutan satu aset untuk bulan "YYYY-MM" (bulan perolehan dihitung penuh)
+    ke = selisih_bulan(jadwal_aset["mulai"], bulan)
+    if 0 <= ke < len(jadwal_aset["beban"]):
+        return jadwal_aset["beban"][ke]
+    return 0
+
+def jadwal_penyusutan(register, jadwal):
+    # Ringkasan tahunan (per 12 bulan sejak perolehan) dari jadwal bulanan, plus status aset
+    bulan_ini = datetime.date.today().strftime("%Y-%m")
+    hasil = []
+    for aset in register:
+        jadwal_aset = jadwal[aset["id"]]
+        ringkasan = []
+        akumulasi_penyusutan = 0
+        for tahun in range(0, len(jadwal_aset["beban"]), 12):
+            beban_tahun = sum(jadwal_aset["beban"][tahun:tahun + 12])
+            akumulasi_penyusutan += beban_tahun
+            ringkasan.append({
+                "tahun_ke": tahun // 12 + 1,
+                "beban_penyusutan": beban_tahun,
+                "akumulasi_penyusutan": akumulasi_penyusutan,
+                "nilai_buku": aset["harga_perolehan"] - akumulasi_penyusutan
+            })
+
+        hasil.append({
+            **aset,
+            "penyusutan_per_tahun": ringkasan[0]["beban_penyusutan"] if ringkasan else 0,
+            "jadwal_penyusutan": ringkasan,
+            "status": "Aktif" if selisih_bulan(jadwal_aset["mulai"], bulan_ini) < len(jadwal_aset["beban"]) else "Nonaktif"
+        })
+    return hasil
+
+def akun_penyusutan(coa_list, nama_aset):
+    # Pasangan akun beban penyusutan dan akumulasi penyusutan untuk satu aset,
+    # dipilih yang namanya memuat kata dari nama aset (misal "Peralatan").
+    # Akumulasi harus cocok dengan asetnya; beban boleh satu akun umum
+    # kalau COA hanya punya satu akun beban penyusutan. None kalau tidak ada.
+    kata = [k for k in nama_aset.lower().split() if len(k) > 3]
+
+    def pilih(kandidat, boleh_umum=False):
+        for akun in kandidat:
+            if any(k in akun["nama_akun"].lower() for k in kata):
+                return akun
+        return kandidat[0] if boleh_umum and len(kandidat) == 1 else None
+
+    beban = pilih([akun for akun in coa_list
+                   if akun["tipe_akun"] == "Beban" and 'penyusutan' in akun["nama_akun"].lower()], boleh_umum=True)
+    akumulasi = pilih([akun for akun in coa_list if 'akumulasi' in akun["nama_akun"].lower()])
+    return beban, akumulasi
+
+def susun_penyesuaian_periode(periode, coa_list, register, jadwal, aturan_list):
+    # Baris penyesuaian otomatis satu bulan: penyusutan semua aset digabung per
+    # pasangan akun (satu baris per akun aset) + aturan akrual aktif.
+    # Juga mengembalikan nama aset yang dilewati karena akun penyusutannya tidak ada di COA.
+    tanggal = akhir_periode(periode)
+    bulan = tanggal[:7]
+    baris_list = []
+    tanpa_akun = []
+
+    penyusutan = {}
+    for aset in register:
+        jumlah = penyusutan_bulan(jadwal[aset["id"]], bulan)
+        if not jumlah:
+            continue
+        baris = penyusutan.setdefault(aset["kode_akun"], {"nama_aset": aset["nama_aset"], "jumlah": 0, "aset": 0})
+        baris["jumlah"] += jumlah
+        baris["aset"] += 1
+
+    for kode_akun, baris in penyusutan.items():
+        beban, akumulasi = akun_penyusutan(coa_list, baris["nama_aset"])
+        jumlah = baris["jumlah"]
+        if not jumlah:
+            continue
+        if not beban or not akumulasi:
+            print(f"Penyusutan {baris['nama_aset']} dilewati: akun beban/akumulasi penyusutan tidak ditemukan di COA")
+            tanpa_akun.append(baris["nama_aset"])
+            continue
+        baris_list.append({
+            "tanggal": tanggal,
+            "keterangan": f"Penyusutan {baris['nama_aset']} {bulan} ({baris['aset']} aset)",
+            "akun_debit": tampilan_akun(beban),
+            "akun_kredit": tampilan_akun(akumulasi),
+            "kode_debit": beban["kode_akun"],
+            "kode_kredit": akumulasi["kode_akun"],
+            "jumlah": jumlah,
+            "sumber": "penyusutan",
+            "sumber_id": kode_akun
+        })
+
+    for aturan in aturan_list:
+        if not aturan["aktif"]:
+            continue
+        baris_list.append({
+            "tanggal": tanggal,
+            "keterangan": aturan["keterangan"],
+            "akun_debit": aturan["akun_debit"],
+            "akun_kredit": aturan["akun_kredit"],
+            "kode_debit": aturan["kode_debit"],
+            "kode_kredit": aturan["kode_kredit"],
+            "jumlah": aturan["jumlah"],
+            "sumber": "akrual",
+            "sumber_id": str(aturan["id"])
+        })
+    return baris_list, tanpa_akun
+
+def simpan_aturan_akrual(keterangan, akun_debit, akun_kredit, jumlah):
+    # Aturan akrual: penyesuaian tetap yang dibuat setiap bulan (misal gaji terutang)
+    akun_coa = coa_per_tampilan()
+    if akun_debit not in akun_coa or akun_kredit not in akun_coa:
+        raise ValueError("Akun tidak terdaftar di COA")
+    try:
+        jumlah = parse_jumlah(jumlah)
+    except ValueError:
+        raise ValueError(f"Format jumlah tidak valid: {jumlah}")
+    if jumlah <= 0:
+        raise ValueError("Jumlah harus lebih dari nol")
+
+    supabase.table("aturan_akrual").insert({
+        "keterangan": keterangan.strip(),
+        "akun_debit": akun_debit,
+        "akun_kredit": akun_kredit,
+        "kode_debit": akun_coa[akun_debit]["kode_akun"],
+        "kode_kredit": akun_coa[akun_kredit]["kode_akun"],
+        "jumlah": jumlah,
+        "aktif": True
+    }).execute()
+
+def ambil_aturan_akrual():
+    hasil = supabase.table("aturan_akrual").select("*").order("id").execute()
+    return hasil.data or []
+
+def generate_penyesuaian(periode):
+    # Buat ulang semua penyesuaian otomatis satu bulan dalam satu RPC (migrasi 009)
+    periode = periode.strip()
+    if len(periode) != 7:
+        raise ValueError("Penyesuaian dibuat per bulan, isi periode dengan format YYYY-MM")
+    cek_periode_terbuka(akhir_periode(periode))
+
+    hasil = jalankan_paralel(coa=ambil_coa, jadwal=jadwal_bulanan, aturan=ambil_aturan_akrual)
+    register, jadwal = hasil["jadwal"]
+    baris_list, tanpa_akun = susun_penyesuaian_periode(periode, hasil["coa"], register, jadwal, hasil["aturan"])
+
+    response = supabase.rpc("ganti_penyesuaian", {"p_periode": periode, "p_baris": baris_list}).execute()
+    invalidasi_penyesuaian()
+    return response.data or [], tanpa_akun
+
+def ambil_penyesuaian():
+    # Semua baris jurnal penyesuaian (sedikit: beberapa baris per bulan), di-cache
+    with _penyesuaian_lock:
+        if _penyesuaian_cache["data"] is None or time.time() - _penyesuaian_cache["dimuat"] > LEDGER_TTL_DETIK:
+            _penyesuaian_cache["data"] = list(baca_jurnal("*", urutan=("tanggal", "id"), tabel="jurnal_penyesuaian"))
+            _penyesuaian_cache["dimuat"] = time.time()
+        return _penyesuaian_cache["data"]
+
+def invalidasi_penyesuaian():
+    with _penyesuaian_lock:
+        _penyesuaian_cache["data"] = None
+
+def saldo_penyesuaian(sampai=''):
+    # Penyesuaian per kode akun s.d. tanggal tertentu (kosong = semua)
+    return hitung_saldo_dari_jurnal(
+        penyesuaian for penyesuaian in ambil_penyesuaian()
+        if not sampai or penyesuaian["tanggal"] <= sampai
+    )
+
+def gabung_saldo(saldo, tambahan):
+    # Jumlahkan dua dict saldo per kode akun tanpa mengubah aslinya
+    hasil = {kode: dict(nilai) for kode, nilai in saldo.items()}
+    for kode, nilai in tambahan.items():
+        hasil.setdefault(kode, {"saldo_debit": 0, "saldo_kredit": 0})
+        hasil[kode]["saldo_debit"] += nilai["saldo_debit"]
+        hasil[kode]["saldo_kredit"] += nilai["saldo_kredit"]
+    return hasil
+
+def agregat_nssp(sampai=''):
+    # Saldo jurnal umum dan penyesuaian per kode akun dalam satu GROUP BY (migrasi 009).
+    # Kalau RPC belum tersedia, dihitung dari ledger engine + cache penyesuaian.
+    try:
+        hasil = supabase.rpc("nssp_agregat", {"p_sampai": sampai or None}).execute()
+    except Exception as e:
+        print("RPC nssp_agregat gagal, hitung di Python:", e)
+        engine = ledger_engine()
+        if not sampai:
+            saldo = engine.saldo_per_kode()
+        elif engine.mencakup(hari_berikutnya(sampai)):
+            saldo = engine.saldo_sampai(sampai[:7])
+        else:
+            saldo = saldo_akun_sampai(sampai)
+        return saldo, saldo_penyesuaian(sampai)
+
+    saldo = {}
+    penyesuaian = {}
+    for baris in (hasil.data or []):
+        saldo[baris["kode_akun"]] = {
+            "saldo_debit": baris["saldo_debit"] or 0,
+            "saldo_kredit": baris["saldo_kredit"] or 0
+        }
+        penyesuaian[baris["kode_akun"]] = {
+            "saldo_debit": baris["penyesuaian_debit"] or 0,
+            "saldo_kredit": baris["penyesuaian_kredit"] or 0
+        }
+    return saldo, penyesuaian
+
+# ---------------------------
+# HELPER - LAPORAN KEUANGAN
+# ---------------------------
+
+BULAN_INDONESIA = ["Januari", "Februari", "Maret", "April", "Mei", "Juni", "Juli",
+                   "Agustus", "September", "Oktober", "November", "Desember"]
+
+# Saldo awal/akhir periode yang sudah ditutup tidak akan berubah lagi (dikunci trigger).
+# Satu entri berisi saldo semua akun, jadi jumlah rentang yang disimpan dibatasi;
+# rentang yang paling lama tidak dipakai dibuang dulu.
+SALDO_TERTUTUP_MAKS = int(os.getenv("SALDO_TERTUTUP_MAKS", "32"))
+_saldo_tertutup_cache = OrderedDict()
+_saldo_tertutup_lock = threading.Lock()
+_saldo_tertutup_generasi = [0]
+
+def invalidasi_saldo_tertutup():
+    # Dipanggil saat versi ledger berubah dari luar (misal tutup buku dibatalkan)
+    with _saldo_tertutup_lock:
+        _saldo_tertutup_cache.clear()
+        _saldo_tertutup_generasi[0] += 1
+
+def jendela_periode(periode):
+    # "2026-03" -> ("2026-03-01", "2026-03-31", "Maret 2026"); "2026" -> satu tahun penuh
+    sampai = akhir_periode(periode.strip())
+    if len(periode.strip()) == 4:
+        return sampai[:4] + "-01-01", sampai, f"Tahun {sampai[:4]}"
+    return sampai[:7] + "-01", sampai, f"{BULAN_INDONESIA[int(sampai[5:7]) - 1]} {sampai[:4]}"
+
+def saldo_akun_sampai(sampai):
+    # Saldo kumulatif semua akun s.d. tanggal tertentu, dari snapshot + jurnal (migrasi 008)
+    hasil = supabase.rpc("saldo_akun_sampai", {"p_sampai": sampai}).execute()
+    return {
+        baris["kode_akun"]: {
+            "saldo_debit": baris["saldo_debit"] or 0,
+            "saldo_kredit": baris["saldo_kredit"] or 0
+        }
+        for baris in (hasil.data or [])
+    }
+
+def saldo_awal_akhir_periode(dari, sampai):
+    # Saldo per akun sebelum `dari` dan s.d. `sampai`. Periode tertutup dihitung
+    # sekali di database lalu di-cache; periode terbuka dari mutasi bulanan engine.
+    sebelum = (datetime.date.fromisoformat(dari) - datetime.timedelta(days=1)).isoformat()
+    tutup = tutup_buku_terakhir()
+    if tutup and sampai <= tutup["tanggal_akhir"]:
+        with _saldo_tertutup_lock:
+            if (dari, sampai) in _saldo_tertutup_cache:
+                _saldo_tertutup_cache.move_to_end((dari, sampai))
+                return _saldo_tertutup_cache[(dari, sampai)]
+            generasi = _saldo_tertutup_generasi[0]
+        hasil = jalankan_paralel(awal=lambda: saldo_akun_sampai(sebelum), akhir=lambda: saldo_akun_sampai(sampai))
+        with _saldo_tertutup_lock:
+            # Hasil yang dibaca sebelum invalidasi tidak disimpan
+            if generasi == _saldo_tertutup_generasi[0]:
+                _saldo_tertutup_cache[(dari, sampai)] = (hasil["awal"], hasil["akhir"])
+                while len(_saldo_tertutup_cache) > SALDO_TERTUTUP_MAKS:
+                    _saldo_tertutup_cache.popitem(last=False)
+        return hasil["awal"], hasil["akhir"]
+
+    engine = ledger_engine()
+    if engine.mencakup(dari):
+        awal = engine.saldo_sampai(sebelum[:7])
+    else:
+        awal = saldo_akun_sampai(sebelum)
+    return awal, engine.saldo_sampai(sampai[:7])
+
+def susun_laporan_keuangan(coa_list, saldo_awal, saldo_akhir, label_periode):
+    # Laba rugi dari mutasi periode, perubahan modal dan neraca dari saldo
+    # awal/akhir, dipetakan lewat coa.tipe_akun
+    kosong = {"saldo_debit": 0, "saldo_kredit": 0}
+
+    def netto(saldo, kode):
+        # Saldo sisi debit (negatif = saldo kredit)
+        baris = saldo.get(kode, kosong)
+        return baris["saldo_debit"] - baris["saldo_kredit"]
+
+    pendapatan = []
+    beban_operasional = []
+    aset = []
+    kewajiban = []
+    hpp = 0
+    prive = 0
+    modal_awal = 0
+    setoran_modal = 0
+
+    for akun in coa_list:
+        kode = akun["kode_akun"]
+        nama = akun["nama_akun"]
+        tipe = akun["tipe_akun"]
+        awal = netto(saldo_awal, kode)
+        akhir = netto(saldo_akhir, kode)
+        mutasi = akhir - awal
+
+        if tipe in ("Pendapatan", "Beban", "Modal"):
+            # Tanpa jurnal penutup, laba periode lalu masih ada di akun nominal
+            modal_awal -= awal
+
+        if tipe == "Pendapatan":
+            if mutasi:
+                pendapatan.append({"nama": nama, "jumlah": -mutasi})
+        elif tipe == "Beban":
+            if 'harga pokok' in nama.lower() or 'hpp' in nama.lower():
+                hpp += mutasi
+            elif mutasi:
+                beban_operasional.append({"nama": nama, "jumlah": mutasi})
+        elif tipe == "Modal":
+            if 'prive' in nama.lower():
+                prive += mutasi
+            else:
+                setoran_modal -= mutasi
+        elif tipe == "Aset":
+            if akhir:
+                aset.append({"nama": nama, "saldo": akhir})
+        elif tipe == "Kewajiban":
+            if akhir:
+                kewajiban.append({"nama": nama, "saldo": -akhir})
+
+    pendapatan_usaha = sum(item["jumlah"] for item in pendapatan)
+    total_beban = sum(item["jumlah"] for item in beban_operasional)
+    laba_kotor = pendapatan_usaha - hpp
+    laba_bersih = laba_kotor - total_beban
+    modal_akhir = modal_awal + setoran_modal + laba_bersih - prive
+    total_aset = sum(item["saldo"] for item in aset)
+    total_kewajiban = sum(item["saldo"] for item in kewajiban)
+
+    return {
+        "periode": label_periode,
+        "pendapatan_usaha": pendapatan_usaha,
+        "pendapatan": pendapatan,
+        "pendapatan_penjualan": sum(item["jumlah"] for item in pendapatan if 'penjualan' in item["nama"].lower()),
+        "hpp": hpp,
+        "laba_kotor": laba_kotor,
+        "total_beban": total_beban,
+        "beban_operasional": beban_operasional,
+        "laba_bersih": laba_bersih,
+        "modal_awal": modal_awal,
+        "setoran_modal": setoran_modal,
+        "prive": prive,
+        "modal_akhir": modal_akhir,
+        "neraca": {
+            "aset": aset,
+            "total_aset": total_aset,
+            "kewajiban": kewajiban,
+            "total_kewajiban": total_kewajiban,
+            "total_kewajiban_modal": total_kewajiban + modal_akhir
+        }
+    }
+
+def hitung_laporan_keuangan(periode):
+    # Laporan dari neraca saldo setelah penyesuaian: saldo jurnal umum + jurnal penyesuaian
+    dari, sampai, label_periode = jendela_periode(periode)
+    sebelum = (datetime.date.fromisoformat(dari) - datetime.timedelta(days=1)).isoformat()
+    saldo_awal, saldo_akhir = saldo_awal_akhir_periode(dari, sampai)
+    return susun_laporan_keuangan(
+        ambil_coa(),
+        gabung_saldo(saldo_awal, saldo_penyesuaian(sebelum)),
+        gabung_saldo(saldo_akhir, saldo_penyesuaian(sampai)),
+        label_periode
+    )
+
+def ledger_tambah(jurnal_list):
+    # Jurnal baru langsung ditambahkan ke engine yang sedang dimuat (kalau ada)
+    engine = _ledger["engine"]
+    if engine is not None:
+        for jurnal in jurnal_list:
+            engine.tambah(jurnal)
 
-    data = supabase.table("coa").select("*").execute()
-    coa_list = data.data if data.data else []
+# ---------------------------
+# HELPER - PERSEDIAAN PERPETUAL (UDANG, BENUR, PAKAN)
+# ---------------------------
+
+JENIS_PERSEDIAAN = {"udang": "Udang", "benur": "Benur", "pakan": "Pakan"}
+METODE_PERSEDIAAN = {"fifo": "FIFO", "rata_rata": "Rata-rata Bergerak"}
+
+def ambil_item_persediaan():
+    return supabase.table("persediaan_item").select("*").order("kode_item").execute().data or []
+
+def simpan_item_persediaan(kode_item, nama_item, jenis, satuan, metode, kode_akun):
+    kode_item = kode_item.strip()
+    nama_item = nama_item.strip()
+    if not kode_item or not nama_item:
+        raise ValueError("Kode dan nama item wajib diisi")
+    if jenis not in JENIS_PERSEDIAAN:
+        raise ValueError(f"Jenis persediaan tidak dikenal: {jenis}")
+    if metode not in METODE_PERSEDIAAN:
+        raise ValueError(f"Metode persediaan tidak dikenal: {metode}")
+    if kode_akun and kode_akun not in coa_per_kode():
+        raise ValueError(f"Akun {kode_akun} tidak terdaftar di COA")
+
+    supabase.table("persediaan_item").insert({
+        "kode_item": kode_item,
+        "nama_item": nama_item,
+        "jenis": jenis,
+        "satuan": satuan.strip() or "kg",
+        "metode": metode,
+        "kode_akun": kode_akun or None
+    }).execute()
+
+def akun_hpp(coa_list):
+    # Akun beban harga pokok penjualan, dikenali seperti di laporan keuangan
+    for akun in coa_list:
+        nama = akun["nama_akun"].lower()
+        if akun["tipe_akun"] == "Beban" and ('harga pokok' in nama or 'hpp' in nama):
+            return akun
+    return None
+
+def baris_jurnal_persediaan(item, jenis, kode_akun_bayar):
+    # Pasangan akun jurnal mutasi (tanpa jumlah, diisi database dari nilai mutasi):
+    # masuk = persediaan / kas-utang (pembelian), keluar = HPP / persediaan
+    akun_coa = coa_per_kode()
+    akun_item = akun_coa.get(item["kode_akun"])
+    if not akun_item:
+        raise ValueError(f"Akun persediaan item {item['nama_item']} belum ada di COA")
+    if jenis == "masuk":
+        lawan = akun_coa.get(kode_akun_bayar)
+        if not lawan:
+            raise ValueError("Pilih akun pembayaran (kas/utang) untuk jurnal pembelian")
+        debit, kredit, kategori = akun_item, lawan, "pembelian"
+    else:
+        lawan = akun_hpp(ambil_coa())
+        if not lawan:
+            raise ValueError("Akun harga pokok penjualan belum ada di COA")
+        debit, kredit, kategori = lawan, akun_item, None
+    return [{
+        "akun_debit": tampilan_akun(debit),
+        "akun_kredit": tampilan_akun(kredit),
+        "kode_debit": debit["kode_akun"],
+        "kode_kredit": kredit["kode_akun"],
+        "kategori": kategori
+    }]
+
+def catat_mutasi_persediaan(item_id, tanggal, jenis, qty, harga_satuan, keterangan,
+                            posting_jurnal=False, kode_akun_bayar=''):
+    # Nilai keluar (FIFO/rata-rata) dan saldo item dihitung di database. Kalau
+    # posting_jurnal, jurnal pembelian/HPP ditulis dalam transaksi yang sama
+    # (migrasi 017): mutasi dan jurnal tersimpan bersama atau tidak sama sekali.
+    if jenis not in ("masuk", "keluar"):
+        raise ValueError("Pilih mutasi masuk atau keluar")
+    try:
+        qty = parse_kuantitas(qty)
+        harga_satuan = parse_jumlah(harga_satuan) if jenis == "masuk" else 0
+    except ValueError:
+        raise ValueError("Format kuantitas atau harga tidak valid")
+    if qty <= 0 or harga_satuan < 0:
+        raise ValueError("Kuantitas harus lebih dari nol dan harga tidak boleh negatif")
+    cek_periode_terbuka(tanggal)
+
+    baris_jurnal = []
+    keterangan_jurnal = keterangan
+    if posting_jurnal:
+        item = supabase.table("persediaan_item").select("*").eq("id", int(item_id)).execute().data
+        if not item:
+            raise ValueError("Item persediaan tidak ditemukan")
+        baris_jurnal = baris_jurnal_persediaan(item[0], jenis, kode_akun_bayar)
+        keterangan_jurnal = keterangan or f"{'Pembelian' if jenis == 'masuk' else 'HPP'} {item[0]['nama_item']}"
+
+    hasil = supabase.rpc("posting_mutasi_persediaan", {
+        "p_item_id": int(item_id),
+        "p_tanggal": tanggal,
+        "p_jenis": jenis,
+        "p_qty": qty,
+        "p_harga_satuan": harga_satuan,
+        "p_keterangan": keterangan,
+        "p_keterangan_jurnal": keterangan_jurnal,
+        "p_baris": baris_jurnal
+    }).execute()
+    setelah_posting(hasil.data["jurnal"])
+    return hasil.data["mutasi"]
+
+def ambil_mutasi_persediaan(batas=50):
+    return (supabase.table("persediaan_mutasi").select("*")
+            .order("tanggal", desc=True).order("id", desc=True).limit(batas).execute().data or [])
+
+def hpp_dari_kategori():
+    # Data lama tanpa subledger: komponen HPP dari kategori jurnal, difilter di
+    # database. Sesudah tutup buku, persediaan awal = saldo akun persediaan di snapshot.
+    komponen = dict.fromkeys(KATEGORI_HPP, 0)
+    tutup = tutup_buku_terakhir()
+    if tutup:
+        coa = coa_per_kode()
+        komponen["persediaan_awal"] = sum(
+            saldo["saldo_debit"] - saldo["saldo_kredit"]
+            for kode, saldo in saldo_snapshot(tutup["periode"]).items()
+            if 'persediaan' in coa.get(kode, {}).get("nama_akun", '').lower()
+        )
+
+    def filter_query(query):
+        query = query.in_("kategori", list(KATEGORI_HPP))
+        return query.gt("tanggal", tutup["tanggal_akhir"]) if tutup else query
+
+    for jurnal in baca_jurnal("kategori, jumlah", filter_query):
+        komponen[jurnal["kategori"]] += jurnal["jumlah"]
+    return {**komponen, "hpp": komponen["persediaan_awal"] + komponen["pembelian"] - komponen["persediaan_akhir"]}
+
+def hpp_persediaan(periode):
+    # HPP periode dari subledger: persediaan awal + pembelian - persediaan akhir
+    # per item, dengan nilai keluar yang sudah dihitung saat mutasi dicatat
+    dari, sampai, label_periode = jendela_periode(periode)
+    hasil = supabase.rpc("hpp_persediaan", {"p_dari": dari, "p_sampai": sampai}).execute()
+
+    items = []
+    for baris in hasil.data or []:
+        items.append({
+            **baris,
+            "qty_akhir": baris["qty_awal"] + baris["qty_masuk"] - baris["qty_keluar"],
+            "nilai_akhir": baris["nilai_awal"] + baris["nilai_masuk"] - baris["nilai_keluar"]
+        })
+
+    return {
+        "periode": label_periode,
+        "items": items,
+        "persediaan_awal": sum(item["nilai_awal"] for item in items),
+        "pembelian": sum(item["nilai_masuk"] for item in items),
+        "persediaan_akhir": sum(item["nilai_akhir"] for item in items),
+        "hpp": sum(item["nilai_keluar"] for item in items)
+    }
+
+# ---------------------------
+# ROUTES - SEMUA DITARUH DI BAWAH TEMPLATE
+# ---------------------------
+
+@app.route("/")
+def index():
+    return redirect("/login")
+
+@app.route("/register")
+def register():
+    return render_template("register.html")
+
+@app.route("/login")
+def login():
+    return render_template("login.html")
+
+@app.route("/login_success", methods=["POST"])
+def login_success():
+    email = request.form["email"]
+    password = request.form["password"]
+    user = supabase.table("users").select("*").eq("email", email).execute()
+    if user.data and check_password_hash(user.data[0]["password"], password):
+        session["email"] = email
+        return redirect("/dashboard")
+    else:
+        return render_template("login.html", message="❌ Email atau password salah")
+
+@app.route("/send_otp", methods=["POST"])
+def send_otp():
+    email = request.form["email"]
+    password = request.form["password"]
+    otp = random.randint(100000, 999999)
+    session["otp"] = otp
+    session["email"] = email
+    session["password"] = password
+
+    try:
+        msg = EmailMessage()
+        msg.set_content(f"Kode OTP Anda: {otp}")
+        msg["Subject"] = "OTP untuk SiUdang"
+        msg["From"] = EMAIL_SENDER
+        msg["To"] = email
+
+        # Email dikirim thread outbox; request tidak menunggu SMTP
+        if not smtp_outbox.kirim(msg):
+            return render_template("register.html", message="❌ Server email sedang sibuk, coba lagi sebentar.")
+
+        return render_template("verify.html")
+    except Exception as e:
+        print(e)
+        return render_template("register.html", message="❌ Gagal mengirim OTP")
+
+@app.route("/verify_otp", methods=["POST"])
+def verify_otp():
+    otp_input = request.form["otp"]
+    if str(session.get("otp")) == otp_input:
+        try:
+            hashed_password = generate_password_hash(session["password"])
+            supabase.table("users").insert({
+                "email": session["email"],
+                "password": hashed_password,
+                "created_at": str(datetime.datetime.now())
+            }).execute()
+            session.pop("otp", None)
+            return redirect("/dashboard")
+        except Exception as e:
+            print(e)
+            return render_template("verify.html", message="❌ Gagal menyimpan user ke database.")
+    else:
+        return render_template("verify.html", message="OTP salah. Coba lagi!")
+
+@app.route("/dashboard")
+def dashboard():
+    if "email" in session:
+        return render_template("dashboard.html", email=session["email"])
+    return redirect("/login")
+
+@app.route("/coa", methods=["GET", "POST"])
+def coa():
+    if "email" not in session:
+        return redirect("/login")
+
+    message = ""
+
+    if request.method == "POST":
+        kode_akun = request.form["kode_akun"]
+        nama_akun = request.form["nama_akun"]
+        tipe_akun = request.form["tipe_akun"]
+
+        try:
+            supabase.table("coa").insert({
+                "kode_akun": kode_akun,
+                "nama_akun": nama_akun,
+                "tipe_akun": tipe_akun,
+            }).execute()
+            message = "✅ Akun berhasil ditambahkan!"
+        except Exception as e:
+            print(e)
+            message = "❌ Gagal menambahkan akun."
+        finally:
+            invalidasi_coa()
+
+    coa_list = ambil_coa()
 
-    return render_template_string(coa_html, coa_list=coa_list, message=message)
+    return render_template("coa.html", coa_list=coa_list, message=message)
 
 @app.route("/input_jurnal", methods=["GET", "POST"])
 def input_jurnal():
@@ -2561,36 +5603,79 @@ def input_jurnal():
 
     message = ""
 
-    # Ambil daftar akun dari tabel COA untuk dropdown
-    coa_data = supabase.table("coa").select("*").execute()
-    coa_list = coa_data.data if coa_data.data else []
+    # Ambil daftar akun dari cache COA untuk dropdown
+    coa_list = ambil_coa()
 
-    # Jika form disubmit
-    if request.method == "POST":
+    # Jika form disubmit dengan baris-baris akun (jurnal majemuk)
+    if request.method == "POST" and request.form.getlist("akun"):
+        tanggal = request.form["tanggal"]
+        keterangan = request.form["keterangan"]
+        akun_coa = coa_per_tampilan()
+
+        try:
+            baris_list = []
+            for akun, jenis, jumlah in zip(request.form.getlist("akun"),
+                                           request.form.getlist("jenis_akun"),
+                                           request.form.getlist("jumlah_akun")):
+                if akun not in akun_coa:
+                    raise ValueError(f"Akun {akun} tidak terdaftar di COA")
+                if jenis not in ("debit", "kredit"):
+                    raise ValueError("Pilih debit atau kredit untuk setiap akun")
+                try:
+                    baris_list.append((akun_coa[akun], jenis, parse_jumlah(jumlah)))
+                except ValueError:
+                    raise ValueError(f"Format jumlah tidak valid: {jumlah}")
+
+            tersimpan = simpan_jurnal_majemuk(tanggal, keterangan, baris_list)
+            if tersimpan:
+                message = f"✅ Jurnal berhasil disimpan! ({len(baris_list)} baris akun)"
+            else:
+                message = "❌ Gagal menyimpan jurnal."
+        except ValueError as e:
+            message = f"❌ {e}"
+        except Exception as e:
+            print("Error:", e)
+            message = "❌ Terjadi kesalahan saat menyimpan jurnal."
+
+    # Form lama: satu pasangan akun debit/kredit
+    elif request.method == "POST":
         tanggal = request.form["tanggal"]
         akun_debit = request.form["akun_debit"]
         akun_kredit = request.form["akun_kredit"]
         keterangan = request.form["keterangan"]
-        jumlah_str = request.form["jumlah"].replace("Rp ", "").replace(".", "")
         
         try:
-            jumlah = float(jumlah_str)
+            jumlah = parse_jumlah(request.form["jumlah"])
         except ValueError:
             message = "❌ Format jumlah tidak valid"
-            return render_template_string(input_jurnal_html, coa_list=coa_list, message=message)
+            return render_template("input_jurnal.html", coa_list=coa_list, message=message)
+
+        # Pastikan kedua akun terdaftar di COA
+        akun_coa = coa_per_tampilan()
+        if akun_debit not in akun_coa or akun_kredit not in akun_coa:
+            message = "❌ Akun tidak terdaftar di COA"
+            return render_template("input_jurnal.html", coa_list=coa_list, message=message)
+
+        try:
+            cek_periode_terbuka(tanggal)
+        except ValueError as e:
+            message = f"❌ {e}"
+            return render_template("input_jurnal.html", coa_list=coa_list, message=message)
 
         try:
             # Simpan ke tabel jurnal di Supabase
-            response = supabase.table("jurnal").insert({
+            tersimpan = simpan_jurnal_batch([{
                 "tanggal": tanggal,
                 "akun_debit": akun_debit,
                 "akun_kredit": akun_kredit,
+                "kode_debit": akun_coa[akun_debit]["kode_akun"],
+                "kode_kredit": akun_coa[akun_kredit]["kode_akun"],
                 "keterangan": keterangan,
                 "jumlah": jumlah,
                 "created_at": str(datetime.datetime.now())
-            }).execute()
+            }])
             
-            if response.data:
+            if tersimpan:
                 message = "✅ Jurnal berhasil disimpan!"
             else:
                 message = "❌ Gagal menyimpan jurnal."
@@ -2599,32 +5684,115 @@ def input_jurnal():
             print("Error:", e)
             message = "❌ Terjadi kesalahan saat menyimpan jurnal."
 
-    return render_template_string(input_jurnal_html, coa_list=coa_list, message=message)
+    return render_template("input_jurnal.html", coa_list=coa_list, message=message)
+
+@app.route("/import_jurnal", methods=["GET", "POST"])
+def import_jurnal():
+    if "email" not in session:
+        return redirect("/login")
+
+    message = ""
+    errors = []
+
+    if request.method == "POST":
+        file = request.files.get("file")
+        nama_file = secure_filename(file.filename) if file and file.filename else ""
+        ekstensi = os.path.splitext(nama_file)[1].lower()
+
+        if ekstensi not in IMPORT_EKSTENSI:
+            message = "❌ File harus berformat .csv atau .xlsx"
+        else:
+            # Simpan dulu ke folder upload, lalu dibaca bertahap dari disk
+            path = os.path.join(app.config["UPLOAD_FOLDER"], f"{uuid.uuid4().hex}_{nama_file}")
+            file.save(path)
+            try:
+                tersimpan, errors = import_jurnal_file(path)
+                message = f"✅ {tersimpan} transaksi berhasil diimport."
+                if errors:
+                    message += f" ❌ {len(errors)} baris gagal."
+            except Exception as e:
+                print("Error:", e)
+                message = f"❌ Gagal membaca file: {e}"
+            finally:
+                os.remove(path)
+
+    return render_template("import_jurnal.html", message=message, errors=errors[:200], total_error=len(errors))
+
+@app.route("/tutup_buku", methods=["GET", "POST"])
+def tutup_buku():
+    if "email" not in session:
+        return redirect("/login")
+
+    message = ""
+
+    if request.method == "POST":
+        periode = request.form.get("periode", "")
+        try:
+            saldo_list = tutup_periode(periode)
+            message = f"✅ Periode {periode} ditutup, snapshot saldo {len(saldo_list)} akun disimpan."
+        except ValueError as e:
+            message = f"❌ {e}"
+        except Exception as e:
+            print("Error:", e)
+            message = "❌ Gagal menutup periode."
+
+    try:
+        daftar_tutup = daftar_tutup_buku()
+    except Exception as e:
+        print("Error:", e)
+        daftar_tutup = []
+
+    return render_template("tutup_buku.html", message=message, daftar_tutup=daftar_tutup)
 
 @app.route("/jurnal_umum")
+@respons_bersyarat
 def jurnal_umum():
     if "email" not in session:
         return redirect("/login")
 
-    # Ambil data jurnal dari database
+    # Parameter filter dan paginasi (keyset pada tanggal, id)
+    dari = ambil_tanggal_param('dari')
+    sampai = ambil_tanggal_param('sampai')
+    per_halaman = ambil_angka_param('per_halaman', JURNAL_PER_HALAMAN, 1, JURNAL_PER_HALAMAN_MAKS)
+    setelah_tanggal = ambil_tanggal_param('setelah_tanggal')
+    setelah_id = ambil_angka_param('setelah_id', 0, 0, 2**63 - 1)
+
+    # Total kumulatif halaman-halaman sebelumnya dibawa lewat URL,
+    # jadi halaman ini tidak perlu membaca ulang baris sebelumnya
+    try:
+        total_sebelumnya = int(request.args.get('total_sebelumnya', 0))
+    except ValueError:
+        total_sebelumnya = 0
+
+    next_url = None
+    first_url = None
+
+    # Ambil satu halaman data jurnal dari database
     try:
-        jurnal_data = supabase.table("jurnal").select("*").order("tanggal").execute()
+        query = supabase.table("jurnal").select("*")
+        if dari:
+            query = query.gte("tanggal", dari)
+        if sampai:
+            query = query.lte("tanggal", sampai)
+        if setelah_tanggal:
+            query = query.or_(f"tanggal.gt.{setelah_tanggal},and(tanggal.eq.{setelah_tanggal},id.gt.{setelah_id})")
+
+        # Ambil satu baris lebih untuk mengetahui apakah masih ada halaman berikutnya
+        jurnal_data = query.order("tanggal").order("id").limit(per_halaman + 1).execute()
         jurnal_list = jurnal_data.data if jurnal_data.data else []
+        ada_berikutnya = len(jurnal_list) > per_halaman
+        jurnal_list = jurnal_list[:per_halaman]
         
         # Proses data untuk format baru
+        akun_coa = coa_per_kode()
         processed_jurnal = []
         for jurnal in jurnal_list:
-            # Ekstrak kode akun dari nama akun (format: "Nama Akun (KODE)")
-            akun_debit = jurnal["akun_debit"]
-            akun_kredit = jurnal["akun_kredit"]
+            # Kode akun dari kolom terstruktur, nama akun dari COA
+            kode_akun_debit = kode_jurnal(jurnal, "debit")
+            kode_akun_kredit = kode_jurnal(jurnal, "kredit")
             
-            # Ambil kode akun dari dalam kurung
-            kode_akun_debit = akun_debit.split('(')[-1].replace(')', '').strip() if '(' in akun_debit else ''
-            kode_akun_kredit = akun_kredit.split('(')[-1].replace(')', '').strip() if '(' in akun_kredit else ''
-            
-            # Ambil nama akun tanpa kode
-            nama_akun_debit = akun_debit.split('(')[0].strip() if '(' in akun_debit else akun_debit
-            nama_akun_kredit = akun_kredit.split('(')[0].strip() if '(' in akun_kredit else akun_kredit
+            nama_akun_debit = akun_coa[kode_akun_debit]["nama_akun"] if kode_akun_debit in akun_coa else jurnal["akun_debit"].split('(')[0].strip()
+            nama_akun_kredit = akun_coa[kode_akun_kredit]["nama_akun"] if kode_akun_kredit in akun_coa else jurnal["akun_kredit"].split('(')[0].strip()
             
             processed_jurnal.append({
                 "tanggal": jurnal["tanggal"],
@@ -2636,22 +5804,48 @@ def jurnal_umum():
                 "jumlah": jurnal["jumlah"]
             })
         
-        # Hitung total debit dan kredit
-        total_debit = sum(jurnal["jumlah"] for jurnal in jurnal_list if jurnal["jumlah"])
+        # Hitung total debit dan kredit kumulatif sampai akhir halaman ini
+        total_halaman = sum(jurnal["jumlah"] for jurnal in jurnal_list if jurnal["jumlah"])
+        total_debit = total_sebelumnya + total_halaman
         total_kredit = total_debit  # Karena sistem double entry, debit = kredit
+
+        # Link halaman berikutnya dan halaman pertama
+        filter_params = {"per_halaman": per_halaman}
+        if dari:
+            filter_params["dari"] = dari
+        if sampai:
+            filter_params["sampai"] = sampai
+        if ada_berikutnya:
+            terakhir = jurnal_list[-1]
+            next_url = "/jurnal_umum?" + urlencode({
+                **filter_params,
+                "setelah_tanggal": terakhir["tanggal"],
+                "setelah_id": terakhir["id"],
+                "total_sebelumnya": total_debit
+            })
+        if setelah_tanggal:
+            first_url = "/jurnal_umum?" + urlencode(filter_params)
         
     except Exception as e:
         print("Error:", e)
+        g.laporan_gagal = True
         processed_jurnal = []
         total_debit = 0
         total_kredit = 0
 
-    return render_template_string(jurnal_umum_html, 
+    return render_template("jurnal_umum.html", 
                                  jurnal_data=processed_jurnal, 
                                  total_debit=total_debit, 
-                                 total_kredit=total_kredit)
+                                 total_kredit=total_kredit,
+                                 total_sebelumnya=total_sebelumnya,
+                                 dari=dari,
+                                 sampai=sampai,
+                                 per_halaman=per_halaman,
+                                 next_url=next_url,
+                                 first_url=first_url)
 
 @app.route("/buku_besar")
+@respons_bersyarat
 def buku_besar():
     if "email" not in session:
         return redirect("/login")
@@ -2659,436 +5853,329 @@ def buku_besar():
     # Ambil parameter filter akun dari URL
     selected_akun = request.args.get('akun', '')
     
-    # Ambil daftar akun dari COA untuk dropdown
-    coa_data = supabase.table("coa").select("*").execute()
-    coa_list = coa_data.data if coa_data.data else []
-
-    # Ambil semua data jurnal
+    # Jendela tanggal yang ditampilkan
+    dari = ambil_tanggal_param('dari')
+    sampai = ambil_tanggal_param('sampai')
+    # Saldo per tanggal tertentu: baris sesudah as_of tidak ikut
+    as_of = ambil_tanggal_param('as_of')
+    if as_of and (not sampai or as_of < sampai):
+        sampai = as_of
+
+    # Kode akun diambil langsung dari nilai dropdown "Nama Akun (KODE)",
+    # jadi query jurnal tidak perlu menunggu COA
+    selected_kode = kode_dari_akun(selected_akun)
+
+    def ambil_buku_besar():
+        # Pakai ledger engine kalau sudah dimuat, atau kalau semua akun diminta
+        # (memuat engine sama mahalnya dengan membaca semua jurnal sekali).
+        # Kalau hanya satu akun dan engine belum dimuat, filter di database saja.
+        # Engine dimulai dari snapshot tutup buku terakhir; jendela yang dimulai di
+        # periode tertutup dibaca dari database (satu akun) atau engine sementara.
+        engine = ledger_engine_siap()
+        if engine is None and not selected_kode:
+            engine = ledger_engine()
+        if engine is not None and engine.mencakup(dari):
+            return engine.buku_besar(selected_kode, dari, sampai)
+        if selected_kode:
+            return buku_besar_dari_database(selected_kode, dari, sampai)
+        return ledger_engine_historis(dari, sampai).buku_besar(selected_kode, dari, sampai)
+
+    # COA (dropdown) dan data buku besar diambil bersamaan
     try:
-        jurnal_data = supabase.table("jurnal").select("*").order("tanggal").execute()
-        jurnal_list = jurnal_data.data if jurnal_data.data else []
+        hasil_paralel = jalankan_paralel(coa=ambil_coa, buku_besar=ambil_buku_besar)
+        coa_list = hasil_paralel["coa"]
+        hasil = hasil_paralel["buku_besar"]
     except Exception as e:
         print("Error:", e)
-        jurnal_list = []
-
-    # Proses data untuk buku besar
-    buku_besar_data = []
-    saldo_akun = {}
-
-    for jurnal in jurnal_list:
-        # Proses akun debit
-        akun_debit = jurnal["akun_debit"]
-        if not selected_akun or akun_debit == selected_akun:
-            if akun_debit not in saldo_akun:
-                saldo_akun[akun_debit] = 0
-            
-            saldo_akun[akun_debit] += jurnal["jumlah"]
-            
-            buku_besar_data.append({
-                "tanggal": jurnal["tanggal"],
-                "keterangan": jurnal["keterangan"],
-                "tipe": "debit",
-                "jumlah": jurnal["jumlah"],
-                "saldo_akumulasi": saldo_akun[akun_debit],
-                "akun": akun_debit
-            })
-
-        # Proses akun kredit
-        akun_kredit = jurnal["akun_kredit"]
-        if not selected_akun or akun_kredit == selected_akun:
-            if akun_kredit not in saldo_akun:
-                saldo_akun[akun_kredit] = 0
-            
-            saldo_akun[akun_kredit] -= jurnal["jumlah"]
-            
-            buku_besar_data.append({
-                "tanggal": jurnal["tanggal"],
-                "keterangan": jurnal["keterangan"],
-                "tipe": "kredit",
-                "jumlah": jurnal["jumlah"],
-                "saldo_akumulasi": saldo_akun[akun_kredit],
-                "akun": akun_kredit
-            })
-
-    # Urutkan berdasarkan tanggal
-    buku_besar_data.sort(key=lambda x: x["tanggal"])
-
-    # Hitung total debit dan kredit untuk akun yang dipilih
-    total_debit = sum(item["jumlah"] for item in buku_besar_data if item["tipe"] == "debit" and (not selected_akun or item["akun"] == selected_akun))
-    total_kredit = sum(item["jumlah"] for item in buku_besar_data if item["tipe"] == "kredit" and (not selected_akun or item["akun"] == selected_akun))
-    
-    # Hitung saldo akhir
-    if selected_akun and selected_akun in saldo_akun:
-        saldo_akhir = saldo_akun[selected_akun]
-    else:
-        saldo_akhir = total_debit - total_kredit
+        g.laporan_gagal = True
+        coa_list = []
+        hasil = {"buku_besar_data": [], "total_debit": 0, "total_kredit": 0, "saldo_awal": 0, "saldo_akhir": 0}
 
-    # Filter data berdasarkan akun yang dipilih
-    if selected_akun:
-        buku_besar_data = [item for item in buku_besar_data if item["akun"] == selected_akun]
-
-    return render_template_string(buku_besar_html, 
+    return render_template("buku_besar.html", 
                                  coa_list=coa_list,
-                                 buku_besar_data=buku_besar_data,
                                  selected_akun=selected_akun,
-                                 total_debit=total_debit,
-                                 total_kredit=total_kredit,
-                                 saldo_akhir=saldo_akhir)
+                                 dari=dari,
+                                 sampai=sampai,
+                                 as_of=as_of,
+                                 **hasil)
 
 @app.route("/neraca_saldo")
+@respons_bersyarat
 def neraca_saldo():
     if "email" not in session:
         return redirect("/login")
 
-    try:
-        # Ambil semua data COA
-        coa_data = supabase.table("coa").select("*").execute()
-        coa_list = coa_data.data if coa_data.data else []
-
-        # Ambil semua data jurnal
-        jurnal_data = supabase.table("jurnal").select("*").execute()
-        jurnal_list = jurnal_data.data if jurnal_data.data else []
+    # Neraca saldo per tanggal tertentu (kosong = saldo berjalan). Dengan `dari`
+    # yang ditampilkan mutasi per akun dari `dari` s.d. as_of (default hari ini).
+    as_of = ambil_tanggal_param('as_of')
+    dari = ambil_tanggal_param('dari')
+    if dari and not as_of:
+        as_of = datetime.date.today().isoformat()
 
-        # Buat struktur untuk menyimpan saldo setiap akun
-        saldo_akun = {}
-        
-        # Inisialisasi saldo untuk setiap akun di COA
-        for akun in coa_list:
-            kode_akun = akun["kode_akun"]
-            saldo_akun[kode_akun] = {
-                "kode_akun": kode_akun,
-                "nama_akun": akun["nama_akun"],
-                "tipe_akun": akun["tipe_akun"],
-                "saldo_debit": 0,
-                "saldo_kredit": 0
+    try:
+        def ambil_saldo():
+            # Mutasi periode: selisih dua titik indeks saldo engine kalau periodenya
+            # sesudah snapshot, selain itu selisih dua saldo kumulatif di database
+            if dari:
+                engine = ledger_engine()
+                if engine.mencakup(dari):
+                    return engine.mutasi_semua_antara(dari, as_of)
+                sebelum = (datetime.date.fromisoformat(dari) - datetime.timedelta(days=1)).isoformat()
+                awal = saldo_akun_sampai(sebelum)
+                akhir = saldo_akun_sampai(as_of)
+                kosong = {"saldo_debit": 0, "saldo_kredit": 0}
+                return {
+                    kode: {
+                        "saldo_debit": saldo["saldo_debit"] - awal.get(kode, kosong)["saldo_debit"],
+                        "saldo_kredit": saldo["saldo_kredit"] - awal.get(kode, kosong)["saldo_kredit"]
+                    }
+                    for kode, saldo in akhir.items()
+                }
+            # Per tanggal: indeks saldo engine kalau tanggalnya sesudah snapshot,
+            # selain itu agregat snapshot + jurnal di database
+            if as_of:
+                engine = ledger_engine()
+                if engine.mencakup(hari_berikutnya(as_of)):
+                    return engine.saldo_semua_pada(as_of)
+                return saldo_akun_sampai(as_of)
+            # Ambil saldo berjalan per akun (satu baris per akun, bukan seluruh jurnal).
+            # Sebelum saldo_akun pernah dibangun, pakai agregat GROUP BY di database.
+            saldo_data = supabase.table("saldo_akun").select("kode_akun, saldo_debit, saldo_kredit").execute()
+            if not saldo_data.data:
+                return agregat_neraca_saldo()
+            return {
+                saldo["kode_akun"]: {
+                    "saldo_debit": saldo["saldo_debit"] or 0,
+                    "saldo_kredit": saldo["saldo_kredit"] or 0
+                }
+                for saldo in saldo_data.data
             }
 
-        # Proses setiap transaksi jurnal
-        for jurnal in jurnal_list:
-            # Ekstrak kode akun dari nama akun (format: "Nama Akun (KODE)")
-            akun_debit_full = jurnal["akun_debit"]
-            akun_kredit_full = jurnal["akun_kredit"]
-            
-            # Ambil kode akun dari string
-            kode_debit = akun_debit_full.split('(')[-1].replace(')', '').strip() if '(' in akun_debit_full else ''
-            kode_kredit = akun_kredit_full.split('(')[-1].replace(')', '').strip() if '(' in akun_kredit_full else ''
-            
-            jumlah = jurnal["jumlah"]
-
-            # Update saldo untuk akun debit
-            if kode_debit and kode_debit in saldo_akun:
-                saldo_akun[kode_debit]["saldo_debit"] += jumlah
-
-            # Update saldo untuk akun kredit
-            if kode_kredit and kode_kredit in saldo_akun:
-                saldo_akun[kode_kredit]["saldo_kredit"] += jumlah
-
-        # Konversi ke list untuk ditampilkan
-        neraca_saldo_list = list(saldo_akun.values())
+        # COA dan saldo per akun diambil bersamaan
+        hasil = jalankan_paralel(coa=ambil_coa, saldo=ambil_saldo)
+        neraca_saldo_list = susun_neraca_saldo(hasil["coa"], hasil["saldo"])
         
         # Hitung total debit dan kredit
         total_debit = sum(akun["saldo_debit"] for akun in neraca_saldo_list)
         total_kredit = sum(akun["saldo_kredit"] for akun in neraca_saldo_list)
 
-        return render_template_string(
-            neraca_saldo_html,
+        return render_template(
+            "neraca_saldo.html",
             neraca_saldo=neraca_saldo_list,
             total_debit=total_debit,
-            total_kredit=total_kredit
+            total_kredit=total_kredit,
+            as_of=as_of,
+            dari=dari
         )
 
     except Exception as e:
         print("Error:", e)
-        return render_template_string(neraca_saldo_html, neraca_saldo=None, total_debit=0, total_kredit=0)
+        g.laporan_gagal = True
+        return render_template("neraca_saldo.html", neraca_saldo=None, total_debit=0, total_kredit=0, as_of=as_of, dari=dari)
 
 @app.route("/hitung_hpp")
 def hitung_hpp():
     if "email" not in session:
         return redirect("/login")
 
+    periode = (request.args.get("periode") or '').strip() or datetime.date.today().strftime("%Y-%m")
     try:
-        # Ambil data jurnal untuk menghitung HPP otomatis
-        jurnal_data = supabase.table("jurnal").select("*").execute()
-        jurnal_list = jurnal_data.data if jurnal_data.data else []
-
-        # Inisialisasi variabel HPP
-        persediaan_awal = 0
-        pembelian = 0
-        persediaan_akhir = 0
-
-        # Analisis transaksi untuk menghitung komponen HPP
-        for jurnal in jurnal_list:
-            keterangan = jurnal["keterangan"].lower()
-            akun_debit = jurnal["akun_debit"].lower()
-            akun_kredit = jurnal["akun_kredit"].lower()
-            jumlah = jurnal["jumlah"]
+        # HPP dari subledger persediaan perpetual; data lama tanpa item persediaan
+        # masih dihitung dari kategori jurnal
+        hpp_data = hpp_persediaan(periode)
+        if not hpp_data["items"]:
+            hpp_data = {**hpp_dari_kategori(), "periode": "Semua periode (dari kategori jurnal)", "items": []}
 
-            # Identifikasi transaksi persediaan awal
-            if any(keyword in keterangan for keyword in ['persediaan awal', 'saldo awal', 'stok awal']):
-                if 'persediaan' in akun_debit:
-                    persediaan_awal += jumlah
+        # Siapkan data untuk ditampilkan
+        if hpp_data["persediaan_awal"] <= 0 and hpp_data["pembelian"] <= 0:
+            hpp_data = None
 
-            # Identifikasi transaksi pembelian
-            elif any(keyword in keterangan for keyword in ['pembelian', 'beli udang', 'beli bibit']):
-                if 'persediaan' in akun_debit or 'pembelian' in akun_debit:
-                    pembelian += jumlah
+        return render_template("hpp.html", hpp_data=hpp_data, periode=periode, message="")
 
-            # Identifikasi transaksi persediaan akhir (biasanya dari penyesuaian)
-            elif any(keyword in keterangan for keyword in ['persediaan akhir', 'stock opname', 'penyesuaian persediaan']):
-                if 'persediaan' in akun_debit:
-                    persediaan_akhir += jumlah
+    except ValueError as e:
+        return render_template("hpp.html", hpp_data=None, periode=periode, message=f"❌ {e}")
+    except Exception as e:
+        print("Error:", e)
+        return render_template("hpp.html", hpp_data=None, periode=periode, message="")
 
-        # Hitung HPP
-        hpp = persediaan_awal + pembelian - persediaan_akhir
+@app.route("/persediaan", methods=["GET", "POST"])
+def persediaan():
+    if "email" not in session:
+        return redirect("/login")
 
-        # Siapkan data untuk ditampilkan
-        hpp_data = None
-        if persediaan_awal > 0 or pembelian > 0:
-            hpp_data = {
-                "persediaan_awal": persediaan_awal,
-                "pembelian": pembelian,
-                "persediaan_akhir": persediaan_akhir,
-                "hpp": hpp
-            }
+    message = ""
+    if request.method == "POST":
+        aksi = request.form.get("aksi")
+        try:
+            if aksi == "tambah_item":
+                simpan_item_persediaan(
+                    request.form["kode_item"],
+                    request.form["nama_item"],
+                    request.form["jenis"],
+                    request.form.get("satuan", ''),
+                    request.form["metode"],
+                    request.form.get("kode_akun", '')
+                )
+                message = "✅ Item persediaan berhasil ditambahkan."
+            elif aksi == "mutasi":
+                mutasi = catat_mutasi_persediaan(
+                    request.form["item_id"],
+                    request.form["tanggal"],
+                    request.form["jenis"],
+                    request.form["qty"],
+                    request.form.get("harga_satuan", '0'),
+                    request.form.get("keterangan", ''),
+                    posting_jurnal=bool(request.form.get("posting_jurnal")),
+                    kode_akun_bayar=request.form.get("kode_akun_bayar", '')
+                )
+                message = f"✅ Mutasi tersimpan, nilai Rp {mutasi['nilai']:,.0f}."
+        except ValueError as e:
+            message = f"❌ {e}"
+        except Exception as e:
+            print("Error:", e)
+            message = "❌ Terjadi kesalahan saat mencatat persediaan."
 
-        return render_template_string(hpp_html, hpp_data=hpp_data)
+    try:
+        hasil = jalankan_paralel(items=ambil_item_persediaan, mutasi=ambil_mutasi_persediaan, coa=ambil_coa)
+        nama_item = {item["id"]: item["nama_item"] for item in hasil["items"]}
+        return render_template(
+            "persediaan.html",
+            items=hasil["items"],
+            mutasi_list=[{**mutasi, "nama_item": nama_item.get(mutasi["item_id"], '')} for mutasi in hasil["mutasi"]],
+            akun_persediaan=[akun for akun in hasil["coa"] if 'persediaan' in akun["nama_akun"].lower()],
+            akun_bayar=[akun for akun in hasil["coa"] if akun["tipe_akun"] in ("Aset", "Kewajiban")
+                        and 'persediaan' not in akun["nama_akun"].lower()],
+            jenis_persediaan=JENIS_PERSEDIAAN,
+            metode_persediaan=METODE_PERSEDIAAN,
+            message=message
+        )
 
     except Exception as e:
         print("Error:", e)
-        return render_template_string(hpp_html, hpp_data=None)
+        return render_template("persediaan.html", items=[], mutasi_list=[], akun_persediaan=[], akun_bayar=[],
+                               jenis_persediaan=JENIS_PERSEDIAAN, metode_persediaan=METODE_PERSEDIAAN,
+                               message=message)
 
-@app.route("/buku_pembantu_penyusutan")
+@app.route("/buku_pembantu_penyusutan", methods=["GET", "POST"])
 def buku_pembantu_penyusutan():
     if "email" not in session:
         return redirect("/login")
 
-    try:
-        # Ambil data COA untuk identifikasi aset tetap
-        coa_data = supabase.table("coa").select("*").execute()
-        coa_list = coa_data.data if coa_data.data else []
-
-        # Ambil data jurnal untuk analisis aset tetap
-        jurnal_data = supabase.table("jurnal").select("*").execute()
-        jurnal_list = jurnal_data.data if jurnal_data.data else []
-
-        # Identifikasi aset tetap dari COA
-        aset_tetap_coa = [akun for akun in coa_list if any(keyword in akun["nama_akun"].lower() 
-                          for keyword in ['peralatan', 'kendaraan', 'bangunan', 'mesin', 'aset', 'inventaris'])]
-
-        # Analisis transaksi untuk aset tetap
-        aset_penyusutan = []
-
-        for aset_coa in aset_tetap_coa:
-            # Cari transaksi pembelian aset ini
-            transaksi_aset = []
-            for jurnal in jurnal_list:
-                if (aset_coa["kode_akun"] in jurnal["akun_debit"] or 
-                    aset_coa["kode_akun"] in jurnal["akun_kredit"]):
-                    # Identifikasi transaksi pembelian
-                    if any(keyword in jurnal["keterangan"].lower() 
-                           for keyword in ['pembelian', 'beli', 'perolehan']):
-                        transaksi_aset.append(jurnal)
-
-            if transaksi_aset:
-                # Hitung total nilai aset
-                total_nilai = 0
-                tanggal_perolehan = None
-                
-                for transaksi in transaksi_aset:
-                    if aset_coa["kode_akun"] in transaksi["akun_debit"]:
-                        total_nilai += transaksi["jumlah"]
-                    if not tanggal_perolehan:
-                        tanggal_perolehan = transaksi["tanggal"]
-
-                if total_nilai > 0:
-                    # Tentukan umur ekonomis berdasarkan jenis aset
-                    nama_aset = aset_coa["nama_akun"].lower()
-                    if 'kendaraan' in nama_aset:
-                        umur_ekonomis = 5
-                        nilai_residu = total_nilai * 0.1  # 10% dari harga perolehan
-                    elif 'peralatan' in nama_aset:
-                        umur_ekonomis = 3
-                        nilai_residu = total_nilai * 0.05  # 5% dari harga perolehan
-                    elif 'bangunan' in nama_aset:
-                        umur_ekonomis = 20
-                        nilai_residu = total_nilai * 0.2  # 20% dari harga perolehan
-                    else:
-                        umur_ekonomis = 5
-                        nilai_residu = total_nilai * 0.1  # 10% dari harga perolehan
-
-                    # Hitung penyusutan per tahun
-                    penyusutan_per_tahun = (total_nilai - nilai_residu) / umur_ekonomis
-
-                    # Buat jadwal penyusutan untuk 5 tahun ke depan
-                    jadwal_penyusutan = []
-                    akumulasi_penyusutan = 0
-                    
-                    for tahun in range(1, umur_ekonomis + 1):
-                        akumulasi_penyusutan += penyusutan_per_tahun
-                        nilai_buku = total_nilai - akumulasi_penyusutan
-                        
-                        jadwal_penyusutan.append({
-                            "tahun_ke": tahun,
-                            "beban_penyusutan": penyusutan_per_tahun,
-                            "akumulasi_penyusutan": akumulasi_penyusutan,
-                            "nilai_buku": nilai_buku
-                        })
-
-                    # Tentukan status aset
-                    status = "Aktif" if nilai_buku > nilai_residu else "Nonaktif"
-
-                    aset_penyusutan.append({
-                        "kode_aset": aset_coa["kode_akun"],
-                        "nama_aset": aset_coa["nama_akun"],
-                        "tanggal_perolehan": tanggal_perolehan,
-                        "harga_perolehan": total_nilai,
-                        "nilai_residu": nilai_residu,
-                        "umur_ekonomis": umur_ekonomis,
-                        "penyusutan_per_tahun": penyusutan_per_tahun,
-                        "jadwal_penyusutan": jadwal_penyusutan,
-                        "status": status
-                    })
+    message = ""
+    if request.method == "POST":
+        try:
+            ubah_aset_tetap(
+                request.form["id"],
+                request.form["umur_ekonomis"],
+                request.form["nilai_residu"],
+                request.form["metode"]
+            )
+            message = "✅ Data penyusutan aset berhasil diperbarui."
+        except ValueError as e:
+            message = f"❌ {e}"
+        except Exception as e:
+            print("Error:", e)
+            message = "❌ Terjadi kesalahan saat memperbarui aset."
 
-        return render_template_string(
-            buku_penyusutan_html,
-            aset_penyusutan=aset_penyusutan
+    try:
+        # Jadwal bulanan semua aset dihitung sekaligus dan di-cache sampai register berubah
+        aset_penyusutan = jadwal_penyusutan(*jadwal_bulanan())
+
+        return render_template(
+            "buku_penyusutan.html",
+            aset_penyusutan=aset_penyusutan,
+            metode_penyusutan=METODE_PENYUSUTAN,
+            message=message
         )
 
     except Exception as e:
         print("Error:", e)
-        return render_template_string(buku_penyusutan_html, aset_penyusutan=None)
+        return render_template("buku_penyusutan.html", aset_penyusutan=None,
+                               metode_penyusutan=METODE_PENYUSUTAN, message=message)
 
-@app.route("/jurnal_penyesuaian")
+@app.route("/jurnal_penyesuaian", methods=["GET", "POST"])
 def jurnal_penyesuaian():
     if "email" not in session:
         return redirect("/login")
 
-    try:
-        # Ambil data untuk generate jurnal penyesuaian otomatis
-        jurnal_penyesuaian_list = []
-        total_debit = 0
-        total_kredit = 0
+    message = ""
+    periode = (request.values.get("periode") or '').strip() or datetime.date.today().strftime("%Y-%m")
 
-        # 1. Penyesuaian Penyusutan Aset Tetap
-        aset_penyusutan_data = []  # Data dari buku penyusutan
-        
-        # Simulasi data penyusutan (dalam implementasi nyata, ambil dari perhitungan sebelumnya)
-        # Contoh: Penyusutan peralatan
-        jurnal_penyesuaian_list.append({
-            "tanggal": datetime.datetime.now().strftime("%Y-%m-%d"),
-            "keterangan": "Penyusutan Peralatan Tambak Bulan Ini",
-            "akun_debit": "Beban Penyusutan Peralatan",
-            "akun_kredit": "Akumulasi Penyusutan Peralatan",
-            "kode_akun_debit": "511",
-            "kode_akun_kredit": "114",
-            "jumlah": 500000
-        })
-        total_debit += 500000
-        total_kredit += 500000
-
-        # 2. Penyesuaian Beban yang Masih Harus Dibayar
-        jurnal_penyesuaian_list.append({
-            "tanggal": datetime.datetime.now().strftime("%Y-%m-%d"),
-            "keterangan": "Beban Gaji yang Masih Harus Dibayar",
-            "akun_debit": "Beban Gaji",
-            "akun_kredit": "Utang Gaji",
-            "kode_akun_debit": "512",
-            "kode_akun_kredit": "211",
-            "jumlah": 3000000
-        })
-        total_debit += 3000000
-        total_kredit += 3000000
-
-        # 3. Penyesuaian Pemakaian Perlengkapan
-        jurnal_penyesuaian_list.append({
-            "tanggal": datetime.datetime.now().strftime("%Y-%m-%d"),
-            "keterangan": "Pemakaian Perlengkapan Tambak",
-            "akun_debit": "Beban Perlengkapan",
-            "akun_kredit": "Perlengkapan",
-            "kode_akun_debit": "513",
-            "kode_akun_kredit": "113",
-            "jumlah": 750000
-        })
-        total_debit += 750000
-        total_kredit += 750000
+    if request.method == "POST":
+        aksi = request.form.get("aksi")
+        try:
+            if aksi == "generate":
+                # Penyusutan dari register aset tetap + aturan akrual, dibuat sekaligus
+                tersimpan, tanpa_akun = generate_penyesuaian(periode)
+                message = f"✅ {len(tersimpan)} jurnal penyesuaian periode {periode} berhasil dibuat."
+                if tanpa_akun:
+                    message += (" ❌ Penyusutan dilewati, akun beban/akumulasi penyusutan belum ada di COA untuk: "
+                                + ", ".join(tanpa_akun))
+            elif aksi == "tambah_aturan":
+                simpan_aturan_akrual(
+                    request.form["keterangan"],
+                    request.form["akun_debit"],
+                    request.form["akun_kredit"],
+                    request.form["jumlah"]
+                )
+                message = "✅ Aturan akrual berhasil ditambahkan."
+            elif aksi == "nonaktif_aturan":
+                supabase.table("aturan_akrual").update({"aktif": False}).eq("id", int(request.form["id"])).execute()
+                message = "✅ Aturan akrual dinonaktifkan."
+        except ValueError as e:
+            message = f"❌ {e}"
+        except Exception as e:
+            print("Error:", e)
+            message = "❌ Terjadi kesalahan saat memproses jurnal penyesuaian."
+
+    try:
+        # Jurnal penyesuaian periode terpilih (YYYY menampilkan semua bulan di tahun itu)
+        jurnal_penyesuaian_list = [
+            penyesuaian for penyesuaian in ambil_penyesuaian()
+            if penyesuaian["periode"].startswith(periode)
+        ]
+        total = sum(penyesuaian["jumlah"] for penyesuaian in jurnal_penyesuaian_list)
+        hasil = jalankan_paralel(coa=ambil_coa, aturan=ambil_aturan_akrual)
 
-        return render_template_string(
-            jurnal_penyesuaian_html,
+        return render_template(
+            "jurnal_penyesuaian.html",
             jurnal_penyesuaian=jurnal_penyesuaian_list,
-            total_debit=total_debit,
-            total_kredit=total_kredit
+            total_debit=total,
+            total_kredit=total,
+            periode=periode,
+            message=message,
+            aturan_akrual=hasil["aturan"],
+            coa_list=hasil["coa"]
         )
 
     except Exception as e:
         print("Error:", e)
-        return render_template_string(jurnal_penyesuaian_html, jurnal_penyesuaian=None, total_debit=0, total_kredit=0)
+        return render_template("jurnal_penyesuaian.html", jurnal_penyesuaian=None, total_debit=0, total_kredit=0,
+                               periode=periode, message=message, aturan_akrual=[], coa_list=[])
 
 @app.route("/nssp")
+@laporan_tercache
 def nssp():
     if "email" not in session:
         return redirect("/login")
 
-    try:
-        # Ambil data neraca saldo sebelum penyesuaian
-        coa_data = supabase.table("coa").select("*").execute()
-        coa_list = coa_data.data if coa_data.data else []
-
-        jurnal_data = supabase.table("jurnal").select("*").execute()
-        jurnal_list = jurnal_data.data if jurnal_data.data else []
-
-        # Hitung neraca saldo sebelum penyesuaian
-        saldo_akun = {}
-        for akun in coa_list:
-            kode_akun = akun["kode_akun"]
-            saldo_akun[kode_akun] = {
-                "kode_akun": kode_akun,
-                "nama_akun": akun["nama_akun"],
-                "tipe_akun": akun["tipe_akun"],
-                "saldo_debit": 0,
-                "saldo_kredit": 0,
-                "saldo_debit_nssp": 0,
-                "saldo_kredit_nssp": 0
-            }
-
-        # Proses transaksi jurnal umum
-        for jurnal in jurnal_list:
-            akun_debit_full = jurnal["akun_debit"]
-            akun_kredit_full = jurnal["akun_kredit"]
-            
-            kode_debit = akun_debit_full.split('(')[-1].replace(')', '').strip() if '(' in akun_debit_full else ''
-            kode_kredit = akun_kredit_full.split('(')[-1].replace(')', '').strip() if '(' in akun_kredit_full else ''
-            
-            jumlah = jurnal["jumlah"]
-
-            if kode_debit and kode_debit in saldo_akun:
-                saldo_akun[kode_debit]["saldo_debit"] += jumlah
-                saldo_akun[kode_debit]["saldo_debit_nssp"] += jumlah
-
-            if kode_kredit and kode_kredit in saldo_akun:
-                saldo_akun[kode_kredit]["saldo_kredit"] += jumlah
-                saldo_akun[kode_kredit]["saldo_kredit_nssp"] += jumlah
-
-        # Proses penyesuaian (dari jurnal penyesuaian)
-        # Contoh penyesuaian - dalam implementasi nyata ambil dari database
-        penyesuaian_data = [
-            {"akun_debit": "511", "akun_kredit": "114", "jumlah": 500000},
-            {"akun_debit": "512", "akun_kredit": "211", "jumlah": 3000000},
-            {"akun_debit": "513", "akun_kredit": "113", "jumlah": 750000}
-        ]
-
-        for penyesuaian in penyesuaian_data:
-            kode_debit = penyesuaian["akun_debit"]
-            kode_kredit = penyesuaian["akun_kredit"]
-            jumlah = penyesuaian["jumlah"]
-
-            if kode_debit in saldo_akun:
-                saldo_akun[kode_debit]["saldo_debit_nssp"] += jumlah
-
-            if kode_kredit in saldo_akun:
-                saldo_akun[kode_kredit]["saldo_kredit_nssp"] += jumlah
+    # ?periode=YYYY-MM atau YYYY: NSSP per akhir periode; kosong = semua transaksi
+    periode = request.args.get('periode', '').strip()
 
-        # Konversi ke list untuk NSSP
-        nssp_list = list(saldo_akun.values())
+    try:
+        sampai = akhir_periode(periode) if periode else ''
+
+        # COA dan agregat saldo + penyesuaian per akun (satu GROUP BY) diambil bersamaan
+        hasil = jalankan_paralel(coa=ambil_coa, saldo=lambda: agregat_nssp(sampai))
+        saldo, penyesuaian = hasil["saldo"]
+
+        # Neraca saldo sebelum penyesuaian ditambah kolom penyesuaian per akun
+        kosong = {"saldo_debit": 0, "saldo_kredit": 0}
+        nssp_list = susun_neraca_saldo(hasil["coa"], saldo)
+        for akun in nssp_list:
+            mutasi = penyesuaian.get(akun["kode_akun"], kosong)
+            akun["saldo_debit_nssp"] = akun["saldo_debit"] + mutasi["saldo_debit"]
+            akun["saldo_kredit_nssp"] = akun["saldo_kredit"] + mutasi["saldo_kredit"]
         
         # Hitung total untuk neraca saldo dan NSSP
         total_debit_neraca = sum(akun["saldo_debit"] for akun in nssp_list)
@@ -3096,77 +6183,168 @@ def nssp():
         total_debit_nssp = sum(akun["saldo_debit_nssp"] for akun in nssp_list)
         total_kredit_nssp = sum(akun["saldo_kredit_nssp"] for akun in nssp_list)
 
-        return render_template_string(
-            nssp_html,
+        return render_template(
+            "nssp.html",
             nssp_data=nssp_list,
             total_debit_neraca=total_debit_neraca,
             total_kredit_neraca=total_kredit_neraca,
             total_debit_nssp=total_debit_nssp,
-            total_kredit_nssp=total_kredit_nssp
+            total_kredit_nssp=total_kredit_nssp,
+            periode=periode
         )
 
     except Exception as e:
         print("Error:", e)
-        return render_template_string(nssp_html, nssp_data=None, total_debit_neraca=0, total_kredit_neraca=0, total_debit_nssp=0, total_kredit_nssp=0)
+        g.laporan_gagal = True
+        return render_template("nssp.html", nssp_data=None, total_debit_neraca=0, total_kredit_neraca=0, total_debit_nssp=0, total_kredit_nssp=0, periode=periode)
 
 @app.route("/laporan_keuangan")
+@laporan_tercache
 def laporan_keuangan():
     if "email" not in session:
         return redirect("/login")
 
-    try:
-        # Data contoh untuk laporan keuangan
-        # Dalam implementasi nyata, data ini dihitung dari NSSP
-        laporan_data = {
-            "periode": datetime.datetime.now().strftime("%B %Y"),
-            "pendapatan_usaha": 50000000,
-            "pendapatan_penjualan": 50000000,
-            "hpp": 25000000,
-            "laba_kotor": 25000000,
-            "total_beban": 8000000,
-            "beban_operasional": [
-                {"nama": "Beban Gaji", "jumlah": 3000000},
-                {"nama": "Beban Penyusutan", "jumlah": 500000},
-                {"nama": "Beban Perlengkapan", "jumlah": 750000},
-                {"nama": "Beban Lain-lain", "jumlah": 3750000}
-            ],
-            "laba_bersih": 17000000,
-            "modal_awal": 100000000,
-            "prive": 5000000,
-            "modal_akhir": 112000000,
-            "neraca": {
-                "aset": [
-                    {"nama": "Kas", "saldo": 25000000},
-                    {"nama": "Piutang Usaha", "saldo": 15000000},
-                    {"nama": "Persediaan Udang", "saldo": 20000000},
-                    {"nama": "Peralatan Tambak", "saldo": 80000000},
-                    {"nama": "Akumulasi Penyusutan", "saldo": -500000}
-                ],
-                "total_aset": 139500000,
-                "kewajiban": [
-                    {"nama": "Utang Usaha", "saldo": 15000000},
-                    {"nama": "Utang Gaji", "saldo": 3000000},
-                    {"nama": "Utang Lain-lain", "saldo": 9500000}
-                ],
-                "total_kewajiban_modal": 139500000
-            }
-        }
+    # Periode laporan: ?periode=YYYY-MM (bulan) atau YYYY (tahun), default bulan berjalan
+    periode = request.args.get('periode', '').strip() or datetime.date.today().strftime("%Y-%m")
 
-        # Hitung total aset dan kewajiban
-        laporan_data["neraca"]["total_aset"] = sum(aset["saldo"] for aset in laporan_data["neraca"]["aset"])
-        laporan_data["neraca"]["total_kewajiban"] = sum(kewajiban["saldo"] for kewajiban in laporan_data["neraca"]["kewajiban"])
-        laporan_data["neraca"]["total_kewajiban_modal"] = laporan_data["neraca"]["total_kewajiban"] + laporan_data["modal_akhir"]
+    try:
+        laporan_data = hitung_laporan_keuangan(periode)
+        return render_template("laporan_keuangan.html", laporan_data=laporan_data, periode=periode)
 
-        return render_template_string(laporan_keuangan_html, laporan_data=laporan_data)
+    except ValueError as e:
+        return render_template("laporan_keuangan.html", laporan_data=None, periode=periode, message=f"❌ {e}")
 
     except Exception as e:
         print("Error:", e)
-        return render_template_string(laporan_keuangan_html, laporan_data=None)
+        g.laporan_gagal = True
+        return render_template("laporan_keuangan.html", laporan_data=None, periode=periode)
 
 @app.route("/logout")
 def logout():
     session.clear()
     return redirect("/login")
 
+# ---------------------------
+# PERINTAH CLI
+# ---------------------------
+
+@app.cli.command("rebuild-saldo")
+@click.option("--verify", is_flag=True, help="Hanya laporkan selisih tanpa menulis ulang saldo_akun.")
+def rebuild_saldo(verify):
+    # Hitung ulang saldo setiap akun dari tabel jurnal (agregat di database)
+    # dan bandingkan dengan saldo_akun
+    saldo_hitung = agregat_neraca_saldo()
+
+    saldo_data = supabase.table("saldo_akun").select("*").execute()
+    saldo_tersimpan = {saldo["kode_akun"]: saldo for saldo in (saldo_data.data or [])}
+
+    kosong = {"saldo_debit": 0, "saldo_kredit": 0}
+    selisih = 0
+    for kode_akun in sorted(set(saldo_hitung) | set(saldo_tersimpan)):
+        hitung = saldo_hitung.get(kode_akun, kosong)
+        tersimpan = saldo_tersimpan.get(kode_akun, kosong)
+        selisih_debit = hitung["saldo_debit"] - (tersimpan["saldo_debit"] or 0)
+        selisih_kredit = hitung["saldo_kredit"] - (tersimpan["saldo_kredit"] or 0)
+        if selisih_debit or selisih_kredit:
+            selisih += 1
+            click.echo(f"{kode_akun}: selisih debit {selisih_debit:,.0f}, selisih kredit {selisih_kredit:,.0f}")
+
+    if not selisih:
+        click.echo("✅ saldo_akun sudah sesuai dengan jurnal.")
+        return
+
+    click.echo(f"❌ {selisih} akun tidak sesuai dengan jurnal.")
+    if verify:
+        raise SystemExit(1)
+
+    # Tulis ulang saldo hasil hitungan (akun yang tidak punya transaksi dijadikan nol)
+    now = str(datetime.datetime.now())
+    supabase.table("saldo_akun").upsert([
+        {
+            "kode_akun": kode_akun,
+            "saldo_debit": saldo_hitung.get(kode_akun, kosong)["saldo_debit"],
+            "saldo_kredit": saldo_hitung.get(kode_akun, kosong)["saldo_kredit"],
+            "updated_at": now
+        }
+        for kode_akun in sorted(set(saldo_hitung) | set(saldo_tersimpan))
+    ]).execute()
+    click.echo("✅ saldo_akun berhasil dibangun ulang dari jurnal.")
+
+@app.cli.command("tutup-buku")
+@click.argument("periode")
+def tutup_buku_cli(periode):
+    # Tutup buku dari terminal/cron, misalnya `flask --app siudang tutup-buku 2026-03`
+    try:
+        saldo_list = tutup_periode(periode)
+    except ValueError as e:
+        click.echo(f"❌ {e}")
+        raise SystemExit(1)
+    click.echo(f"✅ Periode {periode} ditutup, snapshot saldo {len(saldo_list)} akun disimpan.")
+
+@app.cli.command("rebuild-aset-tetap")
+def rebuild_aset_tetap():
+    # Isi register aset tetap dari jurnal pembelian yang sudah ada (aman dijalankan ulang)
+    akun_aset = akun_aset_tetap()
+    if not akun_aset:
+        click.echo("Tidak ada akun aset tetap di COA.")
+        return
+
+    jurnal_list = baca_jurnal("*", lambda query: query.eq("kategori", "perolehan_aset"))
+    register = susun_aset_tetap(jurnal_list, akun_aset)
+    for mulai in range(0, len(register), IMPORT_BATCH_SIZE):
+        supabase.table("aset_tetap").upsert(register[mulai:mulai + IMPORT_BATCH_SIZE], on_conflict="jurnal_id", ignore_duplicates=True).execute()
+    click.echo(f"✅ {len(register)} aset tetap tercatat di register.")
+
+@app.cli.command("klasifikasi-jurnal")
+def klasifikasi_jurnal_cli():
+    # Isi/perbarui kolom kategori untuk jurnal yang sudah ada (aman dijalankan ulang)
+    akun_aset = akun_aset_tetap()
+    berubah = {}
+    for jurnal in baca_jurnal("id, keterangan, akun_debit, kode_debit, kategori"):
+        kategori = klasifikasi_jurnal(jurnal["keterangan"], jurnal["akun_debit"], jurnal["kode_debit"], akun_aset)
+        if kategori != jurnal["kategori"]:
+            berubah.setdefault(kategori, []).append(jurnal["id"])
+
+    for kategori, id_list in berubah.items():
+        for mulai in range(0, len(id_list), IMPORT_BATCH_SIZE):
+            supabase.table("jurnal").update({"kategori": kategori}).in_("id", id_list[mulai:mulai + IMPORT_BATCH_SIZE]).execute()
+    click.echo(f"✅ {sum(len(id_list) for id_list in berubah.values())} baris jurnal diklasifikasi ulang.")
+
+@app.cli.command("bench-saldo")
+@click.option("--baris", default=200000, show_default=True, help="Jumlah baris jurnal sintetis.")
+@click.option("--akun", default=60, show_default=True, help="Jumlah akun sintetis.")
+def bench_saldo(baris, akun):
+    # Bandingkan penjumlahan saldo per akun: loop Python vs numpy
+    rng = random.Random(1)
+    engine = LedgerEngine.muat(
+        {
+            "id": i + 1,
+            "tanggal": f"2026-{i % 12 + 1:02d}-01",
+            "keterangan": "",
+            "akun_debit": f"Akun {d} ({d})",
+            "akun_kredit": f"Akun {k} ({k})",
+            "kode_debit": str(d),
+            "kode_kredit": str(k),
+            "jumlah": rng.randint(1, 500000000)
+        }
+        for i, d, k in ((i, rng.randrange(akun), rng.randrange(akun)) for i in range(baris))
+    )
+
+    # Waktu terbaik dari 5 putaran (putaran pertama ikut menanggung import numpy)
+    hasil = {}
+    for nama, pakai_numpy in (("loop", False), ("numpy", True)):
+        waktu = []
+        for _ in range(5):
+            mulai = time.perf_counter()
+            debit = jumlah_per_akun(engine.debit, engine.jumlah, len(engine.akun_teks), pakai_numpy)
+            kredit = jumlah_per_akun(engine.kredit, engine.jumlah, len(engine.akun_teks), pakai_numpy)
+            waktu.append(time.perf_counter() - mulai)
+        hasil[nama] = (min(waktu), debit, kredit)
+        click.echo(f"{nama:>6}: {hasil[nama][0] * 1000:8.1f} ms")
+
+    sama = hasil["loop"][1:] == hasil["numpy"][1:]
+    click.echo(f"{baris} baris, {akun} akun: {hasil['loop'][0] / max(hasil['numpy'][0], 1e-9):.1f}x lebih cepat, "
+               f"hasil {'sama' if sama else 'BERBEDA'}")
+
 if __name__ == "__main__":
     app.run(debug=True)
\ No newline at end of file
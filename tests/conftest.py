@@ -0,0 +1,7 @@
+import os
+import sys
+
+# siudang membuat client Supabase saat di-import; untuk uji cukup nilai dummy
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_KEY", "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoiYW5vbiJ9.uji")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,58 @@
+import datetime
+import random
+
+import pytest
+
+from siudang import LedgerEngine, hitung_saldo_dari_jurnal
+
+AKUN = ["Kas (1101)", "Persediaan Udang (1301)", "Utang Usaha (2101)", "Penjualan (4101)", "Beban Pakan (5101)"]
+
+
+def buat_jurnal(jumlah_baris, seed=7):
+    # Jurnal acak dengan tanggal tidak berurutan, supaya indeks saldo ikut disusun ulang
+    acak = random.Random(seed)
+    awal = datetime.date(2026, 1, 1)
+    jurnal_list = []
+    for i in range(jumlah_baris):
+        debit, kredit = acak.sample(AKUN, 2)
+        jurnal_list.append({
+            "id": i + 1,
+            "tanggal": (awal + datetime.timedelta(days=acak.randrange(180))).isoformat(),
+            "keterangan": f"Transaksi {i + 1}",
+            "akun_debit": debit,
+            "akun_kredit": kredit,
+            "jumlah": acak.randrange(1, 5_000_000)
+        })
+    return jurnal_list
+
+
+@pytest.mark.parametrize("dari, sampai", [
+    ("2026-01-01", "2026-06-30"),
+    ("2026-02-15", "2026-03-14"),
+    ("2026-04-01", "2026-04-01"),
+    ("2025-12-01", "2026-01-31"),
+    ("2026-05-20", "2026-05-10"),
+])
+def test_mutasi_antara_sama_dengan_jurnal_terfilter(dari, sampai):
+    jurnal_list = buat_jurnal(400)
+    engine = LedgerEngine.muat(jurnal_list)
+
+    harapan = hitung_saldo_dari_jurnal([j for j in jurnal_list if dari <= j["tanggal"] <= sampai])
+    kosong = {"saldo_debit": 0, "saldo_kredit": 0}
+    for akun in AKUN:
+        kode = akun[-5:-1]
+        assert engine.mutasi_antara(kode, dari, sampai) == harapan.get(kode, kosong)
+
+    semua = {kode: saldo for kode, saldo in engine.mutasi_semua_antara(dari, sampai).items() if saldo != kosong}
+    assert semua == harapan
+
+
+def test_mutasi_antara_sesudah_jurnal_mundur():
+    jurnal_list = buat_jurnal(50)
+    engine = LedgerEngine.muat(sorted(jurnal_list, key=lambda j: j["tanggal"]))
+    mundur = {**jurnal_list[0], "id": 999, "tanggal": "2026-01-02", "jumlah": 123}
+    engine.tambah(mundur)
+
+    harapan = hitung_saldo_dari_jurnal([j for j in jurnal_list + [mundur] if j["tanggal"] <= "2026-01-31"])
+    for kode, saldo in harapan.items():
+        assert engine.mutasi_antara(kode, "2026-01-01", "2026-01-31") == saldo
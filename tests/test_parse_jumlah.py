@@ -0,0 +1,34 @@
+import pytest
+
+from siudang import parse_jumlah
+
+
+@pytest.mark.parametrize("nilai, hasil", [
+    ("Rp 1.500.000", 1500000),
+    ("1.500", 1500),
+    ("1.500,50", 1501),
+    ("1,500,000", 1500000),
+    ("1,500,000.50", 1500001),
+    ("1500000.00", 1500000),
+    ("1500.50", 1501),
+    ("12,34", 12),
+    ("1500,5", 1501),
+    ("1500", 1500),
+    (2500.4, 2500),
+])
+def test_format_valid(nilai, hasil):
+    assert parse_jumlah(nilai) == hasil
+
+
+@pytest.mark.parametrize("nilai", [
+    "1,500",
+    "1500,555",
+    "1.5000",
+    "15.00.000",
+    "1,50,000.00",
+    "abc",
+    "",
+])
+def test_format_ambigu_ditolak(nilai):
+    with pytest.raises(ValueError):
+        parse_jumlah(nilai)